@@ -0,0 +1,11 @@
+from cosver.database.db import assign_skus, get_db_path
+
+def assign():
+    print(f"🏷️ Assigning SKUs to products in {get_db_path()}")
+    
+    count = assign_skus()
+    
+    print(f"✅ Assigned {count} products.")
+
+if __name__ == "__main__":
+    assign()
@@ -0,0 +1,11 @@
+from cosver.database.db import backup_db, get_db_path
+
+def backup():
+    print(f"💾 Backing up {get_db_path()}")
+    
+    backup_path = backup_db()
+    
+    print(f"✅ Backup complete: {backup_path}")
+
+if __name__ == "__main__":
+    backup()
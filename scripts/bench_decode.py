@@ -0,0 +1,83 @@
+"""
+Benchmark full-resolution vs reduced (JPEG draft mode) image decoding for matching.
+
+Encodes synthetic 1000px product-like JPEGs and, for both decode paths, times
+decode + fingerprint per image and per pairwise comparison (two images), and
+reports the size of the largest pixel buffer decoded per image.
+Usage: python scripts/bench_decode.py [n_images] [max_side]
+"""
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+SIDE = 1000
+
+
+def product_jpeg(rng: np.random.Generator) -> bytes:
+    """A bottle-like shape on a light background with some noise."""
+    y, x = np.mgrid[0:SIDE, 0:SIDE]
+    pixels = np.full((SIDE, SIDE, 3), 245, dtype=np.uint8)
+    left, right = sorted(rng.integers(200, 800, size=2))
+    top = rng.integers(100, 400)
+    body = (x >= left) & (x <= right + 60) & (y >= top)
+    pixels[body] = rng.integers(0, 256, size=3)
+    noise = rng.normal(0, 8, size=pixels.shape)
+    pixels = np.clip(pixels + noise, 0, 255).astype(np.uint8)
+    out = BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def decoded_bytes(data: bytes, max_side) -> int:
+    """Bytes of the pixel buffer a decode materializes before any downscale."""
+    image = Image.open(BytesIO(data))
+    if max_side is not None:
+        width, height = image.size
+        scale = max_side / max(width, height)
+        if scale < 1:
+            image.draft('RGB', (int(np.ceil(width * scale)), int(np.ceil(height * scale))))
+    width, height = image.size
+    return width * height * 3
+
+
+def main(n_images: int, max_side: int):
+    from cosver.aggregator.image_matcher import compare_fingerprints, decode_image, downscale, fingerprint
+
+    rng = np.random.default_rng(0)
+    images = [product_jpeg(rng) for _ in range(n_images)]
+    print(f"📊 {n_images} JPEGs of {SIDE}x{SIDE}, fingerprinted at max side {max_side}")
+
+    paths = {
+        "full decode": lambda data: downscale(decode_image(data), max_side),
+        "draft decode": lambda data: decode_image(data, max_side),
+    }
+    fingerprints = {}
+    for name, decode in paths.items():
+        start = time.perf_counter()
+        fingerprints[name] = [fingerprint(decode(data)) for data in images]
+        per_image = (time.perf_counter() - start) / n_images * 1000
+        buffer = max(decoded_bytes(data, None if name == "full decode" else max_side) for data in images)
+        print(f"  {name:<13} {per_image:6.2f} ms/image  {2 * per_image:6.2f} ms/comparison  "
+              f"decoded buffer {buffer / 1024:7.0f} KiB/image")
+
+    drift = [
+        abs(compare_fingerprints(a, b) - compare_fingerprints(c, d))
+        for a, b, c, d in zip(
+            fingerprints["full decode"], fingerprints["full decode"][1:],
+            fingerprints["draft decode"], fingerprints["draft decode"][1:],
+        )
+    ]
+    print(f"  score difference between paths: max {max(drift, default=0):.3f}, "
+          f"mean {np.mean(drift) if drift else 0:.3f}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    side = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    main(n, side)
@@ -0,0 +1,72 @@
+"""
+Benchmark cached keyword lookup: LIKE '%kw%' scan vs FTS5 trigram MATCH.
+
+Builds a throwaway database with synthetic products and times both paths.
+Usage: python scripts/bench_fts.py [n_products]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+BRANDS = ["헤라", "닥터지", "라네즈", "설화수", "이니스프리", "에스트라", "토리든", "라운드랩"]
+WORDS = ["센슈얼", "누드", "글로스", "블랙", "쿠션", "레드", "블레미쉬", "크림", "자음생",
+         "수분", "세럼", "토너", "앰플", "선크림", "파운데이션", "립밤", "네오", "파우더"]
+KEYWORDS = ["블레미쉬 크림", "누드 글로스", "자음생", "블랙 쿠션", "없는상품명"]
+
+
+def build(db_path: str, n_products: int):
+    from cosver.database.db import init_db, normalize_name, set_db_path
+
+    set_db_path(db_path)
+    init_db()
+    rng = random.Random(0)
+    rows = []
+    for i in range(n_products):
+        name = " ".join([rng.choice(BRANDS)] + rng.sample(WORDS, 3) + [f"{rng.randint(1, 300)}ml", str(i)])
+        rows.append((name, rng.choice(BRANDS), normalize_name(name)))
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO products (name, brand, normalized_name) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(n_products: int):
+    from cosver.database.db import find_products
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        build(db_path, n_products)
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        print(f"📊 {n_products:,} products")
+        for keyword in KEYWORDS:
+            like_ms = timed(lambda: cursor.execute(
+                "SELECT id, name, brand FROM products WHERE normalized_name LIKE ?",
+                (f"%{keyword}%",)
+            ).fetchall())
+            fts_ms = timed(lambda: find_products(cursor, keyword))
+            hits = len(find_products(cursor, keyword))
+            print(f"  '{keyword}': LIKE {like_ms:7.2f} ms | FTS5 {fts_ms:7.2f} ms | {hits} hits")
+        conn.close()
+
+
+if __name__ == "__main__":
+    n = 100_000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    main(n)
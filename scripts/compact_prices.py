@@ -0,0 +1,17 @@
+from cosver.database.retention import compact_prices, RAW_RETENTION_DAYS
+import sys
+
+def compact(retain_days: int):
+    print(f"🗜️ Compacting price history older than {retain_days} days")
+    
+    stats = compact_prices(retain_days)
+    
+    print(f"✅ Compaction complete. Deleted {stats['deleted_rows']} raw rows "
+          f"into {stats['rolled_up_days']} daily rollups ({stats['free_pages']} free pages left).")
+
+if __name__ == "__main__":
+    retain_days = RAW_RETENTION_DAYS
+    if len(sys.argv) > 1:
+        retain_days = int(sys.argv[1])
+    
+    compact(retain_days)
@@ -0,0 +1,53 @@
+"""
+Score group_similar_products against the labelled listings in data/scraper_data.csv.
+
+Compares the full pairwise comparison with blocking and MinHash LSH candidate
+generation, and the greedy grouping with the batch TF-IDF mode, reporting
+pairwise precision/recall/F1 and time per call, and for the greedy modes how
+many match decisions each signal tier made per call. Image URLs are dropped so the run is
+text-only and needs no network. Usage: python scripts/eval_grouping.py [repeat]
+"""
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+
+def run(name: str, results, repeat: int, **kwargs):
+    from cosver.aggregator.evaluation import pairwise_scores
+    from cosver.frontend.utils import group_similar_products
+
+    decisions = Counter()
+    if not kwargs.get("batch"):
+        kwargs["decisions"] = decisions
+    start = time.perf_counter()
+    for _ in range(repeat):
+        groups = group_similar_products(results, **kwargs)
+    elapsed = (time.perf_counter() - start) / repeat
+    scores = pairwise_scores(results, groups)
+    tiers = Counter()
+    for (tier, _), count in decisions.items():
+        tiers[tier] += count // repeat
+    line = (f"{name:<12} groups={len(groups):>3}  P={scores['precision']:.3f}  "
+            f"R={scores['recall']:.3f}  F1={scores['f1']:.3f}  {elapsed * 1000:8.1f} ms  ")
+    print((line + "  ".join(f"{tier}={count}" for tier, count in tiers.items())).rstrip())
+
+
+def main(repeat: int):
+    from cosver.aggregator.evaluation import load_labelled_results
+    from cosver.aggregator.similarity_matrix import BATCH_THRESHOLD
+
+    results = [dict(row, img="") for row in load_labelled_results()]
+    print(f"📊 {len(results)} labelled listings, {repeat} run(s) each")
+    run("all pairs", results, repeat, blocking=False, lsh=False)
+    run("blocking", results, repeat, blocking=True, lsh=False)
+    run("lsh", results, repeat, blocking=False, lsh=True)
+    run("blocking+lsh", results, repeat, blocking=True, lsh=True)
+    run("batch", results, repeat, threshold=BATCH_THRESHOLD, blocking=False, batch=True)
+    run("batch+block", results, repeat, threshold=BATCH_THRESHOLD, blocking=True, batch=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,17 @@
+from cosver.database.export import export_parquet
+import sys
+
+def export(out_dir: str, incremental: bool):
+    mode = "incremental" if incremental else "full"
+    print(f"📤 Exporting {mode} Parquet snapshot to {out_dir}")
+    
+    counts = export_parquet(out_dir, incremental=incremental)
+    
+    summary = ", ".join(f"{table}: {count}" for table, count in counts.items())
+    print(f"✅ Export complete. {summary}")
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--full"]
+    out_dir = args[0] if args else "data/parquet"
+    
+    export(out_dir, incremental="--full" not in sys.argv)
@@ -0,0 +1,11 @@
+from cosver.database.db import fingerprint_images, get_db_path
+
+def fingerprint():
+    print(f"🖼️ Fingerprinting stored images in {get_db_path()}")
+    
+    count = fingerprint_images()
+    
+    print(f"✅ Fingerprinted {count} images.")
+
+if __name__ == "__main__":
+    fingerprint()
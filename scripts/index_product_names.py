@@ -0,0 +1,11 @@
+from cosver.database.db import index_product_names, get_db_path
+
+def index():
+    print(f"🔎 Indexing product names in {get_db_path()}")
+    
+    count = index_product_names()
+    
+    print(f"✅ Indexed {count} products.")
+
+if __name__ == "__main__":
+    index()
@@ -0,0 +1,12 @@
+from cosver.database.db import SCHEMA_VERSION, analyze_db, ensure_db, get_db_path
+
+def migrate():
+    print(f"🔧 Migrating {get_db_path()} to schema version {SCHEMA_VERSION}")
+    
+    ensure_db()
+    analyze_db()
+    
+    print("✅ Schema up to date and statistics refreshed.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,26 @@
+"""
+Pack a warm-start bundle for fresh containers.
+
+The bundle keeps each price's original scraped_at, and cached results only
+cover the last CACHE_HOURS (24h), so a bundle must be packed within that
+window of being deployed; load_bundle skips a bundle whose newest price is
+older. Repack it on every deploy rather than committing one long-lived file.
+Usage: python scripts/pack_bundle.py [bundle_path]
+"""
+from cosver.database.bundle import pack_bundle
+import sys
+
+def pack(bundle_path: str):
+    print(f"📦 Packing warm-start bundle to {bundle_path}")
+    
+    counts = pack_bundle(bundle_path)
+    
+    print(f"✅ Bundle complete. {counts['products']} products, {counts['prices']} prices, "
+          f"{counts['thumbnails']} thumbnails.")
+
+if __name__ == "__main__":
+    bundle_path = "data/warm_start.db"
+    if len(sys.argv) > 1:
+        bundle_path = sys.argv[1]
+    
+    pack(bundle_path)
@@ -0,0 +1,11 @@
+from cosver.database.db import rebuild_latest_prices, get_db_path
+
+def rebuild():
+    print(f"🔧 Rebuilding latest_prices in {get_db_path()}")
+    
+    count = rebuild_latest_prices()
+    
+    print(f"✅ Rebuild complete. {count} product/platform prices.")
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,158 @@
+"""
+Blocking (candidate generation) for product grouping.
+
+Comparing every result with every other result is O(n²) string matching.
+Blocking first buckets results by cheap keys so only plausible pairs are
+compared: the product type (refill, mini, set, ...) and a log-scale price
+band form the bucket, and within a bucket the brand mentioned in the name and
+the parsed volume must not contradict each other. A missing brand or volume
+matches anything, since many listings omit them.
+"""
+import math
+from collections import defaultdict
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+from cosver.aggregator.normalize import detect_product_type, normalize_brand, parse_volume
+
+# Two listings of the same product rarely differ in price by more than this factor
+PRICE_BAND_RATIO = 1.5
+
+_UNIT_ALIASES = {"ea": "개입"}
+
+
+class BlockKey(NamedTuple):
+    brand: str  # "" when the name mentions no known brand
+    volume: Optional[tuple[float, str]]  # None when the name has no volume
+    product_type: str
+    price: Optional[float]
+
+
+def _known_brands(results: list[dict[str, Any]]) -> list[str]:
+    """
+    Brands reported by the platforms for this result set, longest first.
+    Brand fields are unreliable (Ably reports the seller), so they are only
+    used as a vocabulary to look for in product names.
+    """
+    brands = {normalize_brand(item.get("brand")) for item in results} - {""}
+    return sorted(brands, key=len, reverse=True)
+
+
+def block_key(item: dict[str, Any], brands: list[str]) -> BlockKey:
+    """Compute the blocking features of one result."""
+    name = item.get("name") or ""
+    upper_name = name.upper()
+    brand = next((b for b in brands if b in upper_name), "")
+
+    _, volume, unit = parse_volume(name)
+    volume_key = None if volume is None else (volume, _UNIT_ALIASES.get(unit, unit))
+
+    try:
+        price = float(item.get("price"))
+    except (TypeError, ValueError):
+        price = None
+    if price is not None and price <= 0:
+        price = None
+
+    return BlockKey(brand, volume_key, detect_product_type(name), price)
+
+
+def block_keys(results: list[dict[str, Any]]) -> list[BlockKey]:
+    """Blocking features of every result, with the brand vocabulary of the whole set."""
+    brands = _known_brands(results)
+    return [block_key(item, brands) for item in results]
+
+
+def _price_band(price: Optional[float], ratio: float) -> Optional[int]:
+    if price is None:
+        return None
+    return math.floor(math.log(price) / math.log(ratio))
+
+
+def compatible(a: BlockKey, b: BlockKey, price_ratio: float = PRICE_BAND_RATIO) -> bool:
+    """True unless the two keys contradict each other on a known feature."""
+    if a.product_type != b.product_type:
+        return False
+    if a.brand and b.brand and a.brand != b.brand:
+        return False
+    if a.volume is not None and b.volume is not None and a.volume != b.volume:
+        return False
+    if a.price is not None and b.price is not None:
+        if max(a.price, b.price) / min(a.price, b.price) > price_ratio:
+            return False
+    return True
+
+
+def _codes(values: list, missing) -> np.ndarray:
+    """Integer code per value, equal for equal values; -1 for the missing value."""
+    codes: dict = {}
+    return np.array([-1 if value == missing else codes.setdefault(value, len(codes)) for value in values],
+                    dtype=np.int64)
+
+
+def compatible_mask(
+    keys: list[BlockKey],
+    rows: np.ndarray,
+    cols: np.ndarray,
+    price_ratio: float = PRICE_BAND_RATIO
+) -> np.ndarray:
+    """compatible(keys[rows[k]], keys[cols[k]]) for every k, evaluated on arrays."""
+    product_type = _codes([key.product_type for key in keys], None)
+    mask = product_type[rows] == product_type[cols]
+    for codes in (_codes([key.brand for key in keys], ""), _codes([key.volume for key in keys], None)):
+        a, b = codes[rows], codes[cols]
+        mask &= (a < 0) | (b < 0) | (a == b)
+    price = np.array([np.nan if key.price is None else key.price for key in keys], dtype=np.float64)
+    a, b = price[rows], price[cols]
+    with np.errstate(invalid="ignore"):
+        mask &= ~(np.fmax(a, b) / np.fmin(a, b) > price_ratio)
+    return mask
+
+
+def candidate_pairs(
+    results: list[dict[str, Any]],
+    price_ratio: float = PRICE_BAND_RATIO
+) -> dict[int, list[int]]:
+    """
+    Generate the pairs worth comparing.
+
+    Args:
+        results: Product dictionaries with 'name' and optionally 'brand' and 'price'
+        price_ratio: Largest price ratio two listings of one product may have
+
+    Returns:
+        Mapping from each index i to the sorted indices j > i it should be compared with
+    """
+    keys = block_keys(results)
+
+    # Bucket by (type, price band). Pairs within price_ratio always fall in the
+    # same or an adjacent band; items without a price are checked against the
+    # whole type.
+    buckets: dict[tuple[str, int], list[int]] = defaultdict(list)
+    unpriced: dict[str, list[int]] = defaultdict(list)
+    by_type: dict[str, list[int]] = defaultdict(list)
+    for index, key in enumerate(keys):
+        by_type[key.product_type].append(index)
+        band = _price_band(key.price, price_ratio)
+        if band is None:
+            unpriced[key.product_type].append(index)
+        else:
+            buckets[(key.product_type, band)].append(index)
+
+    candidates: dict[int, list[int]] = {}
+    for index, key in enumerate(keys):
+        band = _price_band(key.price, price_ratio)
+        if band is None:
+            pool = by_type[key.product_type]
+        else:
+            pool = unpriced[key.product_type] + [
+                other
+                for neighbour in (band - 1, band, band + 1)
+                for other in buckets.get((key.product_type, neighbour), ())
+            ]
+        candidates[index] = sorted(
+            other for other in set(pool)
+            if other > index and compatible(key, keys[other], price_ratio)
+        )
+    return candidates
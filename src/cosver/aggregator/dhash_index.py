@@ -0,0 +1,48 @@
+"""
+Multi-index hashing over 64-bit dHashes for Hamming-radius search.
+
+A dHash is split into CHUNKS chunks of CHUNK_BITS bits. If two hashes differ
+in at most k bits, then by pigeonhole at least one chunk differs in at most
+k // CHUNKS bits. Looking up every chunk value within that radius in a table
+keyed by (chunk position, chunk value) therefore finds every hash within
+distance k; candidates are then checked with the exact distance. Radius 7
+needs 4 x 17 lookups instead of a scan over all stored hashes.
+
+The table is image_dhash_chunks, filled by db.save_image_fingerprint and
+probed by db.find_similar_images.
+"""
+from itertools import combinations
+
+CHUNKS = 4
+CHUNK_BITS = 16
+_CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# Hamming distance up to which two product images count as the same picture
+# (compare_fingerprints gives no structural credit beyond 20)
+MATCH_DISTANCE = 8
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def chunk_keys(dhash: int) -> list[int]:
+    """One key per chunk: chunk position in the high bits, chunk value in the low 16."""
+    return [
+        (position << CHUNK_BITS) | ((dhash >> (position * CHUNK_BITS)) & _CHUNK_MASK)
+        for position in range(CHUNKS)
+    ]
+
+
+def probe_keys(dhash: int, max_distance: int) -> list[int]:
+    """
+    Chunk keys to look up to find every hash within max_distance of dhash:
+    per chunk, all values within max_distance // CHUNKS bits of its own.
+    """
+    radius = min(max_distance // CHUNKS, CHUNK_BITS)
+    flips = [0]
+    for bits in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), bits):
+            flips.append(sum(1 << bit for bit in positions))
+    return [key ^ flip for key in chunk_keys(dhash) for flip in flips]
+
@@ -0,0 +1,56 @@
+"""
+Grouping quality against hand-labelled results.
+
+data/scraper_data.csv holds scraped listings with a 'Group' column naming the
+product each listing really is. Groupings are scored pairwise: every pair of
+listings placed in one group is a predicted match, every pair sharing a label
+is a true match.
+"""
+import csv
+import itertools
+from pathlib import Path
+from typing import Any
+
+LABELLED_DATA = Path(__file__).resolve().parents[3] / "data" / "scraper_data.csv"
+
+
+def load_labelled_results(path: Path = LABELLED_DATA) -> list[dict[str, Any]]:
+    """Load labelled listings as result dictionaries (prices as floats)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["price"] = float(row["price"]) if row.get("price") else None
+    return rows
+
+
+def _pairs(groups: list[list[int]]) -> set[tuple[int, int]]:
+    pairs = set()
+    for group in groups:
+        pairs.update(itertools.combinations(sorted(group), 2))
+    return pairs
+
+
+def pairwise_scores(
+    results: list[dict[str, Any]],
+    groups: list[list[dict[str, Any]]],
+    label_key: str = "Group"
+) -> dict[str, float]:
+    """
+    Score a grouping of results against their labels.
+
+    Returns:
+        Dictionary with pairwise 'precision', 'recall' and 'f1'
+    """
+    position = {id(item): index for index, item in enumerate(results)}
+    predicted = _pairs([[position[id(item)] for item in group] for group in groups])
+
+    by_label: dict[str, list[int]] = {}
+    for index, item in enumerate(results):
+        by_label.setdefault(item[label_key], []).append(index)
+    actual = _pairs(list(by_label.values()))
+
+    hits = len(predicted & actual)
+    precision = hits / len(predicted) if predicted else 1.0
+    recall = hits / len(actual) if actual else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if hits else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
@@ -0,0 +1,86 @@
+"""
+Byte-bounded cache of image fingerprints for grouping.
+
+Values are kept in an LRU cache whose capacity is a byte budget (sum of
+their nbytes), so a large result set evicts the least recently used entries
+instead of holding everything. prefetch() loads many URLs concurrently.
+"""
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from cachetools import LRUCache
+
+from cosver.aggregator.image_matcher import load_fingerprint
+
+CACHE_BYTES = int(os.getenv("COSVER_IMAGE_CACHE_MB", "64")) * 1024 * 1024
+PREFETCH_WORKERS = 8
+
+
+def _nbytes(value: Any) -> int:
+    return value.nbytes
+
+
+class ImageCache:
+    """
+    Thread-safe LRU cache keyed by URL, capped by total bytes.
+    loader(url) may produce any value with nbytes, or None on failure.
+    """
+
+    def __init__(self, loader: Callable[[str], Any], max_bytes: int = CACHE_BYTES):
+        self._loader = loader
+        self._cache = LRUCache(maxsize=max_bytes, getsizeof=_nbytes)
+        self._lock = threading.Lock()
+
+    @property
+    def currsize(self) -> int:
+        return self._cache.currsize
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return url in self._cache
+
+    def _load(self, url: str, loader: Optional[Callable[[str], Any]] = None):
+        value = (loader or self._loader)(url)
+        # Failures are not cached; a later call may succeed
+        if value is not None and value.nbytes <= self._cache.maxsize:
+            with self._lock:
+                self._cache[url] = value
+        return value
+
+    def get(self, url: str, loader: Optional[Callable[[str], Any]] = None):
+        """Return the value for url, loading it on a miss (with loader instead of the default if given)."""
+        with self._lock:
+            if url in self._cache:
+                return self._cache[url]
+        return self._load(url, loader)
+
+    def prefetch(
+        self,
+        urls: Iterable[str],
+        workers: int = PREFETCH_WORKERS,
+        loader: Optional[Callable[[str], Any]] = None
+    ) -> set[str]:
+        """
+        Load all uncached URLs concurrently; loading is I/O-bound (store reads, downloads).
+        Returns the URLs that could not be loaded.
+        """
+        with self._lock:
+            missing = list(dict.fromkeys(url for url in urls if url and url not in self._cache))
+        if not missing:
+            return set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            values = list(pool.map(lambda url: self._load(url, loader), missing))
+        return {url for url, value in zip(missing, values) if value is None}
+
+
+_SHARED_FINGERPRINTS: Optional[ImageCache] = None
+
+
+def get_fingerprint_cache() -> ImageCache:
+    """Process-wide cache of image fingerprints (see image_matcher.load_fingerprint)."""
+    global _SHARED_FINGERPRINTS
+    if _SHARED_FINGERPRINTS is None:
+        _SHARED_FINGERPRINTS = ImageCache(load_fingerprint)
+    return _SHARED_FINGERPRINTS
@@ -1,13 +1,29 @@
+import math
 import requests
 import numpy as np
 import cv2
 from PIL import Image
 import imagehash
 from io import BytesIO
+from typing import NamedTuple, Optional
+from cosver.database.db import (
+    find_similar_images,
+    get_image_data_by_url,
+    get_image_fingerprint,
+    get_thumbnail_by_url,
+    save_image_fingerprint,
+)
 
-def download_image(url: str) -> np.ndarray:
+# Fingerprints are computed on images downscaled to this size, the same size
+# as stored thumbnails, so a fingerprint does not depend on where the image came from
+FINGERPRINT_SIDE = 256
+HIST_BINS = (50, 60)  # H, S
+
+def download_image(url: str, max_side: Optional[int] = None) -> np.ndarray:
     """
     Download image from URL and convert to numpy array (RGB).
+    With max_side, the image is decoded straight at reduced size (see
+    to_rgb_array) and its longer side is at most max_side.
     Returns None if download fails.
     """
     if not url:
@@ -19,68 +35,233 @@ def download_image(url: str) -> np.ndarray:
             return None
             
         image_data = response.content
-        image = Image.open(BytesIO(image_data))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-            
-        return np.array(image)
+        return to_rgb_array(Image.open(BytesIO(image_data)), max_side)
     except Exception as e:
         print(f"Error downloading image {url}: {e}")
         return None
 
-def calculate_similarity(img1: np.ndarray, img2: np.ndarray) -> float:
+def to_rgb_array(image: Image.Image, max_side: Optional[int] = None) -> np.ndarray:
     """
-    Calculate similarity between two images.
-    Combines structural similarity (dHash) and color similarity (Histogram).
-    Returns a score between 0.0 and 1.0.
+    Convert an opened PIL image to an RGB numpy array, optionally with its
+    longer side capped at max_side. JPEG images are then decoded in draft
+    mode, at the smallest 1/2, 1/4 or 1/8 scale still covering max_side, so
+    the full-resolution pixels are never materialized; other formats are
+    decoded fully and downscaled.
     """
-    if img1 is None or img2 is None:
-        return 0.0
+    if max_side is not None:
+        width, height = image.size
+        scale = max_side / max(width, height)
+        if scale < 1:
+            image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+    
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    array = np.array(image)
+    return downscale(array, max_side) if max_side is not None else array
+
+def decode_image(data, max_side: Optional[int] = None) -> np.ndarray:
+    """
+    Decode raw image bytes (bytes, memoryview or mmap) into an RGB numpy array.
+    The buffer is handed to OpenCV without copying. With max_side, the image
+    is decoded at reduced size instead (see to_rgb_array).
+    Returns None if the data cannot be decoded.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    if max_side is not None:
+        try:
+            return to_rgb_array(Image.open(BytesIO(buffer)), max_side)
+        except Exception:
+            return None
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def load_image(url: str, download: bool = True, max_side: Optional[int] = None) -> np.ndarray:
+    """
+    Load image for URL from the local image store, downloading only on a miss
+    (and only if download is set).
+    Stored thumbnails are preferred; dHash and colour histograms do not need
+    full resolution. With max_side, full-size images are decoded at reduced
+    size (see to_rgb_array); thumbnails are small already.
+    Returns None if the image is unavailable.
+    """
+    if not url:
+        return None
+    
+    for lookup, side in ((get_thumbnail_by_url, None), (get_image_data_by_url, max_side)):
+        data = lookup(url)
+        if data is not None:
+            image = decode_image(data, side)
+            if image is not None:
+                return image
+    return download_image(url, max_side) if download else None
+
+def downscale(image: Optional[np.ndarray], max_side: int = FINGERPRINT_SIDE) -> Optional[np.ndarray]:
+    """Shrink an image so its longer side is at most max_side (never enlarges)."""
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+class Fingerprint(NamedTuple):
+    """
+    Per-image matching features: a 64-bit dHash and a min-max normalized
+    H-S histogram (float32, HIST_BINS). Either is None if it could not be computed.
+    """
+    dhash: Optional[int]
+    histogram: Optional[np.ndarray]
+
+    @property
+    def nbytes(self) -> int:
+        return 8 + (self.histogram.nbytes if self.histogram is not None else 0)
+
+def fingerprint(image: np.ndarray) -> Optional[Fingerprint]:
+    """
+    Compute the fingerprint of an RGB image.
+    Returns None if image is None.
+    """
+    if image is None:
+        return None
         
-    # 1. Structural Similarity (dHash)
+    # 1. Structure (dHash)
     try:
-        pil_img1 = Image.fromarray(img1)
-        pil_img2 = Image.fromarray(img2)
-        
-        hash1 = imagehash.dhash(pil_img1)
-        hash2 = imagehash.dhash(pil_img2)
-        
-        # Hamming distance: 0 means identical, higher means different
-        # Max distance for 64-bit hash is 64
-        distance = hash1 - hash2
-        
-        # Normalize to 0-1 (1 means identical)
-        # Threshold: if distance > 20, they are very different
-        hash_score = max(0.0, (20 - distance) / 20.0)
+        dhash = int(str(imagehash.dhash(Image.fromarray(image))), 16)
     except Exception:
-        hash_score = 0.0
+        dhash = None
         
-    # 2. Color Similarity (Histogram)
+    # 2. Colour (Histogram)
     try:
         # Convert to HSV for better color comparison
-        hsv1 = cv2.cvtColor(img1, cv2.COLOR_RGB2HSV)
-        hsv2 = cv2.cvtColor(img2, cv2.COLOR_RGB2HSV)
+        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        histogram = cv2.calcHist([hsv], [0, 1], None, list(HIST_BINS), [0, 180, 0, 256])
+        cv2.normalize(histogram, histogram, 0, 1, cv2.NORM_MINMAX)
+    except Exception:
+        histogram = None
         
-        # Calculate histograms
-        # H: 50 bins, S: 60 bins
-        hist1 = cv2.calcHist([hsv1], [0, 1], None, [50, 60], [0, 180, 0, 256])
-        hist2 = cv2.calcHist([hsv2], [0, 1], None, [50, 60], [0, 180, 0, 256])
+    return Fingerprint(dhash, histogram)
+
+def compare_fingerprints(fp1: Optional[Fingerprint], fp2: Optional[Fingerprint]) -> float:
+    """
+    Similarity of two fingerprints, between 0.0 and 1.0.
+    Combines structural similarity (dHash) and color similarity (Histogram).
+    """
+    if fp1 is None or fp2 is None:
+        return 0.0
         
-        # Normalize
-        cv2.normalize(hist1, hist1, 0, 1, cv2.NORM_MINMAX)
-        cv2.normalize(hist2, hist2, 0, 1, cv2.NORM_MINMAX)
+    # Hamming distance: 0 means identical, max 64 for a 64-bit hash
+    # Threshold: if distance > 20, they are very different
+    if fp1.dhash is not None and fp2.dhash is not None:
+        distance = (fp1.dhash ^ fp2.dhash).bit_count()
+        hash_score = max(0.0, (20 - distance) / 20.0)
+    else:
+        hash_score = 0.0
         
-        # Compare histograms (Correlation)
-        # 1.0 = identical, 0.0 = no correlation
-        color_score = cv2.compareHist(hist1, hist2, cv2.HISTCMP_CORREL)
-        color_score = max(0.0, color_score) # Clip negative values
-    except Exception:
+    # Correlation: 1.0 = identical, 0.0 = no correlation
+    if fp1.histogram is not None and fp2.histogram is not None:
+        color_score = max(0.0, cv2.compareHist(fp1.histogram, fp2.histogram, cv2.HISTCMP_CORREL))
+    else:
         color_score = 0.0
         
     # Weighted combination
     # Structure is usually more important for product matching
-    final_score = 0.6 * hash_score + 0.4 * color_score
+    return 0.6 * hash_score + 0.4 * color_score
+
+def compare_fingerprint_matrix(fingerprints: list[Optional[Fingerprint]]) -> np.ndarray:
+    """
+    compare_fingerprints of every pair of fingerprints at once, as an N x N
+    matrix (entry [i, j] scores fingerprints[i] against fingerprints[j]).
+    dHash distances are popcounts of the XOR of all hash pairs; histogram
+    correlations are one matrix product of the mean-centered histograms.
+    """
+    count = len(fingerprints)
+    
+    has_hash = np.array([fp is not None and fp.dhash is not None for fp in fingerprints], dtype=bool)
+    hashes = np.array([fp.dhash if present else 0 for fp, present in zip(fingerprints, has_hash)], dtype=np.uint64)
+    distance = np.bitwise_count(hashes[:, None] ^ hashes[None, :]).astype(np.int64)
+    hash_score = np.maximum(0.0, (20 - distance) / 20.0)
+    hash_score[~(has_hash[:, None] & has_hash[None, :])] = 0.0
+    
+    has_histogram = np.array([fp is not None and fp.histogram is not None for fp in fingerprints], dtype=bool)
+    histograms = np.zeros((count, HIST_BINS[0] * HIST_BINS[1]), dtype=np.float64)
+    for slot, fp in enumerate(fingerprints):
+        if has_histogram[slot]:
+            histograms[slot] = fp.histogram.ravel()
+    centered = histograms - histograms.mean(axis=1, keepdims=True)
+    squares = np.einsum('ij,ij->i', centered, centered)
+    denominator = np.outer(squares, squares)
+    # Like cv2.compareHist, a constant histogram correlates 1.0
+    flat = denominator <= np.finfo(np.float64).eps
+    color_score = np.ones((count, count))
+    np.divide(centered @ centered.T, np.sqrt(denominator), out=color_score, where=~flat)
+    color_score = np.maximum(0.0, color_score)
+    color_score[~(has_histogram[:, None] & has_histogram[None, :])] = 0.0
+    
+    return 0.6 * hash_score + 0.4 * color_score
+
+def load_fingerprint(url: str, download: bool = True) -> Optional[Fingerprint]:
+    """
+    Fingerprint of the image at URL. Fingerprints of stored images are
+    computed once and kept in the database; other images are fingerprinted
+    after downloading (unless download is False).
+    Returns None if the image is unavailable.
+    """
+    if not url:
+        return None
     
-    return final_score
+    stored = get_image_fingerprint(url)
+    if stored is not None:
+        dhash, histogram = stored
+        return Fingerprint(dhash, np.frombuffer(histogram, dtype=np.float32).reshape(HIST_BINS))
+    
+    fp = fingerprint(downscale(load_image(url, download, FINGERPRINT_SIDE)))
+    record = fingerprint_record(fp)
+    if record is not None:
+        save_image_fingerprint(url, *record)
+    return fp
+
+def fingerprint_record(fp: Optional[Fingerprint]) -> Optional[tuple[int, bytes]]:
+    """The (dhash, histogram bytes) stored for a fingerprint, or None if it is incomplete."""
+    if fp is None or fp.dhash is None or fp.histogram is None:
+        return None
+    return fp.dhash, fp.histogram.astype(np.float32).tobytes()
+
+def thumbnail_fingerprint(data) -> Optional[tuple[int, bytes]]:
+    """
+    Fingerprint record of a stored thumbnail's bytes, computed as
+    load_fingerprint does for a stored image, or None if it cannot be decoded.
+    """
+    return fingerprint_record(fingerprint(downscale(decode_image(data))))
+
+def load_stored_fingerprint(url: str) -> Optional[Fingerprint]:
+    """Fingerprint of the image at URL if it is available without a download."""
+    return load_fingerprint(url, download=False)
+
+def find_stored_matches(image: np.ndarray, max_distance: Optional[int] = None) -> list[tuple]:
+    """
+    Stored product images whose dHash is within max_distance bits of the
+    image's, across the whole database (see db.find_similar_images).
+    Returns (product_id, platform, content_hash, distance) tuples, closest first.
+    """
+    fp = fingerprint(downscale(image))
+    if fp is None or fp.dhash is None:
+        return []
+    return find_similar_images(fp.dhash, max_distance)
+
+def calculate_similarity(img1: np.ndarray, img2: np.ndarray) -> float:
+    """
+    Calculate similarity between two images.
+    Combines structural similarity (dHash) and color similarity (Histogram).
+    Returns a score between 0.0 and 1.0.
+    """
+    if img1 is None or img2 is None:
+        return 0.0
+    return compare_fingerprints(fingerprint(img1), fingerprint(img2))
@@ -0,0 +1,146 @@
+"""
+Incremental product grouping with union-find.
+
+Results are folded into groups one at a time, as they arrive from each
+platform. A new result is compared only with the representative (first
+member) of each existing group, and only with representatives that share a
+MinHash band with its name and whose blocking keys do not contradict it; it
+joins the oldest group it matches, or starts a new one. On a whole result list
+this gives the same groups as the greedy pass in group_similar_products.
+
+Groups can be seeded with stored labels (see db.get_product_groups): results
+carrying a known label join that label's group without any comparison, so a
+repeat search is grouped by lookups alone. A result can also be tied to one
+added before it (e.g. another listing of the same SKU), which only the first
+of them is compared for.
+"""
+from typing import Any, Callable, Hashable, Optional
+
+from cosver.aggregator.blocking import block_key, compatible
+from cosver.aggregator.minhash import LSHIndex
+from cosver.aggregator.normalize import normalize_brand
+
+
+class UnionFind:
+    """Disjoint sets over hashable keys; the earliest added key of a set is its root."""
+
+    def __init__(self):
+        self._parent: dict[Hashable, Hashable] = {}
+        self._order: dict[Hashable, int] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._parent
+
+    def add(self, key: Hashable):
+        if key not in self._parent:
+            self._parent[key] = key
+            self._order[key] = len(self._order)
+
+    def position(self, key: Hashable) -> int:
+        """Order in which key was added."""
+        return self._order[key]
+
+    def find(self, key: Hashable) -> Hashable:
+        parent = self._parent
+        while parent[key] != key:
+            # Path halving
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(self, a: Hashable, b: Hashable) -> Hashable:
+        """Merge the sets of a and b; returns the root of the merged set."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.position(root_b) < self.position(root_a):
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        return root_a
+
+
+class IncrementalGrouper:
+    """
+    Groups results added one by one.
+
+    Args:
+        match: Decides whether a new result belongs with a group representative
+    """
+
+    def __init__(self, match: Callable[[dict[str, Any], dict[str, Any]], bool]):
+        self.match = match
+        self.comparisons = 0
+        self._sets = UnionFind()
+        self._items: dict[Hashable, dict[str, Any]] = {}  # first result per key
+        self._added: list[tuple[Hashable, dict[str, Any]]] = []
+        self._labels: dict[Hashable, Hashable] = {}  # label -> root key of its group
+        self._root_labels: dict[Hashable, Hashable] = {}  # root key -> label
+        self._representatives = LSHIndex()
+        self._brands: list[str] = []
+
+    def _note_brand(self, item: dict[str, Any]):
+        brand = normalize_brand(item.get("brand"))
+        if brand and brand not in self._brands:
+            self._brands = sorted(self._brands + [brand], key=len, reverse=True)
+
+    def add(
+        self,
+        key: Hashable,
+        item: dict[str, Any],
+        label: Optional[Hashable] = None,
+        same_as: Optional[Hashable] = None
+    ) -> Hashable:
+        """
+        Add one result. Results sharing a key (e.g. one product listed on
+        several platforms) always share a group, as does a result added with
+        same_as, the key of a result added before it. With a label already
+        seen, the result joins that group directly; otherwise it is matched
+        against the group representatives. Returns the root key of its group.
+        """
+        self._added.append((key, item))
+        if key in self._sets:
+            return self._sets.find(key)
+        self._sets.add(key)
+        self._items[key] = item
+        self._note_brand(item)
+
+        if same_as is not None:
+            return self._sets.union(same_as, key)
+        if label is not None and label in self._labels:
+            return self._sets.union(self._labels[label], key)
+
+        if label is not None:
+            self._labels[label] = key
+            self._root_labels[key] = label
+        else:
+            # Oldest group first, as when grouping a whole result list in order
+            item_key = block_key(item, self._brands)
+            candidates = sorted(
+                (other for other, _ in self._representatives.query(item.get("name", ""))),
+                key=self._sets.position
+            )
+            for other in candidates:
+                representative = self._items[other]
+                if not compatible(item_key, block_key(representative, self._brands)):
+                    continue
+                self.comparisons += 1
+                if self.match(representative, item):
+                    return self._sets.union(other, key)
+
+        self._representatives.add(key, item.get("name", ""))
+        return key
+
+    def groups(self) -> list[list[dict[str, Any]]]:
+        """Groups in order of their first member, members in the order added."""
+        groups: dict[Hashable, list[dict[str, Any]]] = {}
+        for key, item in self._added:
+            groups.setdefault(self._sets.find(key), []).append(item)
+        return list(groups.values())
+
+    def labels(self) -> dict[Hashable, Hashable]:
+        """Label of every key's group: its stored label, or the root key for new groups."""
+        labels = {}
+        for key in self._items:
+            root = self._sets.find(key)
+            labels[key] = self._root_labels.get(root, root)
+        return labels
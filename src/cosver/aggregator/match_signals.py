@@ -0,0 +1,156 @@
+"""
+Cost-ordered evaluation of the signals that decide whether two results match.
+
+Signals are tried cheapest first and the first conclusive one decides:
+
+1. exact keys: same stored product, same platform listing (goods_no),
+   or equal normalize.make_sku_key (of names with letters or digits)
+2. vetoes: different product type or different known volume
+3. name similarity (difflib ratio): a match at or above the threshold, a
+   reject below the ambiguous band
+4. image fingerprints already available without a download (memory cache,
+   database, local image store)
+5. image fingerprints of downloaded images
+
+Every decision is counted per tier, so the cost profile of a grouping run can
+be inspected through MatchEvaluator.decisions.
+"""
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Callable, Optional
+
+from cosver.aggregator.blocking import BlockKey, block_key
+from cosver.aggregator.image_matcher import Fingerprint, compare_fingerprints
+from cosver.aggregator.minhash import compact_name
+from cosver.aggregator.normalize import make_sku_key
+
+EXACT_KEY = "exact_key"
+VETO = "veto"
+TEXT = "text"
+CACHED_IMAGE = "cached_image"
+DOWNLOADED_IMAGE = "downloaded_image"
+NO_IMAGE = "no_image"
+TIERS = (EXACT_KEY, VETO, TEXT, CACHED_IMAGE, DOWNLOADED_IMAGE, NO_IMAGE)
+
+# Name similarity from which image similarity decides (below the threshold)
+AMBIGUOUS_TEXT_RATIO = 0.4
+# Fingerprint similarity above which images count as the same product
+IMAGE_MATCH_SCORE = 0.6
+
+FingerprintSource = Callable[[str], Optional[Fingerprint]]
+
+
+class MatchEvaluator:
+    """
+    Decides matches between result dictionaries tier by tier.
+
+    Args:
+        threshold: Name similarity at or above which results match outright
+        cached_fingerprint: Returns a fingerprint without downloading, or None
+        fetch_fingerprint: Returns a fingerprint, downloading if needed, or None
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        cached_fingerprint: FingerprintSource,
+        fetch_fingerprint: FingerprintSource
+    ):
+        self.threshold = threshold
+        self.cached_fingerprint = cached_fingerprint
+        self.fetch_fingerprint = fetch_fingerprint
+        self.decisions: Counter = Counter()  # (tier, matched) -> count
+        self._features: dict[int, tuple[dict[str, Any], tuple[Optional[str], BlockKey]]] = {}
+
+    def _item_features(self, item: dict[str, Any]) -> tuple[Optional[str], BlockKey]:
+        """SKU key (None for names without letters or digits) and blocking key of item."""
+        cached = self._features.get(id(item))
+        # The item is kept with its features, so a reused id() cannot alias it
+        if cached is not None and cached[0] is item:
+            return cached[1]
+        name = item.get("name") or ""
+        # make_sku_key of an empty name is just the type (e.g. "BASE"), shared by all such items
+        sku_key = make_sku_key(item.get("brand") or "", name) if compact_name(name) else None
+        features = (sku_key, block_key(item, []))
+        self._features[id(item)] = (item, features)
+        return features
+
+    def _decide(self, tier: str, matched: bool) -> bool:
+        self.decisions[(tier, matched)] += 1
+        return matched
+
+    def summary(self) -> dict[str, dict[str, int]]:
+        """Decision counts per tier: {tier: {'match': n, 'reject': n}}."""
+        return {
+            tier: {"match": self.decisions[(tier, True)], "reject": self.decisions[(tier, False)]}
+            for tier in TIERS
+        }
+
+    def cheap_decision(
+        self,
+        a: dict[str, Any],
+        b: dict[str, Any],
+        text_ratio: Optional[float] = None
+    ) -> tuple[Optional[str], bool, Optional[float]]:
+        """
+        Apply the tiers that need no image (exact keys, vetoes, name ratio)
+        without counting the decision.
+
+        Returns:
+            (tier, matched, text_ratio); tier is None if images must decide.
+            text_ratio is None if no ratio was needed.
+        """
+        # 1. Exact keys
+        if a.get("product_id") is not None and a.get("product_id") == b.get("product_id"):
+            return EXACT_KEY, True, text_ratio
+        if a.get("goods_no") and a.get("goods_no") == b.get("goods_no") and a.get("source") == b.get("source"):
+            return EXACT_KEY, True, text_ratio
+        sku_a, features_a = self._item_features(a)
+        sku_b, features_b = self._item_features(b)
+        if sku_a is not None and sku_a == sku_b:
+            return EXACT_KEY, True, text_ratio
+
+        # 2. Vetoes
+        if features_a.product_type != features_b.product_type:
+            return VETO, False, text_ratio
+        if features_a.volume is not None and features_b.volume is not None and features_a.volume != features_b.volume:
+            return VETO, False, text_ratio
+
+        # 3. Text similarity
+        if text_ratio is None:
+            text_ratio = SequenceMatcher(None, a.get("name") or "", b.get("name") or "").ratio()
+        if text_ratio >= self.threshold:
+            return TEXT, True, text_ratio
+        if text_ratio < AMBIGUOUS_TEXT_RATIO:
+            return TEXT, False, text_ratio
+        return None, False, text_ratio
+
+    def match(
+        self,
+        a: dict[str, Any],
+        b: dict[str, Any],
+        text_ratio: Optional[float] = None,
+        image_score: Optional[float] = None
+    ) -> bool:
+        """
+        Decide whether a and b are the same product.
+        A precomputed text_ratio or image_score replaces computing that signal.
+        """
+        tier, matched, _ = self.cheap_decision(a, b, text_ratio)
+        if tier is not None:
+            return self._decide(tier, matched)
+
+        # 4./5. Images, ambiguous band only
+        if not (a.get("img") and b.get("img")):
+            return self._decide(NO_IMAGE, False)
+        if image_score is not None:
+            return self._decide(CACHED_IMAGE, image_score > IMAGE_MATCH_SCORE)
+        fp_a, fp_b = self.cached_fingerprint(a["img"]), self.cached_fingerprint(b["img"])
+        if fp_a is not None and fp_b is not None:
+            return self._decide(CACHED_IMAGE, compare_fingerprints(fp_a, fp_b) > IMAGE_MATCH_SCORE)
+
+        fp_a = fp_a or self.fetch_fingerprint(a["img"])
+        fp_b = fp_b or self.fetch_fingerprint(b["img"])
+        if fp_a is None or fp_b is None:
+            return self._decide(NO_IMAGE, False)
+        return self._decide(DOWNLOADED_IMAGE, compare_fingerprints(fp_a, fp_b) > IMAGE_MATCH_SCORE)
@@ -0,0 +1,124 @@
+"""
+MinHash signatures and LSH banding over product-name shingles.
+
+A product name is reduced to its set of character n-grams; the MinHash
+signature of that set estimates Jaccard similarity between two names. LSH
+splits signatures into bands and buckets each band, so names sharing any band
+bucket are returned as candidates without comparing against every name.
+With 64 permutations in 32 bands of 2 rows, pairs above ~0.2 Jaccard collide
+with high probability.
+"""
+import re
+import zlib
+from collections import defaultdict
+from typing import Hashable, Iterable, Optional
+
+import numpy as np
+
+from cosver.aggregator.normalize import normalize_product_name
+
+NUM_PERM = 64
+BANDS = 32
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_EMPTY = np.full(1, _MERSENNE_PRIME, dtype=np.uint64)
+
+
+def compact_name(name: str) -> str:
+    """
+    Product name without [tags], (notes), punctuation, emoji and spaces, so
+    word-splitting differences ("블랙쿠션" / "블랙 쿠션") do not matter.
+    """
+    text = normalize_product_name(name or "")
+    text = re.sub(r"\[.*?\]|\(.*?\)", " ", text)
+    return re.sub(r"[^0-9a-zA-Z가-힣]", "", text).lower()
+
+
+def name_shingles(name: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """Character n-grams of a product name's compact form (see compact_name)."""
+    text = compact_name(name)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures with universal hashing."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        """Signature of a shingle set as a uint64 array of length num_perm."""
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64,
+        )
+        if hashes.size == 0:
+            hashes = _EMPTY
+        # a < 2^31 and x < 2^31, so a * x + b fits in uint64
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def name_signature(self, name: str) -> np.ndarray:
+        return self.signature(name_shingles(name))
+
+
+def estimate_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Fraction of agreeing signature positions, an estimate of Jaccard similarity."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def band_hashes(signature: np.ndarray, bands: int = BANDS) -> list[int]:
+    """One 63-bit bucket id per band of the signature."""
+    rows = len(signature) // bands
+    return [
+        zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()) | (band << 32)
+        for band in range(bands)
+    ]
+
+
+class LSHIndex:
+    """In-memory LSH index from keys to MinHash signatures."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, hasher: Optional[MinHasher] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.hasher = hasher or MinHasher(num_perm)
+        self.signatures: dict[Hashable, np.ndarray] = {}
+        self._buckets: dict[int, set] = defaultdict(set)
+
+    def add(self, key: Hashable, name: str):
+        signature = self.hasher.name_signature(name)
+        self.signatures[key] = signature
+        for bucket in band_hashes(signature, self.bands):
+            self._buckets[bucket].add(key)
+
+    def query(self, name: str, min_jaccard: float = 0.0) -> list[tuple[Hashable, float]]:
+        """Keys sharing a band with name, best estimated Jaccard first."""
+        signature = self.hasher.name_signature(name)
+        keys = set()
+        for bucket in band_hashes(signature, self.bands):
+            keys |= self._buckets.get(bucket, set())
+        scored = [(key, estimate_jaccard(signature, self.signatures[key])) for key in keys]
+        return sorted(
+            (item for item in scored if item[1] >= min_jaccard),
+            key=lambda item: -item[1],
+        )
+
+    def candidate_pairs(self) -> set[tuple]:
+        """All pairs of keys that share at least one band bucket."""
+        pairs = set()
+        for keys in self._buckets.values():
+            if len(keys) < 2:
+                continue
+            ordered = sorted(keys)
+            for i, first in enumerate(ordered):
+                for second in ordered[i + 1:]:
+                    pairs.add((first, second))
+        return pairs
@@ -0,0 +1,97 @@
+"""
+Process-pool scoring of candidate pairs for large grouping jobs.
+
+Grouping itself is a cheap greedy pass; the CPU cost is scoring pairs
+(difflib name ratios, fingerprint comparisons), which runs on one core under
+the GIL. These helpers score all pairs across worker processes instead. Names
+are sent to each worker once; fingerprint histograms are written to one
+shared-memory block that workers map instead of receiving copies. Scores come
+back in pair order, so callers get exactly the values serial scoring gives.
+"""
+import concurrent.futures
+import os
+from difflib import SequenceMatcher
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from cosver.aggregator.image_matcher import HIST_BINS, Fingerprint, compare_fingerprints
+
+CHUNK_PAIRS = 2000
+
+# Per-worker state set by the pool initializers
+_NAMES: list[str] = []
+_FINGERPRINTS: list[Optional[Fingerprint]] = []
+_SHARED: Optional[shared_memory.SharedMemory] = None
+
+
+def default_workers() -> int:
+    """One worker per CPU; what group_similar_products uses for workers=None."""
+    return os.cpu_count() or 1
+
+
+def _chunks(pairs: list[tuple[int, int]], size: int = CHUNK_PAIRS) -> list[list[tuple[int, int]]]:
+    return [pairs[start:start + size] for start in range(0, len(pairs), size)]
+
+
+def _init_names(names: list[str]):
+    global _NAMES
+    _NAMES = names
+
+
+def _ratios(pairs: list[tuple[int, int]]) -> list[float]:
+    return [SequenceMatcher(None, _NAMES[i], _NAMES[j]).ratio() for i, j in pairs]
+
+
+def text_ratios(names: list[str], pairs: list[tuple[int, int]], workers: int) -> list[float]:
+    """SequenceMatcher ratio of names[i] and names[j] for every pair, in pair order."""
+    if not pairs:
+        return []
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_names, initargs=(names,)) as pool:
+        return [ratio for chunk in pool.map(_ratios, _chunks(pairs)) for ratio in chunk]
+
+
+def _init_fingerprints(shm_name: str, dhashes: list[Optional[int]], has_histogram: list[bool]):
+    global _FINGERPRINTS, _SHARED
+    _SHARED = shared_memory.SharedMemory(name=shm_name)
+    histograms = np.ndarray((len(dhashes), *HIST_BINS), dtype=np.float32, buffer=_SHARED.buf)
+    _FINGERPRINTS = [
+        Fingerprint(dhash, histograms[slot] if present else None)
+        for slot, (dhash, present) in enumerate(zip(dhashes, has_histogram))
+    ]
+
+
+def _scores(pairs: list[tuple[int, int]]) -> list[float]:
+    return [compare_fingerprints(_FINGERPRINTS[i], _FINGERPRINTS[j]) for i, j in pairs]
+
+
+def fingerprint_scores(
+    fingerprints: list[Fingerprint],
+    pairs: list[tuple[int, int]],
+    workers: int
+) -> list[float]:
+    """compare_fingerprints of fingerprints[i] and fingerprints[j] for every pair, in pair order."""
+    if not pairs:
+        return []
+    size = max(1, len(fingerprints) * HIST_BINS[0] * HIST_BINS[1] * 4)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        histograms = np.ndarray((len(fingerprints), *HIST_BINS), dtype=np.float32, buffer=shm.buf)
+        for slot, fp in enumerate(fingerprints):
+            if fp.histogram is not None:
+                histograms[slot] = fp.histogram
+        # The block cannot be closed while an array still points into it
+        del histograms
+        initargs = (
+            shm.name,
+            [fp.dhash for fp in fingerprints],
+            [fp.histogram is not None for fp in fingerprints],
+        )
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_fingerprints, initargs=initargs
+        ) as pool:
+            return [score for chunk in pool.map(_scores, _chunks(pairs)) for score in chunk]
+    finally:
+        shm.close()
+        shm.unlink()
@@ -7,7 +7,7 @@ e-commerce platforms and aggregate the results.
 from typing import Any, Callable
 
 import streamlit as st
-from cosver.database.db import get_cached_results, save_products_batch
+from cosver.database.storage import get_storage
 
 
 def search_all_platforms(
@@ -24,8 +24,10 @@ def search_all_platforms(
     Returns:
         List of product dictionaries with 'source' field added to each result
     """
+    storage = get_storage()
+    
     # 1. Check cache first
-    cached_results = get_cached_results(keyword)
+    cached_results = storage.get_cached_results(keyword)
     
     if cached_results:
         st.info(f"📦 Found {len(cached_results)} cached results (less than 24 hours old)")
@@ -44,10 +46,13 @@ def search_all_platforms(
         except Exception as e:
             st.warning(f"{platform_name} error: {e}")
     
-    # 3. Save fresh results to database
+    # 3. Save fresh results to database; product ids let grouping reuse
+    # stored group memberships
     if fresh_results:
         try:
-            save_products_batch(fresh_results)
+            product_ids = storage.save_products_batch(fresh_results)
+            for result, product_id in zip(fresh_results, product_ids):
+                result["product_id"] = product_id
         except Exception as e:
             print(f"Failed to save to database: {e}")
     
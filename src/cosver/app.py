@@ -18,7 +18,9 @@ from cosver.scraper.ably import search_product as ab
 from cosver.scraper.musinsa import search_product as ms
 from cosver.scraper.oliveyoung_playwright import search_product as oy
 from cosver.scraper.zigzag import search_product as zz
-from cosver.frontend.utils import group_similar_products
+from cosver.frontend.utils import group_incrementally, thumbnail_src
+from cosver.database.bundle import load_bundle
+from cosver.database.storage import get_storage
 
 # --- Playwright Install (for Streamlit Cloud) ---
 @st.cache_resource
@@ -49,6 +51,18 @@ def install_playwright():
 
 # Run installation
 install_playwright()
+
+# --- Warm-start cache (prebuilt bundle of recent products and thumbnails) ---
+@st.cache_resource
+def warm_start_cache():
+    """Load the warm-start bundle into an empty database once per process."""
+    try:
+        return load_bundle(os.getenv("COSVER_BUNDLE_PATH", "data/warm_start.db"))
+    except Exception as e:
+        print(f"⚠️ Warm-start bundle not loaded: {e}")
+        return 0
+
+warm_start_cache()
 st.set_page_config(page_title="올최맞", page_icon="💄", layout="centered")
 
 # --- UI Rules & CSS (Follows cosver.md) ---
@@ -257,7 +271,7 @@ def format_price(price):
         return str(price)
 
 def render_card_html(item, is_cheapest=False, price_diff=0):
-    img_src = item.get("img", "")
+    img_src = thumbnail_src(item.get("img", ""))
     source_name = item.get("source", item.get("platform", "Unknown"))
     price_val = format_price(item.get("price"))
     product_url = item.get("url", "#")
@@ -318,7 +332,13 @@ if st.button("Search") and keyword.strip():
     skeleton_placeholder.empty()
 
 if results:
-    grouped = group_similar_products(results)
+    # Cached results are exactly what the grouped query returns, so they are
+    # served grouped from SQL; fresh ones are grouped (and their groups stored)
+    # by SKU and comparison
+    grouped = []
+    if all(item.get("cached") for item in results):
+        grouped = get_storage().get_grouped_results(keyword)
+    grouped = grouped or group_incrementally(results)
     st.write(f"🔍 Found {len(results)} results, grouped into {len(grouped)} products.")
     
     for group in grouped:
@@ -0,0 +1,187 @@
+"""
+Warm-start cache bundle.
+
+pack_bundle() writes a compact, read-only SQLite snapshot of recently seen
+products, their latest prices and their image thumbnails. load_bundle() runs
+at app startup and copies that snapshot into an empty database, so a fresh
+container serves cached results instead of cold scrapes from the first request.
+"""
+import os
+import sqlite3
+from typing import Dict
+from urllib.request import pathname2url
+
+from cosver.database.db import (
+    CACHE_HOURS,
+    _assign_sku,
+    _index_product_name,
+    _link_image,
+    ensure_db,
+    get_db_path,
+    get_image_store,
+)
+from cosver.database.thumbnails import THUMBNAIL_CONTENT_TYPE, read_thumbnail
+
+_BUNDLE_SCHEMA = """
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    brand TEXT,
+    normalized_name TEXT NOT NULL,
+    created_at TIMESTAMP
+);
+CREATE TABLE prices (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    price REAL NOT NULL,
+    url TEXT,
+    img_url TEXT,
+    scraped_at TIMESTAMP
+);
+CREATE TABLE images (
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    img_url TEXT NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE thumbnails (
+    content_hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+
+def _file_uri(path: str) -> str:
+    return "file:" + pathname2url(os.path.abspath(path))
+
+
+def pack_bundle(bundle_path: str, max_age_hours: int = CACHE_HOURS) -> Dict[str, int]:
+    """
+    Pack products with a price seen in the last max_age_hours into bundle_path.
+    Returns the number of products, prices and thumbnails packed.
+    """
+    tmp_path = f"{bundle_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    ensure_db()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_BUNDLE_SCHEMA)
+        conn.execute("ATTACH DATABASE ? AS live", (get_db_path(),))
+        cursor = conn.cursor()
+        cursor.execute("SELECT datetime('now', ?)", (f'-{int(max_age_hours)} hours',))
+        cutoff = cursor.fetchone()[0]
+
+        cursor.execute(
+            """INSERT INTO prices (id, product_id, platform, price, url, img_url, scraped_at)
+               SELECT price_id, product_id, platform, price, url, img_url, scraped_at
+               FROM live.latest_prices
+               WHERE scraped_at >= ?""",
+            (cutoff,)
+        )
+        cursor.execute(
+            """INSERT INTO products (id, name, brand, normalized_name, created_at)
+               SELECT id, name, brand, normalized_name, created_at
+               FROM live.products
+               WHERE id IN (SELECT product_id FROM prices)"""
+        )
+        cursor.execute(
+            """INSERT INTO images (product_id, platform, img_url, content_hash)
+               SELECT product_id, platform, img_url, content_hash
+               FROM live.images
+               WHERE content_hash IS NOT NULL
+                 AND product_id IN (SELECT product_id FROM prices)"""
+        )
+
+        store = get_image_store()
+        hashes = [row[0] for row in cursor.execute("SELECT DISTINCT content_hash FROM images").fetchall()]
+        thumbnails = 0
+        for digest in hashes:
+            thumbnail = read_thumbnail(store, digest)
+            if thumbnail is None:
+                continue
+            cursor.execute("INSERT INTO thumbnails (content_hash, data) VALUES (?, ?)",
+                           (digest, sqlite3.Binary(thumbnail)))
+            thumbnails += 1
+
+        counts = {
+            'products': cursor.execute("SELECT COUNT(*) FROM products").fetchone()[0],
+            'prices': cursor.execute("SELECT COUNT(*) FROM prices").fetchone()[0],
+            'thumbnails': thumbnails,
+        }
+        conn.commit()
+        conn.execute("DETACH DATABASE live")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, bundle_path)
+    return counts
+
+
+def load_bundle(bundle_path: str, max_age_hours: int = CACHE_HOURS) -> int:
+    """
+    Copy a warm-start bundle into the live database if it has no products yet.
+    The bundle is attached read-only. Returns the number of products loaded.
+
+    Prices keep the time they were scraped, and only those of the last
+    max_age_hours are served from cache, so a bundle whose newest price is
+    older than that is skipped with a warning instead of loaded.
+    """
+    if not bundle_path or not os.path.exists(bundle_path):
+        return 0
+
+    ensure_db()
+    # URI filenames must be enabled on the connection for ATTACH ... ?mode=ro
+    conn = sqlite3.connect(_file_uri(get_db_path()), uri=True)
+    try:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM products)").fetchone()[0]:
+            return 0
+
+        conn.execute("ATTACH DATABASE ? AS bundle", (_file_uri(bundle_path) + "?mode=ro",))
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT MAX(scraped_at), MAX(scraped_at) >= datetime('now', ?) FROM bundle.prices",
+            (f'-{int(max_age_hours)} hours',)
+        )
+        newest, fresh = cursor.fetchone()
+        if not fresh:
+            print(f"⚠️ Skipping stale warm-start bundle {bundle_path}: newest price scraped at {newest}, "
+                  f"cache serves the last {max_age_hours} hours")
+            return 0
+        # Triggers keep products_fts and latest_prices in step with these inserts
+        cursor.execute(
+            """INSERT INTO products (id, name, brand, normalized_name, created_at)
+               SELECT id, name, brand, normalized_name, created_at FROM bundle.products"""
+        )
+        loaded = cursor.rowcount
+        # Unlike get_or_create_product, a bulk insert indexes no names and
+        # assigns no SKUs; do both in creation order, as ingest would have
+        for product_id, name, brand in cursor.execute(
+            "SELECT id, name, brand FROM products ORDER BY id"
+        ).fetchall():
+            _index_product_name(cursor, product_id, name)
+            _assign_sku(cursor, product_id, name, brand)
+        cursor.execute(
+            """INSERT INTO prices (id, product_id, platform, price, url, img_url, scraped_at)
+               SELECT id, product_id, platform, price, url, img_url, scraped_at FROM bundle.prices"""
+        )
+
+        store = get_image_store()
+        rows = cursor.execute(
+            """SELECT i.product_id, i.platform, i.img_url, t.data
+               FROM bundle.images i JOIN bundle.thumbnails t ON t.content_hash = i.content_hash"""
+        ).fetchall()
+        for product_id, platform, img_url, data in rows:
+            digest = store.put(data)
+            _link_image(cursor, product_id, platform, img_url, digest, len(data), THUMBNAIL_CONTENT_TYPE)
+
+        conn.commit()
+        conn.execute("DETACH DATABASE bundle")
+    finally:
+        conn.close()
+
+    print(f"🔥 Warm-started cache with {loaded} products from {bundle_path}")
+    return loaded
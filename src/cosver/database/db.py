@@ -1,14 +1,40 @@
 import sqlite3
 import os
-import requests
+import shutil
+import threading
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import re
 
+from cosver.database.image_store import ImageStore
+from cosver.database.thumbnails import delete_thumbnail, ensure_thumbnail, read_thumbnail
+from cosver.database.storage import Storage, CACHE_HOURS
+from cosver.database.writer import DBWriter, get_writer, close_writer
+
 _DB_PATH = os.getenv("COSVER_DB_PATH", "cosver.db")
 _IMAGE_DIR = os.getenv("COSVER_IMAGE_DIR", "downloaded_images")
-CACHE_HOURS = 24
+
+# Schema migrations, applied in order to databases whose PRAGMA user_version
+# is older. Version 1 is the baseline created by schema.sql/fts.sql; schema.sql
+# always describes the current schema, so a fresh database runs every
+# migration as a no-op. Migrations must be idempotent.
+_MIGRATIONS = [
+    (2, "0002_covering_indexes.sql"),
+    (3, "0003_product_name_index.sql"),
+    (4, "0004_image_fingerprints.sql"),
+    (5, "0005_product_groups.sql"),
+    (6, "0006_skus.sql"),
+    (7, "0007_dhash_index.sql"),
+]
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+# Database files whose schema was checked by this process. Nothing touches the
+# filesystem at import time; the first connection to a file initializes or
+# upgrades it.
+_READY = set()
+_READY_LOCK = threading.Lock()
 
 def set_db_path(path: str):
     """Set custom database path (useful for testing)."""
@@ -19,6 +45,19 @@ def get_db_path() -> str:
     """Get current database path."""
     return _DB_PATH
 
+def set_image_dir(path: str):
+    """Set custom image store directory (useful for testing)."""
+    global _IMAGE_DIR
+    _IMAGE_DIR = path
+
+def get_image_dir() -> str:
+    """Get current image store directory."""
+    return _IMAGE_DIR
+
+def get_image_store(base_dir: str = None) -> ImageStore:
+    """Get the content-addressed image store (defaults to COSVER_IMAGE_DIR)."""
+    return ImageStore(base_dir if base_dir is not None else _IMAGE_DIR)
+
 def normalize_name(name: str) -> str:
     """Normalize product name for matching."""
     if not name:
@@ -29,36 +68,362 @@ def normalize_name(name: str) -> str:
     normalized = re.sub(r'\s+', ' ', normalized).strip()
     return normalized
 
-def init_db():
+def init_db(db_path: str = None):
     """Initialize database and create tables."""
-    conn = sqlite3.connect(get_db_path())
+    db_path = db_path or get_db_path()
+    conn = sqlite3.connect(db_path)
+    # Must be set before the first table exists; lets retention free pages incrementally
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    _apply_schema(conn)
+    conn.close()
+    with _READY_LOCK:
+        _READY.add(db_path)
+    print(f"✅ Database initialized: {db_path}")
+
+def ensure_db(db_path: str = None):
+    """
+    Make sure the database file exists and its schema is current.
+    Cheap after the first call per file: a set lookup, no I/O.
+    """
+    db_path = db_path or get_db_path()
+    if db_path in _READY:
+        return
+    if not os.path.exists(db_path):
+        init_db(db_path)
+        return
+    with _READY_LOCK:
+        if db_path in _READY:
+            return
+        conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Database {db_path} has schema version {version}, "
+                    f"newer than this code supports ({SCHEMA_VERSION})"
+                )
+            if version < SCHEMA_VERSION:
+                print(f"🔧 Upgrading database schema {version} -> {SCHEMA_VERSION}: {db_path}")
+                _apply_schema(conn)
+        finally:
+            conn.close()
+        _READY.add(db_path)
+
+def get_connection(db_path: str = None, timeout: float = None) -> sqlite3.Connection:
+    """Open a connection, initializing or upgrading the database on first use."""
+    db_path = db_path or get_db_path()
+    ensure_db(db_path)
+    return sqlite3.connect(db_path, timeout=LOCK_TIMEOUT if timeout is None else timeout)
+
+def _db_exists() -> bool:
+    """Whether the database file exists; lookups skip get_connection, which would create it."""
+    return os.path.exists(get_db_path())
+
+def _apply_schema(conn):
+    """
+    Create missing tables/indexes and upgrade legacy tables in place.
+    Every step is idempotent, so re-running it on a current database is harmless.
+    """
     cursor = conn.cursor()
+    # WAL lets readers keep their own connections while the single writer commits
+    cursor.execute("PRAGMA journal_mode = WAL")
     
     # Read and execute schema
     schema_path = Path(__file__).parent / "schema.sql"
     with open(schema_path, 'r') as f:
         schema = f.read()
     
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products'")
+    is_new = cursor.fetchone() is None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'latest_prices'")
+    had_latest_prices = cursor.fetchone() is not None
+    
+    # Legacy images tables lack content_hash, which schema.sql indexes
+    _add_images_content_hash(cursor)
     cursor.executescript(schema)
+    _upgrade_images_table(conn)
+    _apply_fts(conn)
+    if not had_latest_prices:
+        _rebuild_latest_prices(cursor)
+    if is_new:
+        # schema.sql already is the current schema
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
-    conn.close()
-    print(f"✅ Database initialized: {get_db_path()}")
+    if not is_new:
+        _migrate(conn)
+
+def _migrate(conn) -> int:
+    """
+    Apply pending migrations, each in its own transaction together with its
+    PRAGMA user_version bump, then refresh planner statistics.
+    Returns the number of migrations applied.
+    """
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    pending = [(v, name) for v, name in _MIGRATIONS if v > current]
+    for version, name in pending:
+        with open(Path(__file__).parent / "migrations" / name, 'r') as f:
+            sql = f.read()
+        # WAL readers keep running while indexes are built; only writers wait
+        conn.executescript(f"BEGIN IMMEDIATE;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;")
+        print(f"🔧 Applied migration {name}")
+    if pending:
+        analyze_db(conn=conn)
+    return len(pending)
+
+def analyze_db(db_path: str = None, conn=None):
+    """
+    Refresh the query planner's statistics (ANALYZE).
+    analysis_limit keeps this fast on large tables by sampling each index.
+    """
+    should_close = conn is None
+    if conn is None:
+        conn = get_connection(db_path)
+    try:
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        if should_close:
+            conn.close()
+
+def _apply_fts(conn):
+    """
+    Create the FTS5 trigram index over product names.
+    The index is rebuilt from products when it is first created, so existing
+    databases are backfilled. SQLite builds without FTS5/trigram fall back to LIKE.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+    existed = cursor.fetchone() is not None
+    
+    fts_path = Path(__file__).parent / "fts.sql"
+    with open(fts_path, 'r') as f:
+        fts_schema = f.read()
+    
+    try:
+        cursor.executescript(fts_schema)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ Full-text index unavailable, using LIKE search: {e}")
+        return
+    
+    if not existed:
+        cursor.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+def _has_fts(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+    return cursor.fetchone() is not None
 
-def _recover_db():
+# Trigram tokens need at least three characters to hit the index
+_FTS_MIN_CHARS = 3
+
+def _product_match_sql(cursor, normalized_keyword: str):
+    """
+    Build a query selecting (id, name, brand, rank) for products whose
+    normalized name contains the keyword. Returns (sql, params).
+    Uses an indexed FTS5 MATCH ranked by bm25 when possible; keywords shorter
+    than a trigram (or databases without FTS5) fall back to a LIKE scan.
+    """
+    if len(normalized_keyword) >= _FTS_MIN_CHARS and _has_fts(cursor):
+        # A quoted trigram phrase matches exactly the same substrings as LIKE '%kw%'
+        phrase = '"' + normalized_keyword.replace('"', '""') + '"'
+        sql = """SELECT p.id, p.name, p.brand, f.rank AS rank
+                 FROM products_fts f
+                 JOIN products p ON p.id = f.rowid
+                 WHERE products_fts MATCH ?"""
+        return sql, (phrase,)
+    
+    sql = """SELECT p.id, p.name, p.brand, 0 AS rank
+             FROM products p
+             WHERE p.normalized_name LIKE ?"""
+    return sql, (f'%{normalized_keyword}%',)
+
+def find_products(cursor, normalized_keyword: str) -> List[tuple]:
+    """Find (id, name, brand) rows whose normalized name contains the keyword, best match first."""
+    sql, params = _product_match_sql(cursor, normalized_keyword)
+    cursor.execute(f"SELECT id, name, brand FROM ({sql}) ORDER BY rank", params)
+    return cursor.fetchall()
+
+def _add_images_content_hash(cursor):
+    """Add the content_hash column to an existing images table that predates it."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(images)")}
+    if columns and 'content_hash' not in columns:
+        cursor.execute("ALTER TABLE images ADD COLUMN content_hash TEXT")
+
+def _upgrade_images_table(conn):
+    """
+    Move a legacy images table (inline image_data BLOBs) onto the image store.
+    Safe to run repeatedly; does nothing once content_hash is in place.
+    """
+    cursor = conn.cursor()
+    _add_images_content_hash(cursor)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(images)")}
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash)")
+
+    if 'image_data' not in columns:
+        return
+
+    store = get_image_store()
+    rows = cursor.execute(
+        "SELECT id, image_data FROM images WHERE image_data IS NOT NULL AND content_hash IS NULL"
+    ).fetchall()
+    for image_id, image_data in rows:
+        digest = store.put(bytes(image_data))
+        _retain_blob(cursor, digest, len(image_data), None)
+        cursor.execute(
+            "UPDATE images SET content_hash = ?, image_data = NULL WHERE id = ?",
+            (digest, image_id)
+        )
+    if rows:
+        print(f"📦 Moved {len(rows)} inline image BLOBs to {store.root}")
+
+def _rebuild_latest_prices(cursor) -> int:
+    """
+    Repopulate latest_prices from the prices history. Returns the row count.
+    A row still pointing at the newest price keeps its scraped_at and img_url,
+    which unchanged-price observations refresh without writing history; rows
+    whose history was compacted away entirely are left as they are.
+    """
+    cursor.execute(
+        """INSERT INTO latest_prices (product_id, platform, price_id, price, url, img_url, scraped_at)
+           SELECT product_id, platform, id, price, url, img_url, scraped_at
+           FROM (
+               SELECT *, ROW_NUMBER() OVER (
+                   PARTITION BY product_id, platform
+                   ORDER BY scraped_at DESC, id DESC
+               ) AS rn
+               FROM prices
+           )
+           WHERE rn = 1
+           ON CONFLICT(product_id, platform) DO UPDATE SET
+               price = excluded.price,
+               url = excluded.url,
+               img_url = CASE WHEN price_id = excluded.price_id
+                              THEN img_url ELSE excluded.img_url END,
+               scraped_at = CASE WHEN price_id = excluded.price_id
+                                 THEN MAX(scraped_at, excluded.scraped_at) ELSE excluded.scraped_at END,
+               price_id = excluded.price_id"""
+    )
+    return cursor.rowcount
+
+def rebuild_latest_prices() -> int:
+    """
+    Rebuild the latest_prices table from the full prices history.
+    Only needed if the two drifted apart (e.g. prices edited by hand).
     """
-    Attempts to recover from a corrupted database by deleting and re-initializing it.
-    This is a destructive operation but acceptable for a scraper cache.
+    return _retry_on_busy(lambda: SQLiteStorage().writer().submit(_rebuild_latest_prices).result())
+
+# Lock handling: each connection waits LOCK_TIMEOUT seconds for a lock, then
+# the whole operation is retried LOCK_RETRIES times with exponential backoff
+LOCK_TIMEOUT = 5.0
+LOCK_RETRIES = 4
+LOCK_BACKOFF = 0.1
+_BUSY_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+
+def _is_busy_error(error: Exception) -> bool:
+    """True for transient lock contention, which is never a sign of corruption."""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        msg in str(error).lower() for msg in _BUSY_MESSAGES
+    )
+
+def _retry_on_busy(operation, retries: int = None):
+    """Run operation(), retrying with exponential backoff while the database is locked."""
+    retries = LOCK_RETRIES if retries is None else retries
+    delay = LOCK_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e) or attempt == retries:
+                raise
+            print(f"⏳ Database busy ({e}), retrying in {delay:.2f}s...")
+            time.sleep(delay)
+            delay *= 2
+
+def _quick_check(db_path: str) -> bool:
+    """Return True if SQLite's PRAGMA quick_check reports the file as intact."""
+    try:
+        conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT)
+        try:
+            rows = conn.execute("PRAGMA quick_check").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        # A locked file cannot be checked; contention alone never means corruption
+        return _is_busy_error(e)
+    return rows == [('ok',)]
+
+def _backup_path(db_path: str) -> str:
+    return f"{db_path}.bak"
+
+def backup_db(db_path: str = None) -> str:
     """
+    Write a consistent online backup of the database next to it (<db>.bak).
+    Used by _recover_db as the restore source. Returns the backup path.
+    """
+    db_path = db_path or get_db_path()
+    backup_path = _backup_path(db_path)
+    tmp_path = f"{backup_path}.tmp"
+    
+    source = get_connection(db_path)
+    target = sqlite3.connect(tmp_path)
     try:
-        db_path = get_db_path()
-        if os.path.exists(db_path):
-            print(f"⚠️ Detected database corruption. Deleting {db_path}...")
-            os.remove(db_path)
-        init_db()
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, backup_path)
+    return backup_path
+
+def _quarantine_db(db_path: str) -> Optional[str]:
+    """Move a damaged database (and its WAL/SHM files) aside instead of deleting it."""
+    if not os.path.exists(db_path):
+        return None
+    with _READY_LOCK:
+        _READY.discard(db_path)
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    quarantine_path = f"{db_path}.corrupt-{stamp}"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.replace(db_path + suffix, quarantine_path + suffix)
+    return quarantine_path
+
+def _recover_db(db_path: str = None):
+    """
+    Last-resort recovery for a database that failed PRAGMA quick_check.
+    The damaged file is quarantined (never deleted), then restored from the
+    last backup if that backup is intact, or re-initialized empty otherwise.
+    """
+    try:
+        db_path = db_path or get_db_path()
+        close_writer(db_path)
+        quarantine_path = _quarantine_db(db_path)
+        if quarantine_path:
+            print(f"⚠️ Detected database corruption. Moved {db_path} to {quarantine_path}")
+        
+        backup_path = _backup_path(db_path)
+        if os.path.exists(backup_path) and _quick_check(backup_path):
+            shutil.copyfile(backup_path, db_path)
+            print(f"♻️ Restored database from backup {backup_path}")
+        init_db(db_path)
         print("✅ Database successfully recovered.")
     except Exception as e:
         print(f"❌ Failed to recover database: {e}")
 
+def _handle_db_error(error: sqlite3.DatabaseError, db_path: str):
+    """
+    Decide what a database error means before touching the file.
+    Lock contention is left alone, errors on an intact file (e.g. a missing
+    table) re-apply the schema, and only confirmed corruption is recovered.
+    """
+    if _is_busy_error(error):
+        print(f"⚠️ Database still locked after retries: {error}")
+        return
+    if _quick_check(db_path):
+        print(f"⚠️ SQLite error on an intact database, re-applying schema: {error}")
+        init_db(db_path)
+        return
+    _recover_db(db_path)
+
 def get_or_create_product(cursor, name: str, brand: str) -> int:
     """Get existing product ID or create new product."""
     normalized = normalize_name(name)
@@ -78,265 +443,920 @@ def get_or_create_product(cursor, name: str, brand: str) -> int:
         "INSERT INTO products (name, brand, normalized_name) VALUES (?, ?, ?)",
         (name, brand, normalized)
     )
-    return cursor.lastrowid
+    product_id = cursor.lastrowid
+    _index_product_name(cursor, product_id, name)
+    _assign_sku(cursor, product_id, name, brand)
+    return product_id
 
-def save_product(product_data: Dict[str, Any]) -> int:
+# Near-duplicate linking: products whose names agree on at least this share of
+# MinHash positions are recorded in product_links when the newer one is created
+LINK_MIN_JACCARD = 0.6
+_NAME_HASHER = None
+
+def _name_hasher():
+    """Shared MinHasher; numpy is only loaded once names are actually indexed."""
+    global _NAME_HASHER
+    if _NAME_HASHER is None:
+        from cosver.aggregator.minhash import MinHasher
+        _NAME_HASHER = MinHasher()
+    return _NAME_HASHER
+
+def _similar_product_ids(cursor, signature, min_jaccard: float) -> List[tuple]:
     """
-    Save product and price data to database.
-    Returns product_id.
+    (product_id, estimated Jaccard) of indexed products sharing an LSH band
+    with signature, best first. Only the matching buckets are read.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    import numpy as np
+    from cosver.aggregator.minhash import band_hashes, estimate_jaccard
     
-    try:
-        # Get or create product
-        product_id = get_or_create_product(
-            cursor,
-            product_data.get('name', ''),
-            product_data.get('brand', '')
-        )
-        
-        # Save price record
-        cursor.execute(
-            """INSERT INTO prices (product_id, platform, price, url, img_url)
-               VALUES (?, ?, ?, ?, ?)""",
-            (
-                product_id,
-                product_data.get('platform', ''),
-                product_data.get('price', 0),
-                product_data.get('url', ''),
-                product_data.get('img', '')
+    buckets = band_hashes(signature)
+    cursor.execute(
+        f"""SELECT DISTINCT s.product_id, s.signature
+            FROM product_lsh_buckets b
+            JOIN product_signatures s ON s.product_id = b.product_id
+            WHERE b.bucket IN ({','.join('?' * len(buckets))})""",
+        buckets
+    )
+    scored = [
+        (product_id, estimate_jaccard(signature, np.frombuffer(blob, dtype=np.uint64)))
+        for product_id, blob in cursor.fetchall()
+    ]
+    return sorted((item for item in scored if item[1] >= min_jaccard), key=lambda item: -item[1])
+
+def _index_product_name(cursor, product_id: int, name: str) -> int:
+    """
+    Add a product's name signature to the LSH index and link it to existing
+    near-duplicate products. Returns the number of links written.
+    """
+    from cosver.aggregator.minhash import band_hashes
+    
+    signature = _name_hasher().name_signature(name)
+    links = [
+        (product_id, linked_id, similarity)
+        for linked_id, similarity in _similar_product_ids(cursor, signature, LINK_MIN_JACCARD)
+        if linked_id != product_id
+    ]
+    cursor.executemany(
+        "INSERT OR REPLACE INTO product_links (product_id, linked_id, similarity) VALUES (?, ?, ?)",
+        links
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO product_signatures (product_id, signature) VALUES (?, ?)",
+        (product_id, signature.tobytes())
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO product_lsh_buckets (bucket, product_id) VALUES (?, ?)",
+        [(bucket, product_id) for bucket in band_hashes(signature)]
+    )
+    return len(links)
+
+def index_product_names(batch_size: int = 1000) -> int:
+    """
+    Index (and link) products created before the name index existed.
+    Returns the number of products indexed.
+    """
+    indexed = 0
+    while True:
+        def index_batch(cursor):
+            cursor.execute(
+                """SELECT id, name FROM products
+                   WHERE id NOT IN (SELECT product_id FROM product_signatures)
+                   ORDER BY id LIMIT ?""",
+                (batch_size,)
             )
-        )
+            rows = cursor.fetchall()
+            for product_id, name in rows:
+                _index_product_name(cursor, product_id, name)
+            return len(rows)
         
-        conn.commit()
-        return product_id
+        count = SQLiteStorage().writer().submit(index_batch).result()
+        indexed += count
+        if count < batch_size:
+            return indexed
+
+def find_similar_products(name: str, min_jaccard: float = LINK_MIN_JACCARD) -> List[tuple]:
+    """
+    Find stored products whose names are near duplicates of name, using the
+    LSH index instead of scanning products.
+    Returns (id, name, brand, similarity) tuples, most similar first.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        signature = _name_hasher().name_signature(name)
+        matches = _similar_product_ids(cursor, signature, min_jaccard)
+        results = []
+        for product_id, similarity in matches:
+            cursor.execute("SELECT name, brand FROM products WHERE id = ?", (product_id,))
+            row = cursor.fetchone()
+            if row:
+                results.append((product_id, row[0], row[1], similarity))
+        return results
     finally:
         conn.close()
 
-def save_products_batch(products: List[Dict[str, Any]]):
-    """Save multiple products in a single transaction."""
-    if not products:
-        return
+# SKU assignment: a new product joins the SKU of an existing product with the
+# same make_sku_key, else that of a linked near-duplicate (see product_links)
+# whose name matches at least this SequenceMatcher ratio, as in grouping
+SKU_MATCH_RATIO = 0.7
+
+def _matching_sku(cursor, product_id: int, name: str, brand: str) -> Optional[int]:
+    """SKU of the most similar linked product that matches name, if any."""
+    from difflib import SequenceMatcher
+    from cosver.aggregator.blocking import block_key, compatible
+    from cosver.aggregator.normalize import normalize_brand
     
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT p.name, p.brand, ps.sku_id
+           FROM product_links l
+           JOIN products p ON p.id = l.linked_id
+           JOIN product_skus ps ON ps.product_id = l.linked_id
+           WHERE l.product_id = ?
+           ORDER BY l.similarity DESC, l.linked_id""",
+        (product_id,)
+    )
+    for other_name, other_brand, sku_id in cursor.fetchall():
+        # Type, volume and a brand named in both titles must not contradict
+        brands = sorted({normalize_brand(brand), normalize_brand(other_brand)} - {""}, key=len, reverse=True)
+        if not compatible(block_key({'name': name}, brands), block_key({'name': other_name}, brands)):
+            continue
+        if SequenceMatcher(None, name, other_name).ratio() >= SKU_MATCH_RATIO:
+            return sku_id
+    return None
+
+def _assign_sku(cursor, product_id: int, name: str, brand: str) -> int:
+    """Assign a product to an existing or new SKU. Returns the sku id."""
+    from cosver.aggregator.normalize import make_sku_key
     
-    try:
-        for product in products:
-            product_id = get_or_create_product(
-                cursor,
-                product.get('name', ''),
-                product.get('brand', '')
-            )
-            
+    sku_key = make_sku_key(brand, name)
+    cursor.execute(
+        """SELECT sku_id FROM product_skus WHERE sku_key = ?
+           UNION ALL
+           SELECT id FROM skus WHERE sku_key = ?
+           LIMIT 1""",
+        (sku_key, sku_key)
+    )
+    row = cursor.fetchone()
+    sku_id = row[0] if row else _matching_sku(cursor, product_id, name, brand)
+    if sku_id is None:
+        cursor.execute(
+            "INSERT INTO skus (sku_key, name, brand) VALUES (?, ?, ?)",
+            (sku_key, name, brand)
+        )
+        sku_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT OR REPLACE INTO product_skus (product_id, sku_key, sku_id) VALUES (?, ?, ?)",
+        (product_id, sku_key, sku_id)
+    )
+    return sku_id
+
+def assign_skus(batch_size: int = 1000) -> int:
+    """
+    Assign SKUs to products created before the SKU table existed, oldest first.
+    Returns the number of products assigned.
+    """
+    assigned = 0
+    while True:
+        def assign_batch(cursor):
             cursor.execute(
-                """INSERT INTO prices (product_id, platform, price, url, img_url)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (
-                    product_id,
-                    product.get('platform', ''),
-                    product.get('price', 0),
-                    product.get('url', ''),
-                    product.get('img', '')
-                )
+                """SELECT id, name, brand FROM products
+                   WHERE id NOT IN (SELECT product_id FROM product_skus)
+                   ORDER BY id LIMIT ?""",
+                (batch_size,)
             )
-            
-            # Also download and save image as BLOB
-            if product.get('img'):
-                download_and_save_image(product_id, product.get('platform', ''), product.get('img'), conn=conn)
+            rows = cursor.fetchall()
+            for product_id, name, brand in rows:
+                _assign_sku(cursor, product_id, name, brand)
+            return len(rows)
         
-        conn.commit()
-        print(f"💾 Saved {len(products)} products and their images to database")
-    finally:
-        conn.close()
+        count = SQLiteStorage().writer().submit(assign_batch).result()
+        assigned += count
+        if count < batch_size:
+            return assigned
 
-def get_cached_results(keyword: str, max_age_hours: int = CACHE_HOURS) -> List[Dict[str, Any]]:
+# Values bound per IN list; older SQLite builds allow at most 999 host parameters
+_IN_CHUNK = 500
+
+def _select_in(cursor, sql: str, values: List) -> Iterator[tuple]:
     """
-    Get cached results for a keyword.
-    Returns results scraped within max_age_hours.
+    Run sql with its {params} IN list bound to values, in chunks that stay
+    below SQLite's host parameter limit. Yields the result rows.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    values = list(dict.fromkeys(values))
+    for start in range(0, len(values), _IN_CHUNK):
+        chunk = values[start:start + _IN_CHUNK]
+        yield from cursor.execute(sql.format(params=','.join('?' * len(chunk))), chunk).fetchall()
+
+def get_product_skus(product_ids: List[int]) -> Dict[int, int]:
+    """Return the sku id of each of product_ids that has one."""
+    return SQLiteStorage().get_product_skus(product_ids)
+
+def get_product_groups(product_ids: List[int]) -> Dict[int, int]:
+    """Return the stored group id of each of product_ids that has one."""
+    return SQLiteStorage().get_product_groups(product_ids)
+
+def save_product_groups(groups: Dict[int, int]) -> int:
+    """Store product_id -> group_id memberships. Returns the number of rows written."""
+    return SQLiteStorage().save_product_groups(groups)
+
+def insert_price(cursor, product_id: int, product_data: Dict[str, Any]) -> bool:
+    """
+    Record a price observation for a product.
+    If price and URL are unchanged since the last observation on that platform,
+    no history row is written; only latest_prices.scraped_at is refreshed.
+    Returns True if a new prices row was inserted.
+    """
+    platform = product_data.get('platform', '')
+    price = product_data.get('price', 0)
+    url = product_data.get('url', '')
+    img_url = product_data.get('img', '')
     
-    try:
-        normalized_keyword = normalize_name(keyword)
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+    cursor.execute(
+        """UPDATE latest_prices SET scraped_at = CURRENT_TIMESTAMP, img_url = ?
+           WHERE product_id = ? AND platform = ? AND price = ? AND url IS ?""",
+        (img_url, product_id, platform, price, url)
+    )
+    if cursor.rowcount:
+        return False
+    
+    cursor.execute(
+        """INSERT INTO prices (product_id, platform, price, url, img_url)
+           VALUES (?, ?, ?, ?, ?)""",
+        (product_id, platform, price, url, img_url)
+    )
+    return True
+
+def _write_product(cursor, product_data: Dict[str, Any]) -> int:
+    """Get or create the product and record its price. Returns product_id."""
+    product_id = get_or_create_product(
+        cursor,
+        product_data.get('name', ''),
+        product_data.get('brand', '')
+    )
+    insert_price(cursor, product_id, product_data)
+    return product_id
+
+def iter_cached_results(cursor, keyword: str, max_age_hours: int = CACHE_HOURS) -> Iterator[Dict[str, Any]]:
+    """
+    Stream cached results for a keyword from a single query.
+    Yields the latest price per (product, platform) from latest_prices if it
+    was scraped within max_age_hours, best keyword match first.
+    """
+    normalized_keyword = normalize_name(keyword)
+    cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+    match_sql, match_params = _product_match_sql(cursor, normalized_keyword)
+    
+    rows = cursor.execute(
+        f"""WITH matched AS ({match_sql})
+            SELECT m.id, m.name, m.brand, lp.platform, lp.price, lp.url, lp.img_url
+            FROM matched m
+            JOIN latest_prices lp ON lp.product_id = m.id
+            WHERE lp.scraped_at >= ?
+            ORDER BY m.rank, m.id, lp.scraped_at DESC""",
+        (*match_params, cutoff_time)
+    )
+    
+    for product_id, name, brand, platform, price, url, img_url in rows:
+        yield {
+            'product_id': product_id,
+            'name': name,
+            'brand': brand,
+            'platform': platform,
+            'price': price,
+            'url': url,
+            'img': img_url,
+            'source': platform,
+            'cached': True
+        }
+
+def iter_grouped_results(cursor, keyword: str, max_age_hours: int = CACHE_HOURS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream cached results for a keyword grouped from a single query, best
+    keyword match first and each group cheapest first. Products are grouped
+    by their stored group (product_groups), else by the stored group of
+    another listing of their SKU, else by their SKU.
+    """
+    normalized_keyword = normalize_name(keyword)
+    cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+    match_sql, match_params = _product_match_sql(cursor, normalized_keyword)
+    
+    rows = cursor.execute(
+        f"""WITH matched AS ({match_sql}),
+            fresh AS (
+                SELECT COALESCE(
+                           'g' || pg.group_id,
+                           'g' || (SELECT MIN(sg.group_id)
+                                   FROM product_skus s
+                                   JOIN product_groups sg ON sg.product_id = s.product_id
+                                   WHERE s.sku_id = ps.sku_id),
+                           's' || ps.sku_id,
+                           'p' || m.id
+                       ) AS group_key,
+                       m.rank, m.id, m.name, m.brand, lp.platform, lp.price, lp.url, lp.img_url
+                FROM matched m
+                JOIN latest_prices lp ON lp.product_id = m.id
+                LEFT JOIN product_groups pg ON pg.product_id = m.id
+                LEFT JOIN product_skus ps ON ps.product_id = m.id
+                WHERE lp.scraped_at >= ?
+            )
+            SELECT group_key, id, name, brand, platform, price, url, img_url
+            FROM fresh
+            ORDER BY MIN(rank) OVER (PARTITION BY group_key), group_key, price, platform""",
+        (*match_params, cutoff_time)
+    )
+    
+    group, current = [], None
+    for group_key, product_id, name, brand, platform, price, url, img_url in rows:
+        if group and group_key != current:
+            yield group
+            group = []
+        current = group_key
+        group.append({
+            'product_id': product_id,
+            'name': name,
+            'brand': brand,
+            'platform': platform,
+            'price': price,
+            'url': url,
+            'img': img_url,
+            'source': platform,
+            'cached': True
+        })
+    if group:
+        yield group
+
+class SQLiteStorage(Storage):
+    """
+    Storage backed by a local SQLite file.
+    Without an explicit path it follows get_db_path(), so set_db_path() applies.
+    """
+    
+    def __init__(self, db_path: str = None):
+        self._db_path = db_path
+    
+    @property
+    def db_path(self) -> str:
+        return self._db_path or get_db_path()
+    
+    def connect(self) -> sqlite3.Connection:
+        return get_connection(self.db_path)
+    
+    def init_schema(self):
+        init_db(self.db_path)
+    
+    def writer(self) -> DBWriter:
+        """The process-wide single writer for this database file."""
+        ensure_db(self.db_path)
+        return get_writer(self.db_path, timeout=LOCK_TIMEOUT)
+    
+    def save_product(self, product_data: Dict[str, Any]) -> int:
+        """
+        Save product and price data to database.
+        Returns product_id.
+        """
+        return _retry_on_busy(
+            lambda: self.writer().submit(lambda cursor: _write_product(cursor, product_data)).result()
+        )
+    
+    def save_products_batch(self, products: List[Dict[str, Any]]) -> List[int]:
+        """
+        Save multiple products in a single transaction.
+        Images are downloaded outside the writer, then linked in a second transaction.
+        Returns the product_id of each product, in order.
+        """
+        if not products:
+            return []
         
-        # Find products matching the keyword
-        cursor.execute(
-            """SELECT DISTINCT p.id, p.name, p.brand
-               FROM products p
-               WHERE p.normalized_name LIKE ?""",
-            (f'%{normalized_keyword}%',)
+        product_ids = _retry_on_busy(
+            lambda: self.writer().submit(
+                lambda cursor: [_write_product(cursor, product) for product in products]
+            ).result()
         )
         
-        product_ids = cursor.fetchall()
+        # Also download the images into the content-addressed store and
+        # fingerprint them for the dHash index
+        links, fingerprints = self._fetch_images(zip(product_ids, products))
+        store = get_image_store()
+        
+        def link_and_collect(cursor):
+            for link in links:
+                _link_image(cursor, *link)
+            for digest, record in fingerprints.items():
+                _save_fingerprint(cursor, digest, *record)
+            return _delete_orphaned_blobs(cursor)
+        
+        orphaned = _retry_on_busy(lambda: self.writer().submit(link_and_collect).result())
+        for digest in orphaned:
+            store.delete(digest)
+            delete_thumbnail(store, digest)
         
+        print(f"💾 Saved {len(products)} products and their images to database")
+        return product_ids
+    
+    def _fetch_images(self, saved) -> Tuple[List[tuple], Dict[str, tuple]]:
+        """
+        Fetch and fingerprint images on a read connection. Returns the rows
+        _link_image still has to write and the fingerprint records still to
+        be stored, by digest.
+        """
+        store = get_image_store()
+        links = []
+        fingerprints = {}
+        fetched_by_url = {}
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            for product_id, product in saved:
+                img_url = product.get('img')
+                if not img_url:
+                    continue
+                platform = product.get('platform', '')
+                try:
+                    fetched = fetched_by_url.get(img_url) or _fetch_image(cursor, product_id, platform, img_url, store)
+                    if fetched is not None:
+                        ensure_thumbnail(store, fetched[0])
+                        if fetched[0] not in fingerprints:
+                            fingerprints[fetched[0]] = _new_fingerprint(cursor, store, fetched[0])
+                except Exception as e:
+                    print(f"❌ Failed to download/save image: {e}")
+                    continue
+                if fetched is None:
+                    continue
+                digest, size, content_type, needs_link = fetched
+                if needs_link:
+                    fetched_by_url[img_url] = fetched
+                    links.append((product_id, platform, img_url, digest, size, content_type))
+        finally:
+            conn.close()
+        return links, {digest: record for digest, record in fingerprints.items() if record is not None}
+    
+    def find_products(self, keyword: str) -> List[tuple]:
+        conn = self.connect()
+        try:
+            return find_products(conn.cursor(), normalize_name(keyword))
+        finally:
+            conn.close()
+    
+    def get_cached_results(self, keyword: str, max_age_hours: int = CACHE_HOURS) -> List[Dict[str, Any]]:
+        """
+        Get cached results for a keyword.
+        Returns the latest price per product and platform scraped within max_age_hours.
+        """
+        try:
+            return _retry_on_busy(lambda: self._get_cached_results(keyword, max_age_hours))
+        except sqlite3.DatabaseError as e:
+            print(f"⚠️ SQLite error in get_cached_results: {e}")
+            _handle_db_error(e, self.db_path)
+            return [] # Return empty to force a fresh scrape
+    
+    def _get_cached_results(self, keyword: str, max_age_hours: int) -> List[Dict[str, Any]]:
+        conn = self.connect()
+        try:
+            return list(iter_cached_results(conn.cursor(), keyword, max_age_hours))
+        finally:
+            conn.close()
+    
+    def _lookup(self, sql: str, product_ids: List[int]) -> Dict[int, int]:
         if not product_ids:
-            return []
+            return {}
+        conn = self.connect()
+        try:
+            return dict(_select_in(conn.cursor(), sql, product_ids))
+        finally:
+            conn.close()
+    
+    def get_product_skus(self, product_ids: List[int]) -> Dict[int, int]:
+        return self._lookup(
+            "SELECT product_id, sku_id FROM product_skus WHERE product_id IN ({params})", product_ids
+        )
+    
+    def get_product_groups(self, product_ids: List[int]) -> Dict[int, int]:
+        return self._lookup(
+            "SELECT product_id, group_id FROM product_groups WHERE product_id IN ({params})", product_ids
+        )
+    
+    def save_product_groups(self, groups: Dict[int, int]) -> int:
+        if not groups:
+            return 0
+        rows = list(groups.items())
         
-        results = []
-        for product_id, name, brand in product_ids:
-            # Get recent prices for this product
-            cursor.execute(
-                """SELECT platform, price, url, img_url, scraped_at
-                   FROM prices
-                   WHERE product_id = ? AND scraped_at >= ?
-                   ORDER BY scraped_at DESC""",
-                (product_id, cutoff_time)
+        def upsert(cursor):
+            cursor.executemany(
+                """INSERT INTO product_groups (product_id, group_id) VALUES (?, ?)
+                   ON CONFLICT(product_id) DO UPDATE SET group_id = excluded.group_id""",
+                rows
             )
-            
-            prices = cursor.fetchall()
-            for platform, price, url, img_url, scraped_at in prices:
-                results.append({
-                    'name': name,
-                    'brand': brand,
-                    'platform': platform,
-                    'price': price,
-                    'url': url,
-                    'img': img_url,
-                    'source': platform,
-                    'cached': True
-                })
+            return len(rows)
         
-        return results
-    except sqlite3.OperationalError as e:
-        print(f"⚠️ SQLite operational error in get_cached_results: {e}")
-        conn.close() # Ensure connection is closed before recovery
-        _recover_db()
-        return [] # Return empty to force a fresh scrape
-    finally:
-        # Check if connection is open before closing (it might be closed in except block)
+        return _retry_on_busy(lambda: self.writer().submit(upsert).result())
+    
+    def get_grouped_results(self, keyword: str, max_age_hours: int = CACHE_HOURS) -> List[List[Dict[str, Any]]]:
+        """
+        Get cached results for a keyword grouped, each group cheapest first.
+        Groups were decided at ingest and by earlier groupings, so nothing is compared here.
+        """
+        conn = self.connect()
         try:
+            return list(iter_grouped_results(conn.cursor(), keyword, max_age_hours))
+        finally:
             conn.close()
-        except:
-            pass
+
+def save_product(product_data: Dict[str, Any]) -> int:
+    """
+    Save product and price data to database.
+    Returns product_id.
+    """
+    return SQLiteStorage().save_product(product_data)
+
+def save_products_batch(products: List[Dict[str, Any]]) -> List[int]:
+    """Save multiple products in a single transaction. Returns their product ids."""
+    return SQLiteStorage().save_products_batch(products)
+
+def get_cached_results(keyword: str, max_age_hours: int = CACHE_HOURS) -> List[Dict[str, Any]]:
+    """
+    Get cached results for a keyword.
+    Returns the latest price per product and platform scraped within max_age_hours.
+    """
+    return SQLiteStorage().get_cached_results(keyword, max_age_hours)
+
+def get_grouped_results(keyword: str, max_age_hours: int = CACHE_HOURS) -> List[List[Dict[str, Any]]]:
+    """Get cached results for a keyword grouped, each group cheapest first."""
+    return SQLiteStorage().get_grouped_results(keyword, max_age_hours)
+
+def _retain_blob(cursor, digest: str, size: int, content_type: Optional[str]):
+    """Register a reference to a stored image, creating its row if needed."""
+    cursor.execute(
+        """INSERT INTO image_blobs (hash, size, content_type, refcount)
+           VALUES (?, ?, ?, 1)
+           ON CONFLICT(hash) DO UPDATE SET refcount = refcount + 1""",
+        (digest, size, content_type)
+    )
+
+def _release_blob(cursor, digest: str):
+    """Drop a reference to a stored image. Files are removed by prune_image_store."""
+    cursor.execute(
+        "UPDATE image_blobs SET refcount = refcount - 1 WHERE hash = ?",
+        (digest,)
+    )
+
+def _link_image(cursor, product_id: int, platform: str, img_url: str,
+                digest: str, size: int, content_type: Optional[str]):
+    """Point (product_id, platform) at a stored image, keeping refcounts in step."""
+    cursor.execute(
+        "SELECT content_hash FROM images WHERE product_id = ? AND platform = ?",
+        (product_id, platform)
+    )
+    row = cursor.fetchone()
+    previous = row[0] if row else None
+    if previous == digest:
+        return
+
+    _retain_blob(cursor, digest, size, content_type)
+    if row:
+        cursor.execute(
+            """UPDATE images SET img_url = ?, content_hash = ?, downloaded_at = CURRENT_TIMESTAMP
+               WHERE product_id = ? AND platform = ?""",
+            (img_url, digest, product_id, platform)
+        )
+    else:
+        cursor.execute(
+            """INSERT INTO images (product_id, platform, img_url, content_hash)
+               VALUES (?, ?, ?, ?)""",
+            (product_id, platform, img_url, digest)
+        )
+    if previous:
+        _release_blob(cursor, previous)
+
+def _fetch_image(cursor, product_id: int, platform: str, img_url: str, store: ImageStore):
+    """
+    Make sure the image for img_url is in the store, without writing to the database.
+    Returns (digest, size, content_type, needs_link), or None if the download failed.
+    """
+    # Check if already downloaded
+    cursor.execute(
+        "SELECT content_hash FROM images WHERE product_id = ? AND platform = ?",
+        (product_id, platform)
+    )
+    result = cursor.fetchone()
+    
+    if result and result[0] and store.exists(result[0]):
+        return result[0], None, None, False
+    
+    # Reuse an image stored for the same URL by another product
+    cursor.execute(
+        """SELECT b.hash, b.size, b.content_type
+           FROM images i JOIN image_blobs b ON b.hash = i.content_hash
+           WHERE i.img_url = ?
+           LIMIT 1""",
+        (img_url,)
+    )
+    shared = cursor.fetchone()
+    
+    if shared and store.exists(shared[0]):
+        digest, size, content_type = shared
+        return digest, size, content_type, True
+    
+    # Download image (requests is imported here to keep importing this module cheap)
+    import requests
+    response = requests.get(img_url, timeout=10)
+    if response.status_code != 200:
+        return None
+    
+    image_content = response.content
+    digest = store.put(image_content)
+    return digest, len(image_content), response.headers.get('Content-Type'), True
 
 def download_and_save_image(product_id: int, platform: str, img_url: str, base_dir: str = None, conn=None) -> Optional[str]:
     """
-    Download image, save to file (optional) and save as BLOB to database.
-    Returns local file path if saved, or "DB_BLOB" if only saved in DB.
+    Download image into the content-addressed store and link it to the product.
+    Images already stored for the same URL are reused without downloading.
+    New images are fingerprinted for the dHash index (see find_similar_images).
+    Lookups use conn (or a new read connection); the link is written by the
+    single writer. Returns the local file path of the stored image.
     """
-    if base_dir is None:
-        base_dir = _IMAGE_DIR
     if not img_url:
         return None
     
+    store = get_image_store(base_dir)
+    
     try:
-        # Use existing connection if provided, else create new one
-        should_close = False
+        should_close = conn is None
         if conn is None:
-            conn = sqlite3.connect(get_db_path())
-            should_close = True
+            conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            fetched = _fetch_image(cursor, product_id, platform, img_url, store)
+            if fetched is None:
+                return None
+            digest, size, content_type, needs_link = fetched
+            ensure_thumbnail(store, digest)
+            record = _new_fingerprint(cursor, store, digest)
+        finally:
+            if should_close:
+                conn.close()
         
-        cursor = conn.cursor()
+        def link(cursor):
+            if needs_link:
+                _link_image(cursor, product_id, platform, img_url, digest, size, content_type)
+            if record is not None:
+                _save_fingerprint(cursor, digest, *record)
+        
+        if needs_link or record is not None:
+            _retry_on_busy(lambda: SQLiteStorage().writer().submit(link).result())
         
-        # Check if already downloaded
+        return str(store.path_for(digest))
+    except Exception as e:
+        print(f"❌ Failed to download/save image: {e}")
+        return None
+
+def _delete_orphaned_blobs(cursor) -> List[str]:
+    """Delete image_blobs rows nothing references. Returns their digests."""
+    cursor.execute("SELECT hash FROM image_blobs WHERE refcount <= 0")
+    orphaned = [row[0] for row in cursor.fetchall()]
+    cursor.executemany("DELETE FROM image_dhash_chunks WHERE content_hash = ?", [(h,) for h in orphaned])
+    cursor.executemany("DELETE FROM image_fingerprints WHERE content_hash = ?", [(h,) for h in orphaned])
+    cursor.executemany("DELETE FROM image_blobs WHERE hash = ?", [(h,) for h in orphaned])
+    return orphaned
+
+def prune_image_store(base_dir: str = None) -> int:
+    """
+    Delete stored images that no product references any more.
+    Returns the number of files removed.
+    """
+    store = get_image_store(base_dir)
+    orphaned = _retry_on_busy(lambda: SQLiteStorage().writer().submit(_delete_orphaned_blobs).result())
+    
+    # Files go only after the rows are committed, so a rollback never loses data
+    removed = 0
+    for digest in orphaned:
+        delete_thumbnail(store, digest)
+        removed += store.delete(digest)
+    return removed
+
+def get_image_data_from_db(product_id: int, platform: str) -> Optional[memoryview]:
+    """Retrieve raw image data from the image store (zero-copy, mmap-backed)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
         cursor.execute(
-            "SELECT local_path, image_data FROM images WHERE product_id = ? AND platform = ?",
+            "SELECT content_hash FROM images WHERE product_id = ? AND platform = ?",
             (product_id, platform)
         )
         result = cursor.fetchone()
-        
-        if result:
-            local_path, image_data = result
-            if local_path and os.path.exists(local_path):
-                if should_close: conn.close()
-                return local_path
-            if image_data:
-                if should_close: conn.close()
-                return "DB_BLOB"
-        
-        # Download image
-        response = requests.get(img_url, timeout=10)
-        if response.status_code != 200:
-            if should_close: conn.close()
-            return None
-        
-        image_content = response.content
-        
-        # 1. Save to File (Optional)
-        save_path = Path(base_dir)
-        save_path.mkdir(parents=True, exist_ok=True)
-        
-        content_type = response.headers.get('Content-Type', '')
-        ext = '.jpg'
-        if 'png' in content_type: ext = '.png'
-        elif 'webp' in content_type: ext = '.webp'
-        
-        filename = f"{platform}_{product_id}{ext}"
-        full_path = save_path / filename
-        
-        try:
-            with open(full_path, 'wb') as f:
-                f.write(image_content)
-            local_path_str = str(full_path)
-        except Exception as e:
-            print(f"⚠️ Failed to write to local filesystem: {e}")
-            local_path_str = None
-        
-        # 2. Save to database as BLOB
+    finally:
+        conn.close()
+    if not result or not result[0]:
+        return None
+    return get_image_store().read(result[0])
+
+def _content_hash_for_url(img_url: str) -> Optional[str]:
+    """Return the digest of the image stored for a source URL, if any."""
+    if not img_url or not _db_exists():
+        return None
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
         cursor.execute(
-            """INSERT OR REPLACE INTO images (product_id, platform, img_url, local_path, image_data)
-               VALUES (?, ?, ?, ?, ?)""",
-            (product_id, platform, img_url, local_path_str, sqlite3.Binary(image_content))
+            "SELECT content_hash FROM images WHERE img_url = ? AND content_hash IS NOT NULL LIMIT 1",
+            (img_url,)
         )
-        
-        if should_close:
-            conn.commit()
-            conn.close()
-        
-        return local_path_str or "DB_BLOB"
-    except Exception as e:
-        print(f"❌ Failed to download/save image: {e}")
+        result = cursor.fetchone()
+    finally:
+        conn.close()
+    return result[0] if result else None
+
+def get_image_data_by_url(img_url: str) -> Optional[memoryview]:
+    """Retrieve stored image data for a source URL, if it was downloaded before."""
+    digest = _content_hash_for_url(img_url)
+    if digest is None:
         return None
+    return get_image_store().read(digest)
 
-def get_image_data_from_db(product_id: int, platform: str) -> Optional[bytes]:
-    """Retrieve raw image data from database BLOB."""
-    conn = sqlite3.connect(get_db_path())
+def get_thumbnail_by_url(img_url: str) -> Optional[memoryview]:
+    """
+    Retrieve the thumbnail of the image stored for a source URL.
+    Thumbnails missing from older stores are created on first use.
+    """
+    digest = _content_hash_for_url(img_url)
+    if digest is None:
+        return None
+    return read_thumbnail(get_image_store(), digest)
+
+# dHashes are unsigned 64-bit; SQLite integers are signed
+_INT64_SIGN = 1 << 63
+
+def get_image_fingerprint(img_url: str) -> Optional[Tuple[int, bytes]]:
+    """Return the stored (dhash, histogram bytes) of the image for a source URL, if any."""
+    if not img_url or not _db_exists():
+        return None
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
-            "SELECT image_data FROM images WHERE product_id = ? AND platform = ?",
-            (product_id, platform)
+            """SELECT f.dhash, f.histogram
+               FROM images i JOIN image_fingerprints f ON f.content_hash = i.content_hash
+               WHERE i.img_url = ?
+               LIMIT 1""",
+            (img_url,)
         )
         result = cursor.fetchone()
-        return result[0] if result else None
+    finally:
+        conn.close()
+    if not result:
+        return None
+    return (result[0] + (1 << 64)) % (1 << 64), result[1]
+
+def _save_fingerprint(cursor, digest: str, dhash: int, histogram: bytes) -> bool:
+    """
+    Store the fingerprint of a stored image and add its dHash to the
+    multi-index hash. Returns False if it was stored already.
+    """
+    from cosver.aggregator.dhash_index import chunk_keys
+    
+    signed = dhash - (1 << 64) if dhash >= _INT64_SIGN else dhash
+    cursor.execute(
+        """INSERT OR IGNORE INTO image_fingerprints (content_hash, dhash, histogram)
+           SELECT hash, ?, ? FROM image_blobs WHERE hash = ?""",
+        (signed, sqlite3.Binary(histogram), digest)
+    )
+    if not cursor.rowcount:
+        return False
+    cursor.executemany(
+        "INSERT OR IGNORE INTO image_dhash_chunks (chunk, content_hash) VALUES (?, ?)",
+        [(chunk, digest) for chunk in chunk_keys(dhash)]
+    )
+    return True
+
+def _new_fingerprint(cursor, store: ImageStore, digest: str) -> Optional[Tuple[int, bytes]]:
+    """
+    (dhash, histogram bytes) of a stored image that has no fingerprint yet,
+    computed from its thumbnail as image_matcher.load_fingerprint does.
+    None if it is fingerprinted already or cannot be decoded.
+    """
+    # Imported here: the matcher imports this module and loads OpenCV
+    from cosver.aggregator.image_matcher import thumbnail_fingerprint
+    
+    cursor.execute("SELECT 1 FROM image_fingerprints WHERE content_hash = ?", (digest,))
+    if cursor.fetchone():
+        return None
+    data = read_thumbnail(store, digest)
+    return thumbnail_fingerprint(data) if data is not None else None
+
+def save_image_fingerprint(img_url: str, dhash: int, histogram: bytes) -> bool:
+    """
+    Store the fingerprint of the image for a source URL and add its dHash to
+    the multi-index hash (see find_similar_images).
+    Returns False if no image is stored for the URL (nothing to attach it to).
+    """
+    digest = _content_hash_for_url(img_url)
+    if digest is None:
+        return False
+    SQLiteStorage().writer().submit(lambda cursor: _save_fingerprint(cursor, digest, dhash, histogram)).result()
+    return True
+
+def fingerprint_images(batch_size: int = 100) -> int:
+    """
+    Fingerprint stored images saved before images were fingerprinted at
+    ingest, filling the dHash index. Returns the number of images fingerprinted.
+    """
+    store = get_image_store()
+    fingerprinted = 0
+    last = ''
+    while True:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            # Keyset pagination: images that cannot be decoded are passed over
+            cursor.execute(
+                """SELECT hash FROM image_blobs
+                   WHERE hash > ? AND hash NOT IN (SELECT content_hash FROM image_fingerprints)
+                   ORDER BY hash LIMIT ?""",
+                (last, batch_size)
+            )
+            digests = [row[0] for row in cursor.fetchall()]
+            records = {digest: _new_fingerprint(cursor, store, digest) for digest in digests}
+        finally:
+            conn.close()
+        
+        def save_batch(cursor):
+            return sum(
+                _save_fingerprint(cursor, digest, *record)
+                for digest, record in records.items() if record is not None
+            )
+        
+        fingerprinted += _retry_on_busy(lambda: SQLiteStorage().writer().submit(save_batch).result())
+        if len(digests) < batch_size:
+            return fingerprinted
+        last = digests[-1]
+
+def find_similar_images(dhash: int, max_distance: int = None) -> List[tuple]:
+    """
+    Find stored images whose dHash is within max_distance bits of dhash
+    (default dhash_index.MATCH_DISTANCE), reading only the multi-index hash
+    buckets that can hold them instead of scanning every fingerprint.
+    Returns (product_id, platform, content_hash, distance) tuples, closest first.
+    """
+    from cosver.aggregator.dhash_index import MATCH_DISTANCE, hamming, probe_keys
+    
+    if not _db_exists():
+        return []
+    if max_distance is None:
+        max_distance = MATCH_DISTANCE
+    probes = probe_keys(dhash, max_distance)
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        candidates = {}
+        # CROSS JOIN pins the join order: probe the chunk index first
+        rows = _select_in(
+            cursor,
+            """SELECT DISTINCT i.product_id, i.platform, f.content_hash, f.dhash
+               FROM image_dhash_chunks c
+               CROSS JOIN image_fingerprints f ON f.content_hash = c.content_hash
+               CROSS JOIN images i ON i.content_hash = f.content_hash
+               WHERE c.chunk IN ({params})""",
+            probes
+        )
+        for product_id, platform, content_hash, stored in rows:
+            distance = hamming(dhash, (stored + (1 << 64)) % (1 << 64))
+            if distance <= max_distance:
+                candidates[(product_id, platform)] = (content_hash, distance)
+        
+        results = [
+            (product_id, platform, content_hash, distance)
+            for (product_id, platform), (content_hash, distance) in candidates.items()
+        ]
+        return sorted(results, key=lambda row: (row[3], row[0], row[1]))
     finally:
         conn.close()
 
 def get_all_products_with_images() -> List[Dict[str, Any]]:
-    """Get all products with their image info (local path or BLOB status)."""
-    conn = sqlite3.connect(get_db_path())
+    """Get all products with their image info (stored file path and content hash)."""
+    store = get_image_store()
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
         cursor.execute(
-            """SELECT p.id, p.name, p.brand, i.platform, i.local_path, pr.price, 
-                      CASE WHEN i.image_data IS NOT NULL THEN 1 ELSE 0 END as has_blob
+            """SELECT p.id, p.name, p.brand, i.platform, i.content_hash, pr.price
                FROM products p
                JOIN images i ON p.id = i.product_id
-               JOIN prices pr ON p.id = pr.product_id AND i.platform = pr.platform
+               JOIN latest_prices pr ON p.id = pr.product_id AND i.platform = pr.platform
                ORDER BY p.id"""
         )
         
         results = []
-        for product_id, name, brand, platform, local_path, price, has_blob in cursor.fetchall():
+        for product_id, name, brand, platform, content_hash, price in cursor.fetchall():
             results.append({
                 'product_id': product_id,
                 'name': name,
                 'brand': brand,
                 'platform': platform,
-                'local_image_path': local_path,
+                'local_image_path': str(store.path_for(content_hash)) if content_hash else None,
                 'price': price,
-                'has_blob': bool(has_blob)
+                'content_hash': content_hash
             })
         
         return results
     finally:
         conn.close()
-
-# Initialize database on import
-if not os.path.exists(get_db_path()):
-    init_db()
@@ -0,0 +1,174 @@
+"""
+Streaming Parquet export of products, prices and image metadata.
+
+Rows are read from SQLite in chunks with fetchmany() and written chunk by
+chunk, so memory stays bounded by chunk_size regardless of table size. Prices
+are partitioned by scrape date. A manifest (_snapshot.json) records the last
+exported id per table, so incremental runs only export newer rows; a full
+run replaces the previous export. Image rows are updated in place when a
+listing's image changes, so images are exported in full on every run.
+"""
+import json
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cosver.database.db import get_connection
+
+CHUNK_SIZE = 50_000
+MANIFEST_NAME = "_snapshot.json"
+
+# table -> (query over rows with id > :last_id, arrow schema, partition columns)
+_EXPORTS = {
+    'products': (
+        """SELECT id, name, brand, normalized_name, created_at
+           FROM products WHERE id > :last_id ORDER BY id""",
+        pa.schema([
+            ('id', pa.int64()),
+            ('name', pa.string()),
+            ('brand', pa.string()),
+            ('normalized_name', pa.string()),
+            ('created_at', pa.string()),
+        ]),
+        [],
+    ),
+    'prices': (
+        """SELECT id, product_id, platform, price, url, img_url, scraped_at,
+                  date(scraped_at) AS scraped_date
+           FROM prices WHERE id > :last_id ORDER BY id""",
+        pa.schema([
+            ('id', pa.int64()),
+            ('product_id', pa.int64()),
+            ('platform', pa.string()),
+            ('price', pa.float64()),
+            ('url', pa.string()),
+            ('img_url', pa.string()),
+            ('scraped_at', pa.string()),
+            ('scraped_date', pa.string()),
+        ]),
+        ['scraped_date'],
+    ),
+    'images': (
+        """SELECT i.id, i.product_id, i.platform, i.img_url, i.content_hash,
+                  b.size, b.content_type, i.downloaded_at
+           FROM images i LEFT JOIN image_blobs b ON b.hash = i.content_hash
+           WHERE i.id > :last_id ORDER BY i.id""",
+        pa.schema([
+            ('id', pa.int64()),
+            ('product_id', pa.int64()),
+            ('platform', pa.string()),
+            ('img_url', pa.string()),
+            ('content_hash', pa.string()),
+            ('size', pa.int64()),
+            ('content_type', pa.string()),
+            ('downloaded_at', pa.string()),
+        ]),
+        [],
+    ),
+}
+# Tables whose rows change in place; an id watermark would miss the updates
+_FULL_TABLES = {'images'}
+
+
+def _load_manifest(out_dir: Path) -> Dict:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return {'last_ids': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(out_dir: Path, manifest: Dict):
+    path = out_dir / MANIFEST_NAME
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(path)
+
+
+def _clear_export(out_dir: Path):
+    """Remove the manifest and exported tables, leaving any other files alone."""
+    (out_dir / MANIFEST_NAME).unlink(missing_ok=True)
+    for table in _EXPORTS:
+        shutil.rmtree(out_dir / table, ignore_errors=True)
+
+
+def _drop_old_parts(out_dir: Path, table: str, run_id: str):
+    """Remove part files of a table written by earlier runs."""
+    for path in (out_dir / table).glob("*.parquet"):
+        if run_id not in path.name:
+            path.unlink()
+
+
+def _export_table(cursor, table: str, out_dir: Path, last_id: int, run_id: str, chunk_size: int):
+    """Stream one table to Parquet. Returns (rows written, highest exported id)."""
+    query, schema, partition_cols = _EXPORTS[table]
+    cursor.execute(query, {'last_id': last_id})
+    names = schema.names
+
+    written = 0
+    chunk_no = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        batch = pa.Table.from_arrays(
+            [pa.array(col, type=schema.field(name).type) for name, col in zip(names, columns)],
+            schema=schema,
+        )
+        basename = f"part-{run_id}-{chunk_no:05d}-{{i}}.parquet"
+        if partition_cols:
+            pq.write_to_dataset(batch, out_dir / table, partition_cols=partition_cols,
+                                basename_template=basename)
+        else:
+            (out_dir / table).mkdir(parents=True, exist_ok=True)
+            pq.write_table(batch, out_dir / table / basename.format(i=0))
+        written += len(rows)
+        last_id = rows[-1][0]
+        chunk_no += 1
+    return written, last_id
+
+
+def export_parquet(out_dir: str, incremental: bool = True, chunk_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Export products, prices and images metadata to Parquet under out_dir.
+    With incremental=True only rows newer than the previous snapshot are written
+    (images are always rewritten in full); otherwise the previous export's table directories and manifest are removed
+    first, so its part files are not read alongside the new ones.
+    Returns the number of rows exported per table.
+    """
+    out_path = Path(out_dir)
+    if not incremental:
+        _clear_export(out_path)
+    out_path.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(out_path)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+    conn = get_connection()
+    counts = {}
+    try:
+        # One read transaction gives every table the same consistent snapshot
+        conn.execute("BEGIN")
+        cursor = conn.cursor()
+        for table in _EXPORTS:
+            if table in _FULL_TABLES:
+                counts[table], _ = _export_table(cursor, table, out_path, 0, run_id, chunk_size)
+                _drop_old_parts(out_path, table, run_id)
+                continue
+            last_id = manifest['last_ids'].get(table, 0)
+            counts[table], manifest['last_ids'][table] = _export_table(
+                cursor, table, out_path, last_id, run_id, chunk_size
+            )
+        conn.rollback()
+    finally:
+        conn.close()
+
+    manifest['last_run'] = run_id
+    _save_manifest(out_path, manifest)
+    return counts
@@ -0,0 +1,20 @@
+-- Full-text index over normalized product names.
+-- The trigram tokenizer gives substring matching that works for Korean
+-- without word segmentation, so MATCH can replace LIKE '%kw%' scans.
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    normalized_name,
+    content='products',
+    content_rowid='id',
+    tokenize='trigram'
+);
+-- Keep the index in sync with the products table
+CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts(rowid, normalized_name) VALUES (new.id, new.normalized_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF normalized_name ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+    INSERT INTO products_fts(rowid, normalized_name) VALUES (new.id, new.normalized_name);
+END;
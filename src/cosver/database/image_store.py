@@ -0,0 +1,79 @@
+"""
+Content-addressed on-disk image store.
+
+Each unique image is written once under a sharded directory layout
+(``<root>/ab/cd/<sha256>``) and read back through ``mmap`` so callers get a
+zero-copy ``memoryview`` instead of a BLOB copied out of SQLite.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+class ImageStore:
+    """Sharded, content-addressed file store keyed by SHA-256 digest."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """Return the content key for raw image bytes."""
+        return hashlib.sha256(data).hexdigest()
+
+    def path_for(self, digest: str) -> Path:
+        """Return the on-disk path for a digest (two levels of 2-char shards)."""
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """
+        Store raw bytes and return their digest.
+        Writing is atomic (temp file + rename) and skipped if the content exists.
+        Derived files (e.g. thumbnails) pass their source's digest as the key.
+        """
+        if digest is None:
+            digest = self.digest(data)
+        path = self.path_for(digest)
+        if path.exists():
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def read(self, digest: str) -> Optional[memoryview]:
+        """
+        Return a read-only memoryview over the stored file, backed by mmap.
+        The mapping stays alive for as long as the view is referenced.
+        """
+        path = self.path_for(digest)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        return memoryview(mapped)
+
+    def delete(self, digest: str) -> bool:
+        """Remove a stored file. Returns True if it existed."""
+        try:
+            os.remove(self.path_for(digest))
+            return True
+        except FileNotFoundError:
+            return False
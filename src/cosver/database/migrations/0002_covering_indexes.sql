@@ -0,0 +1,13 @@
+-- Indexes for the hot read paths.
+-- prices: per (product, platform) newest-first, so rebuilding latest_prices and
+-- reading one product's history walk the index instead of sorting. It
+-- supersedes idx_prices_product_id, which is a prefix of it.
+DROP INDEX IF EXISTS idx_prices_product_id;
+CREATE INDEX IF NOT EXISTS idx_prices_product_platform_scraped
+    ON prices(product_id, platform, scraped_at DESC, id DESC);
+-- images: URL -> content hash lookups (every image fetch and thumbnail read)
+-- are answered from the index alone.
+DROP INDEX IF EXISTS idx_images_img_url;
+CREATE INDEX IF NOT EXISTS idx_images_img_url_hash ON images(img_url, content_hash);
+-- image_blobs: orphan collection only visits rows with no references left.
+CREATE INDEX IF NOT EXISTS idx_image_blobs_orphaned ON image_blobs(hash) WHERE refcount <= 0;
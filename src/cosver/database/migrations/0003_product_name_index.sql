@@ -0,0 +1,24 @@
+-- MinHash signatures of product names and their LSH band buckets, used to find
+-- near-duplicate products without scanning the products table
+CREATE TABLE IF NOT EXISTS product_signatures (
+    product_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS product_lsh_buckets (
+    bucket INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, product_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+-- Product links: an existing product whose name is a near duplicate of a newly
+-- ingested one (e.g. the same item listed under a seller's name as brand)
+CREATE TABLE IF NOT EXISTS product_links (
+    product_id INTEGER NOT NULL,
+    linked_id INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (product_id, linked_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (linked_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_product_links_linked_id ON product_links(linked_id);
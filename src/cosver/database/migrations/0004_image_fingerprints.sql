@@ -0,0 +1,8 @@
+-- Per-image matching fingerprints (dHash and H-S histogram), keyed like the
+-- stored image itself so every URL of the same image shares one row
+CREATE TABLE IF NOT EXISTS image_fingerprints (
+    content_hash TEXT PRIMARY KEY,
+    dhash INTEGER NOT NULL,
+    histogram BLOB NOT NULL,
+    FOREIGN KEY (content_hash) REFERENCES image_blobs(hash) ON DELETE CASCADE
+) WITHOUT ROWID;
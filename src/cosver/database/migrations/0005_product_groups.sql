@@ -0,0 +1,8 @@
+-- Group membership decided by incremental grouping: group_id is the id of a
+-- product in the group (its first member when the group was formed)
+CREATE TABLE IF NOT EXISTS product_groups (
+    product_id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_product_groups_group_id ON product_groups(group_id);
@@ -0,0 +1,19 @@
+-- Canonical products (SKUs) tying the same item together across platforms.
+-- Every product is assigned one when it is created; product_skus keeps the
+-- product's own SKU key so later products with that key find the SKU directly
+CREATE TABLE IF NOT EXISTS skus (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sku_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    brand TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS product_skus (
+    product_id INTEGER PRIMARY KEY,
+    sku_key TEXT NOT NULL,
+    sku_id INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (sku_id) REFERENCES skus(id)
+);
+CREATE INDEX IF NOT EXISTS idx_product_skus_sku_key ON product_skus(sku_key, sku_id);
+CREATE INDEX IF NOT EXISTS idx_product_skus_sku_id ON product_skus(sku_id);
@@ -0,0 +1,16 @@
+-- Multi-index hash over image dHashes: one row per 16-bit chunk of each
+-- fingerprint's dHash, keyed (chunk position << 16) | chunk value, to find
+-- stored images within a small Hamming distance without scanning (see
+-- aggregator.dhash_index)
+CREATE TABLE IF NOT EXISTS image_dhash_chunks (
+    chunk INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (chunk, content_hash),
+    FOREIGN KEY (content_hash) REFERENCES image_blobs(hash) ON DELETE CASCADE
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO image_dhash_chunks (chunk, content_hash)
+SELECT (p.position << 16) | ((f.dhash >> (p.position * 16)) & 65535), f.content_hash
+FROM image_fingerprints f
+CROSS JOIN (SELECT 0 AS position UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3) p;
+-- Matches are reported per product image
+CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash);
@@ -0,0 +1,197 @@
+"""
+PostgreSQL implementation of the storage interface.
+
+Connections come from a psycopg connection pool. Batches are bulk-loaded with
+COPY into a temporary staging table and merged with set-based SQL, and name
+search uses a GIN trigram index. Requires `psycopg` and `psycopg_pool`.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from cosver.database.db import normalize_name
+from cosver.database.storage import Storage, CACHE_HOURS
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+    PSYCOPG_AVAILABLE = True
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+
+
+_CREATE_STAGING = """
+    CREATE TEMP TABLE staging (
+        seq INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        brand TEXT NOT NULL,
+        normalized_name TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        price DOUBLE PRECISION NOT NULL,
+        url TEXT,
+        img_url TEXT
+    ) ON COMMIT DROP
+"""
+
+_MERGE_PRODUCTS = """
+    INSERT INTO products (name, brand, normalized_name)
+    SELECT DISTINCT ON (normalized_name, brand) name, brand, normalized_name
+    FROM staging
+    ORDER BY normalized_name, brand, seq
+    ON CONFLICT (normalized_name, brand) DO NOTHING
+"""
+
+# Insert a history row only when the price or URL changed since the previous
+# observation (earlier in the batch, or latest_prices for the first one), and
+# move latest_prices forward to the newest inserted row.
+_MERGE_PRICES = """
+    WITH observed AS (
+        SELECT s.*, p.id AS product_id,
+               ROW_NUMBER() OVER w AS rn,
+               LAG(s.price) OVER w AS prev_price,
+               LAG(s.url) OVER w AS prev_url
+        FROM staging s
+        JOIN products p ON p.normalized_name = s.normalized_name AND p.brand = s.brand
+        WINDOW w AS (PARTITION BY p.id, s.platform ORDER BY s.seq)
+    ),
+    changed AS (
+        SELECT o.*
+        FROM observed o
+        LEFT JOIN latest_prices lp ON lp.product_id = o.product_id AND lp.platform = o.platform
+        WHERE CASE WHEN o.rn = 1
+                   THEN lp.product_id IS NULL OR lp.price <> o.price OR lp.url IS DISTINCT FROM o.url
+                   ELSE o.prev_price <> o.price OR o.prev_url IS DISTINCT FROM o.url
+              END
+    ),
+    inserted AS (
+        INSERT INTO prices (product_id, platform, price, url, img_url)
+        SELECT product_id, platform, price, url, img_url FROM changed ORDER BY seq
+        RETURNING id, product_id, platform, price, url, img_url, scraped_at
+    )
+    INSERT INTO latest_prices (product_id, platform, price_id, price, url, img_url, scraped_at)
+    SELECT DISTINCT ON (product_id, platform) product_id, platform, id, price, url, img_url, scraped_at
+    FROM inserted
+    ORDER BY product_id, platform, id DESC
+    ON CONFLICT (product_id, platform) DO UPDATE SET
+        price_id = excluded.price_id,
+        price = excluded.price,
+        url = excluded.url,
+        img_url = excluded.img_url,
+        scraped_at = excluded.scraped_at
+"""
+
+# Every product/platform in the batch was just observed, changed or not
+_TOUCH_LATEST = """
+    UPDATE latest_prices lp SET scraped_at = now()
+    FROM (
+        SELECT DISTINCT p.id, s.platform
+        FROM staging s
+        JOIN products p ON p.normalized_name = s.normalized_name AND p.brand = s.brand
+    ) seen
+    WHERE lp.product_id = seen.id AND lp.platform = seen.platform
+"""
+
+_STAGED_IDS = """
+    SELECT p.id
+    FROM staging s
+    JOIN products p ON p.normalized_name = s.normalized_name AND p.brand = s.brand
+    ORDER BY s.seq
+"""
+
+
+class PostgresStorage(Storage):
+    """Storage backed by a PostgreSQL server through a connection pool."""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 5):
+        if not PSYCOPG_AVAILABLE:
+            raise ImportError(
+                "PostgresStorage requires psycopg and psycopg_pool: "
+                "pip install 'psycopg[binary]' psycopg_pool"
+            )
+        self.pool = ConnectionPool(dsn, min_size=min_size, max_size=max_size, open=True)
+
+    def init_schema(self):
+        schema_path = Path(__file__).parent / "postgres_schema.sql"
+        with open(schema_path, 'r') as f:
+            schema = f.read()
+        with self.pool.connection() as conn:
+            conn.execute(schema)
+
+    def _ingest(self, conn, products: List[Dict[str, Any]]) -> List[int]:
+        """
+        Load products into staging with COPY and merge them in one transaction.
+        Returns the product_id of each product, in order.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(_CREATE_STAGING)
+            with cursor.copy(
+                "COPY staging (seq, name, brand, normalized_name, platform, price, url, img_url) FROM STDIN"
+            ) as copy:
+                for seq, product in enumerate(products):
+                    name = product.get('name', '')
+                    copy.write_row((
+                        seq,
+                        name,
+                        product.get('brand') or '',
+                        normalize_name(name),
+                        product.get('platform', ''),
+                        product.get('price', 0),
+                        product.get('url', ''),
+                        product.get('img', ''),
+                    ))
+            cursor.execute(_MERGE_PRODUCTS)
+            cursor.execute(_MERGE_PRICES)
+            cursor.execute(_TOUCH_LATEST)
+            return [row[0] for row in cursor.execute(_STAGED_IDS)]
+
+    def save_product(self, product_data: Dict[str, Any]) -> int:
+        with self.pool.connection() as conn:
+            return self._ingest(conn, [product_data])[0]
+
+    def save_products_batch(self, products: List[Dict[str, Any]]) -> List[int]:
+        if not products:
+            return []
+        with self.pool.connection() as conn:
+            product_ids = self._ingest(conn, products)
+        print(f"💾 Saved {len(products)} products to PostgreSQL")
+        return product_ids
+
+    def find_products(self, keyword: str) -> List[Tuple[int, str, str]]:
+        normalized_keyword = normalize_name(keyword)
+        with self.pool.connection() as conn:
+            return conn.execute(
+                """SELECT id, name, brand
+                   FROM products
+                   WHERE normalized_name LIKE %(pattern)s
+                   ORDER BY similarity(normalized_name, %(kw)s) DESC, id""",
+                {'pattern': f'%{normalized_keyword}%', 'kw': normalized_keyword}
+            ).fetchall()
+
+    def get_cached_results(self, keyword: str, max_age_hours: int = CACHE_HOURS) -> List[Dict[str, Any]]:
+        normalized_keyword = normalize_name(keyword)
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                """SELECT p.id AS product_id, p.name, p.brand, lp.platform, lp.price, lp.url, lp.img_url
+                   FROM products p
+                   JOIN latest_prices lp ON lp.product_id = p.id
+                   WHERE p.normalized_name LIKE %(pattern)s
+                     AND lp.scraped_at >= now() - make_interval(hours => %(hours)s)
+                   ORDER BY similarity(p.normalized_name, %(kw)s) DESC, p.id, lp.scraped_at DESC""",
+                {'pattern': f'%{normalized_keyword}%', 'kw': normalized_keyword, 'hours': max_age_hours}
+            )
+            return [
+                {
+                    'product_id': product_id,
+                    'name': name,
+                    'brand': brand,
+                    'platform': platform,
+                    'price': price,
+                    'url': url,
+                    'img': img_url,
+                    'source': platform,
+                    'cached': True
+                }
+                for product_id, name, brand, platform, price, url, img_url in cursor
+            ]
+
+    def close(self):
+        self.pool.close()
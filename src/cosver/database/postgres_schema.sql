@@ -0,0 +1,37 @@
+-- PostgreSQL schema for PostgresStorage (mirrors schema.sql for products/prices)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- Products table: stores unique products
+CREATE TABLE IF NOT EXISTS products (
+    id BIGSERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    brand TEXT NOT NULL DEFAULT '',
+    normalized_name TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE(normalized_name, brand)
+);
+-- Prices table: stores price records from different platforms
+CREATE TABLE IF NOT EXISTS prices (
+    id BIGSERIAL PRIMARY KEY,
+    product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    platform TEXT NOT NULL,
+    price DOUBLE PRECISION NOT NULL,
+    url TEXT,
+    img_url TEXT,
+    scraped_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Latest prices table: current price per product and platform
+CREATE TABLE IF NOT EXISTS latest_prices (
+    product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    platform TEXT NOT NULL,
+    price_id BIGINT NOT NULL,
+    price DOUBLE PRECISION NOT NULL,
+    url TEXT,
+    img_url TEXT,
+    scraped_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (product_id, platform)
+);
+-- Index for faster queries
+CREATE INDEX IF NOT EXISTS idx_prices_product_id_scraped_at ON prices(product_id, scraped_at);
+CREATE INDEX IF NOT EXISTS idx_latest_prices_scraped_at ON latest_prices(scraped_at);
+-- Trigram index so LIKE '%kw%' on names is an index scan
+CREATE INDEX IF NOT EXISTS idx_products_normalized_name_trgm ON products USING GIN (normalized_name gin_trgm_ops);
@@ -0,0 +1,98 @@
+"""
+Retention for the prices history.
+
+Raw price rows are kept for RAW_RETENTION_DAYS. Older rows are folded into
+price_rollups_daily (min/max/last per product, platform and day) and deleted,
+except the row latest_prices points to: an unchanged price only refreshes
+latest_prices, so that row can be old and still be the current price.
+Freed pages are then returned to the filesystem incrementally.
+"""
+import os
+from typing import Dict
+
+from cosver.database.db import SQLiteStorage, _retry_on_busy, get_connection
+
+RAW_RETENTION_DAYS = int(os.getenv("COSVER_RAW_RETENTION_DAYS", "30"))
+VACUUM_PAGES = 1000
+
+
+# Fold raw rows older than :cutoff into per-day rollups, merging with any
+# rollup already written for that day by an earlier run. Current prices stay
+# raw until superseded, then are rolled up like any other row
+_NOT_CURRENT = "id NOT IN (SELECT price_id FROM latest_prices)"
+_ROLLUP_SQL = """
+        WITH old AS (
+            SELECT product_id, platform, price, scraped_at,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY product_id, platform, date(scraped_at)
+                       ORDER BY scraped_at DESC, id DESC
+                   ) AS rn
+            FROM prices
+            WHERE scraped_at < :cutoff AND """ + _NOT_CURRENT + """
+        )
+        INSERT INTO price_rollups_daily
+            (product_id, platform, day, min_price, max_price, last_price, last_scraped_at, samples)
+        SELECT product_id, platform, date(scraped_at),
+               MIN(price), MAX(price),
+               MAX(CASE WHEN rn = 1 THEN price END),
+               MAX(scraped_at), COUNT(*)
+        FROM old
+        WHERE true
+        GROUP BY product_id, platform, date(scraped_at)
+        ON CONFLICT(product_id, platform, day) DO UPDATE SET
+            min_price = MIN(min_price, excluded.min_price),
+            max_price = MAX(max_price, excluded.max_price),
+            last_price = CASE WHEN excluded.last_scraped_at >= last_scraped_at
+                              THEN excluded.last_price ELSE last_price END,
+            last_scraped_at = MAX(last_scraped_at, excluded.last_scraped_at),
+            samples = samples + excluded.samples
+"""
+
+
+def incremental_vacuum(conn, pages: int = VACUUM_PAGES) -> int:
+    """
+    Release up to `pages` free pages back to the filesystem.
+    Databases created before auto_vacuum=INCREMENTAL are converted once,
+    which needs a full VACUUM. Returns the number of free pages left.
+    """
+    cursor = conn.cursor()
+    auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != 2:
+        print("🧹 Switching database to incremental auto-vacuum (one-time full VACUUM)...")
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+    else:
+        cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    return cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def compact_prices(retain_days: int = RAW_RETENTION_DAYS, vacuum_pages: int = VACUUM_PAGES) -> Dict[str, int]:
+    """
+    Roll raw price rows older than retain_days into daily rollups and delete them.
+    Rollup and delete run as one operation on the single writer, so a failure
+    leaves the history untouched. Vacuuming cannot run inside the writer's
+    transaction and uses its own connection afterwards. Returns counts of
+    rolled-up days, deleted rows and free pages left after vacuuming.
+    """
+    def compact(cursor):
+        cutoff = cursor.execute(
+            "SELECT datetime('now', ?)", (f'-{int(retain_days)} days',)
+        ).fetchone()[0]
+        params = {'cutoff': cutoff}
+
+        cursor.execute(_ROLLUP_SQL, params)
+        rolled_up = cursor.rowcount
+        cursor.execute(f"DELETE FROM prices WHERE scraped_at < :cutoff AND {_NOT_CURRENT}", params)
+        return rolled_up, cursor.rowcount
+
+    rolled_up, deleted = _retry_on_busy(lambda: SQLiteStorage().writer().submit(compact).result())
+
+    free_pages = 0
+    if deleted:
+        conn = get_connection()
+        try:
+            free_pages = _retry_on_busy(lambda: incremental_vacuum(conn, vacuum_pages))
+        finally:
+            conn.close()
+
+    return {'rolled_up_days': rolled_up, 'deleted_rows': deleted, 'free_pages': free_pages}
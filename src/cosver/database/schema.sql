@@ -18,19 +18,137 @@ CREATE TABLE IF NOT EXISTS prices (
     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
 );
--- Images table: stores downloaded image paths and raw data
+-- Latest prices table: current price per product and platform, kept in
+-- step with every prices insert so read paths never scan the history
+CREATE TABLE IF NOT EXISTS latest_prices (
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    price_id INTEGER NOT NULL,
+    price REAL NOT NULL,
+    url TEXT,
+    img_url TEXT,
+    scraped_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (product_id, platform),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE TRIGGER IF NOT EXISTS prices_latest_ai AFTER INSERT ON prices BEGIN
+    INSERT INTO latest_prices (product_id, platform, price_id, price, url, img_url, scraped_at)
+    VALUES (new.product_id, new.platform, new.id, new.price, new.url, new.img_url, new.scraped_at)
+    ON CONFLICT(product_id, platform) DO UPDATE SET
+        price_id = excluded.price_id,
+        price = excluded.price,
+        url = excluded.url,
+        img_url = excluded.img_url,
+        scraped_at = excluded.scraped_at
+    WHERE excluded.scraped_at >= latest_prices.scraped_at;
+END;
+-- Daily price rollups: compacted history for raw rows past the retention window
+CREATE TABLE IF NOT EXISTS price_rollups_daily (
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    day DATE NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    last_price REAL NOT NULL,
+    last_scraped_at TIMESTAMP NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (product_id, platform, day),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+-- Image blobs table: one row per unique image in the content-addressed store
+CREATE TABLE IF NOT EXISTS image_blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    content_type TEXT,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Images table: links a product/platform to a stored image by content hash
 CREATE TABLE IF NOT EXISTS images (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     product_id INTEGER NOT NULL,
     platform TEXT NOT NULL,
     img_url TEXT NOT NULL,
-    local_path TEXT,
-    image_data BLOB,
+    content_hash TEXT,
     downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (content_hash) REFERENCES image_blobs(hash),
     UNIQUE(product_id, platform)
 );
+-- MinHash signatures of product names and their LSH band buckets, used to find
+-- near-duplicate products without scanning the products table
+CREATE TABLE IF NOT EXISTS product_signatures (
+    product_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS product_lsh_buckets (
+    bucket INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, product_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+-- Product links: an existing product whose name is a near duplicate of a newly
+-- ingested one (e.g. the same item listed under a seller's name as brand)
+CREATE TABLE IF NOT EXISTS product_links (
+    product_id INTEGER NOT NULL,
+    linked_id INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (product_id, linked_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (linked_id) REFERENCES products(id) ON DELETE CASCADE
+);
+-- Per-image matching fingerprints (dHash and H-S histogram), keyed like the
+-- stored image itself so every URL of the same image shares one row
+CREATE TABLE IF NOT EXISTS image_fingerprints (
+    content_hash TEXT PRIMARY KEY,
+    dhash INTEGER NOT NULL,
+    histogram BLOB NOT NULL,
+    FOREIGN KEY (content_hash) REFERENCES image_blobs(hash) ON DELETE CASCADE
+) WITHOUT ROWID;
+-- Multi-index hash over image dHashes: one row per 16-bit chunk of each
+-- fingerprint's dHash, keyed (chunk position << 16) | chunk value, to find
+-- stored images within a small Hamming distance without scanning (see
+-- aggregator.dhash_index)
+CREATE TABLE IF NOT EXISTS image_dhash_chunks (
+    chunk INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (chunk, content_hash),
+    FOREIGN KEY (content_hash) REFERENCES image_blobs(hash) ON DELETE CASCADE
+) WITHOUT ROWID;
+-- Group membership decided by incremental grouping: group_id is the id of a
+-- product in the group (its first member when the group was formed)
+CREATE TABLE IF NOT EXISTS product_groups (
+    product_id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+-- Canonical products (SKUs) tying the same item together across platforms.
+-- Every product is assigned one when it is created; product_skus keeps the
+-- product's own SKU key so later products with that key find the SKU directly
+CREATE TABLE IF NOT EXISTS skus (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sku_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    brand TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS product_skus (
+    product_id INTEGER PRIMARY KEY,
+    sku_key TEXT NOT NULL,
+    sku_id INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (sku_id) REFERENCES skus(id)
+);
 -- Index for faster queries
-CREATE INDEX IF NOT EXISTS idx_prices_product_id ON prices(product_id);
+CREATE INDEX IF NOT EXISTS idx_prices_product_platform_scraped ON prices(product_id, platform, scraped_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_prices_scraped_at ON prices(scraped_at);
-CREATE INDEX IF NOT EXISTS idx_products_normalized_name ON products(normalized_name);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_products_normalized_name ON products(normalized_name);
+CREATE INDEX IF NOT EXISTS idx_images_img_url_hash ON images(img_url, content_hash);
+CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash);
+CREATE INDEX IF NOT EXISTS idx_image_blobs_orphaned ON image_blobs(hash) WHERE refcount <= 0;
+CREATE INDEX IF NOT EXISTS idx_latest_prices_scraped_at ON latest_prices(scraped_at);
+CREATE INDEX IF NOT EXISTS idx_product_links_linked_id ON product_links(linked_id);
+CREATE INDEX IF NOT EXISTS idx_product_groups_group_id ON product_groups(group_id);
+CREATE INDEX IF NOT EXISTS idx_product_skus_sku_key ON product_skus(sku_key, sku_id);
+CREATE INDEX IF NOT EXISTS idx_product_skus_sku_id ON product_skus(sku_id);
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Storage interface for products and prices.
+
+`db.SQLiteStorage` is the default implementation backed by a local SQLite
+file; `postgres.PostgresStorage` targets a PostgreSQL server. `get_storage()`
+picks one based on the COSVER_DB_URL environment variable.
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple
+
+CACHE_HOURS = 24
+
+_STORAGES: Dict[str, "Storage"] = {}
+
+
+class Storage(ABC):
+    """Repository for scraped products and their prices."""
+
+    @abstractmethod
+    def init_schema(self):
+        """Create tables and indexes if they do not exist."""
+
+    @abstractmethod
+    def save_product(self, product_data: Dict[str, Any]) -> int:
+        """Save one product and its price observation. Returns product_id."""
+
+    @abstractmethod
+    def save_products_batch(self, products: List[Dict[str, Any]]) -> List[int]:
+        """
+        Save multiple products and their prices in a single transaction.
+        Returns the product_id of each product, in order.
+        """
+
+    @abstractmethod
+    def find_products(self, keyword: str) -> List[Tuple[int, str, str]]:
+        """Find (id, name, brand) of products whose name contains the keyword."""
+
+    @abstractmethod
+    def get_cached_results(self, keyword: str, max_age_hours: int = CACHE_HOURS) -> List[Dict[str, Any]]:
+        """Latest price per product and platform scraped within max_age_hours."""
+
+    def get_grouped_results(self, keyword: str, max_age_hours: int = CACHE_HOURS) -> List[List[Dict[str, Any]]]:
+        """
+        Cached results grouped by canonical product, each group cheapest first.
+        Backends that store no groupings return [].
+        """
+        return []
+
+    def get_product_skus(self, product_ids: List[int]) -> Dict[int, int]:
+        """
+        SKU id of each of product_ids that has one.
+        Backends that do not assign SKUs at ingest return {}.
+        """
+        return {}
+
+    def get_product_groups(self, product_ids: List[int]) -> Dict[int, int]:
+        """
+        Stored group id of each of product_ids that has one.
+        Backends that store no groupings return {}.
+        """
+        return {}
+
+    def save_product_groups(self, groups: Dict[int, int]) -> int:
+        """
+        Store product_id -> group_id memberships. Returns the number of rows written;
+        backends that store no groupings write nothing.
+        """
+        return 0
+
+    def close(self):
+        """Release connections held by the storage."""
+
+
+def get_storage() -> Storage:
+    """
+    Return the configured storage backend.
+    A postgres:// or postgresql:// COSVER_DB_URL selects PostgreSQL (one pooled
+    instance per URL); anything else uses SQLite at COSVER_DB_PATH.
+    """
+    url = os.getenv("COSVER_DB_URL", "")
+    if url.startswith(("postgres://", "postgresql://")):
+        if url not in _STORAGES:
+            from cosver.database.postgres import PostgresStorage
+            _STORAGES[url] = PostgresStorage(url)
+        return _STORAGES[url]
+
+    from cosver.database.db import SQLiteStorage
+    return SQLiteStorage()
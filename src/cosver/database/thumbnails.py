@@ -0,0 +1,72 @@
+"""
+Thumbnails derived from images in the content-addressed store.
+
+Each stored image gets a small WebP rendition under ``<image root>/thumbs``,
+keyed by the digest of its source image, so the thumbnail lives and dies with
+the original. The UI and the image matcher read these instead of fetching
+full-size images from the platforms.
+"""
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from cosver.database.image_store import ImageStore
+
+THUMBNAIL_SIZE = 256
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+THUMBNAIL_QUALITY = 80
+
+
+def make_thumbnail(data, size: int = THUMBNAIL_SIZE) -> bytes:
+    """Downscale an image to fit in size x size and encode it as WebP."""
+    # Imported here so importing the database layer does not load Pillow
+    from PIL import Image
+    
+    image = Image.open(BytesIO(data))
+    # JPEG sources are decoded at a reduced scale instead of full resolution
+    image.draft('RGB', (size, size))
+    image = image.convert('RGB')
+    image.thumbnail((size, size))
+    out = BytesIO()
+    image.save(out, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+
+def thumbnail_store(store: ImageStore) -> ImageStore:
+    """Return the store holding thumbnails for images in store."""
+    return ImageStore(store.root / "thumbs")
+
+
+def ensure_thumbnail(store: ImageStore, digest: str, size: int = THUMBNAIL_SIZE) -> Optional[Path]:
+    """
+    Make sure a thumbnail exists for the stored image digest.
+    Returns its path, or None if the source is missing or not a decodable image.
+    """
+    thumbs = thumbnail_store(store)
+    path = thumbs.path_for(digest)
+    if path.exists():
+        return path
+
+    data = store.read(digest)
+    if data is None:
+        return None
+    try:
+        thumbnail = make_thumbnail(data, size)
+    except Exception as e:
+        print(f"⚠️ Could not create thumbnail for {digest}: {e}")
+        return None
+    thumbs.put(thumbnail, digest)
+    return path
+
+
+def read_thumbnail(store: ImageStore, digest: str) -> Optional[memoryview]:
+    """Return thumbnail bytes for a stored image, creating the thumbnail on first use."""
+    if ensure_thumbnail(store, digest) is None:
+        return None
+    return thumbnail_store(store).read(digest)
+
+
+def delete_thumbnail(store: ImageStore, digest: str) -> bool:
+    """Remove the thumbnail of a stored image. Returns True if it existed."""
+    return thumbnail_store(store).delete(digest)
@@ -0,0 +1,147 @@
+"""
+Single-writer actor for the SQLite database.
+
+All writes in a process are queued to one DBWriter thread per database file.
+The thread drains whatever is queued (up to max_batch operations, waiting at
+most max_delay for more) and group-commits it in one transaction, so
+concurrent sessions no longer fight over the write lock. Each operation runs
+in its own SAVEPOINT, so one failing operation does not abort the others.
+Callers get a Future back; readers keep using their own WAL connections.
+
+The only writes on other connections are the ones SQLite does not allow in
+the writer's transaction: schema setup and migrations (before the writer
+starts), loading a bundle (ATTACH) and VACUUM.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+_STOP = object()
+
+_WRITERS: Dict[str, "DBWriter"] = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+class DBWriter:
+    """Background thread that owns all writes to one SQLite file."""
+
+    def __init__(self, db_path: str, timeout: float = 5.0, max_batch: int = 256, max_delay: float = 0.01):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"DBWriter({db_path})", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: Callable[[sqlite3.Cursor], Any]) -> Future:
+        """
+        Queue operation(cursor) for the writer thread.
+        The Future resolves to its return value once the transaction commits.
+        """
+        if self._closed:
+            raise RuntimeError(f"DBWriter for {self.db_path} is closed")
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def close(self, timeout: float = None):
+        """Commit everything already queued, then stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        pending = [(op, future) for op, future in batch if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+
+        done = []
+        try:
+            # Autocommit mode so transactions and savepoints are explicit
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        except sqlite3.Error as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, future in pending:
+                cursor.execute("SAVEPOINT op")
+                try:
+                    result = operation(cursor)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO op")
+                    cursor.execute("RELEASE op")
+                    future.set_exception(e)
+                    continue
+                cursor.execute("RELEASE op")
+                done.append((future, result))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            conn.close()
+
+        for future, result in done:
+            future.set_result(result)
+
+
+def get_writer(db_path: str, timeout: float = 5.0) -> DBWriter:
+    """Return the process-wide writer for a database file, starting it if needed."""
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(db_path)
+        if writer is None or writer._closed:
+            writer = DBWriter(db_path, timeout=timeout)
+            _WRITERS[db_path] = writer
+        return writer
+
+
+def close_writer(db_path: str):
+    """Flush and stop the writer for a database file, if one is running."""
+    with _WRITERS_LOCK:
+        writer = _WRITERS.pop(db_path, None)
+    if writer is not None:
+        writer.close()
+
+
+@atexit.register
+def _close_all_writers():
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+        _WRITERS.clear()
+    for writer in writers:
+        writer.close(timeout=5)
@@ -1,28 +1,168 @@
 """
 Utility functions for product grouping and similarity matching.
 """
-from difflib import SequenceMatcher
-from typing import Any
-import concurrent.futures
-from cosver.aggregator.image_matcher import download_image, calculate_similarity
+from collections import Counter
+from typing import Any, Optional
+import base64
+import numpy as np
+from cosver.aggregator import parallel
+from cosver.aggregator.blocking import block_keys, candidate_pairs, compatible_mask
+from cosver.aggregator.image_cache import get_fingerprint_cache
+from cosver.aggregator.image_matcher import compare_fingerprint_matrix, load_stored_fingerprint
+from cosver.aggregator.incremental import IncrementalGrouper
+from cosver.aggregator.match_signals import MatchEvaluator
+from cosver.aggregator.minhash import LSHIndex
+from cosver.aggregator.similarity_matrix import connected_groups, similar_pairs, tfidf_matrix
+from cosver.database.db import get_thumbnail_by_url
+from cosver.database.storage import get_storage
+from cosver.database.thumbnails import THUMBNAIL_CONTENT_TYPE
 
-def group_similar_products(results: list[dict[str, Any]], threshold: float = 0.7) -> list[list[dict[str, Any]]]:
+def thumbnail_src(img_url: str) -> str:
+    """
+    Return an <img> src for a product image: the locally stored thumbnail as a
+    data URI, or the platform URL if the image has not been stored yet.
+    """
+    data = get_thumbnail_by_url(img_url)
+    if data is None:
+        return img_url or ""
+    return f"data:{THUMBNAIL_CONTENT_TYPE};base64,{base64.b64encode(data).decode('ascii')}"
+
+def _match_evaluator(
+    threshold: float,
+    fingerprints,
+    decisions: Optional[Counter] = None,
+    failed_downloads: Optional[set[str]] = None
+) -> MatchEvaluator:
+    """
+    Match evaluator reading fingerprints through the shared cache. Images that
+    could not be loaded, including those in failed_downloads (which callers may
+    add to later, e.g. after a prefetch), are not retried within one grouping call.
+    """
+    if failed_downloads is None:
+        failed_downloads = set()
+    unavailable: dict[bool, set[str]] = {False: set(), True: failed_downloads}
+    
+    def source(download: bool):
+        loader = None if download else load_stored_fingerprint
+        
+        def get(url):
+            if url in unavailable[download]:
+                return None
+            fp = fingerprints.get(url, loader)
+            if fp is None:
+                unavailable[download].add(url)
+            return fp
+        return get
+    
+    evaluator = MatchEvaluator(threshold, source(False), source(True))
+    if decisions is not None:
+        evaluator.decisions = decisions
+    return evaluator
+
+def _parallel_image_scores(results, pairs, get_fingerprint, workers: int) -> dict[tuple[int, int], float]:
+    """Fingerprint scores of the pairs whose images both have fingerprints, computed in worker processes."""
+    slots: dict[str, int] = {}
+    slot_fingerprints = []
+    slot_pairs = []
+    scored = []
+    for i, j in pairs:
+        urls = (results[i]["img"], results[j]["img"])
+        fps = [get_fingerprint(url) for url in urls]
+        if None in fps:
+            continue
+        for url, fp in zip(urls, fps):
+            if url not in slots:
+                slots[url] = len(slot_fingerprints)
+                slot_fingerprints.append(fp)
+        slot_pairs.append((slots[urls[0]], slots[urls[1]]))
+        scored.append((i, j))
+    return dict(zip(scored, parallel.fingerprint_scores(slot_fingerprints, slot_pairs, workers)))
+
+def image_similarity_matrix(results: list[dict[str, Any]]) -> np.ndarray:
+    """
+    Image similarity of every pair of results as an N x N matrix (see
+    image_matcher.compare_fingerprint_matrix), with fingerprints read through
+    the shared cache. Pairs involving a result without an image score 0.0.
+    """
+    fingerprints = get_fingerprint_cache()
+    fingerprints.prefetch(item.get("img") for item in results)
+    return compare_fingerprint_matrix([
+        fingerprints.get(item["img"]) if item.get("img") else None
+        for item in results
+    ])
+
+def group_similar_products(
+    results: list[dict[str, Any]],
+    threshold: float = 0.7,
+    blocking: bool = True,
+    lsh: bool = True,
+    batch: bool = False,
+    workers: Optional[int] = 1,
+    decisions: Optional[Counter] = None
+) -> list[list[dict[str, Any]]]:
     """
     Group similar products based on name similarity and image similarity.
+    With blocking, only pairs whose product type, price band, brand and volume
+    do not contradict each other are compared (see aggregator.blocking).
+    With lsh, pairs must also share a MinHash band bucket, i.e. have some
+    name overlap (see aggregator.minhash).
+    With batch, names are compared all at once as TF-IDF vectors instead (see
+    group_by_name_matrix); threshold is then a cosine similarity.
+    With workers > 1, candidate pairs are scored in that many processes (see
+    aggregator.parallel); the groups are identical to the serial ones.
+    workers=None uses one process per CPU.
+    If decisions is given, the match decisions made are counted into it by
+    (tier, matched); see aggregator.match_signals.
     """
+    if batch:
+        return group_by_name_matrix(results, threshold, blocking)
+    if workers is None:
+        workers = parallel.default_workers()
+    
     groups = []
     used: set[int] = set()
     
-    # Pre-download images for items that might need comparison
-    # To save time, we could only download when needed, but parallel download is faster
-    # For now, let's download on demand to save bandwidth, or parallelize if slow.
-    # Let's use a cache.
-    image_cache = {}
-
-    def get_image(url):
-        if url not in image_cache:
-            image_cache[url] = download_image(url)
-        return image_cache[url]
+    if blocking:
+        candidates = candidate_pairs(results)
+    else:
+        candidates = {i: list(range(i + 1, len(results))) for i in range(len(results))}
+    if lsh:
+        index = LSHIndex()
+        for i, item in enumerate(results):
+            index.add(i, item.get("name", ""))
+        near = index.candidate_pairs()
+        candidates = {i: [j for j in js if (i, j) in near] for i, js in candidates.items()}
+    
+    # Signals are evaluated cheapest first (see aggregator.match_signals);
+    # images are loaded only for pairs no cheaper signal decides
+    fingerprints = get_fingerprint_cache()
+    failed_downloads: set[str] = set()
+    evaluator = _match_evaluator(threshold, fingerprints, decisions, failed_downloads)
+    
+    text_ratios = {}
+    image_scores = {}
+    pairs = [(i, j) for i, js in candidates.items() for j in js]
+    if workers > 1:
+        # Name ratios are computed up front in worker processes
+        names = [item.get("name") or "" for item in results]
+        text_ratios = dict(zip(pairs, parallel.text_ratios(names, pairs, workers)))
+    # The cheap tiers run once here; their name ratios are reused below
+    undecided = []
+    for i, j in pairs:
+        tier, _, ratio = evaluator.cheap_decision(results[i], results[j], text_ratios.get((i, j)))
+        if ratio is not None:
+            text_ratios[(i, j)] = ratio
+        if tier is None:
+            undecided.append((i, j))
+    
+    # Images of the pairs left undecided are loaded concurrently rather than
+    # one by one when the greedy pass reaches them
+    undecided = [(i, j) for i, j in undecided if results[i].get("img") and results[j].get("img")]
+    failed_downloads.update(
+        fingerprints.prefetch(url for i, j in undecided for url in (results[i]["img"], results[j]["img"]))
+    )
+    if workers > 1:
+        image_scores = _parallel_image_scores(results, undecided, evaluator.fetch_fingerprint, workers)
 
     for i, item in enumerate(results):
         if i in used:
@@ -31,32 +171,79 @@ def group_similar_products(results: list[dict[str, Any]], threshold: float = 0.7
         group = [item]
         used.add(i)
         
-        for j, other in enumerate(results[i+1:], start=i+1):
+        for j in candidates[i]:
             if j in used:
                 continue
+            other = results[j]
                 
-            # 1. Text Similarity
-            text_ratio = SequenceMatcher(None, item["name"], other["name"]).ratio()
-            
-            is_match = False
-            if text_ratio >= threshold:
-                is_match = True
-            elif text_ratio >= 0.4: # Ambiguous range
-                # 2. Image Similarity
-                if item.get("img") and other.get("img"):
-                    # Download images (if not already cached)
-                    img1 = get_image(item["img"])
-                    img2 = get_image(other["img"])
-                    
-                    if img1 is not None and img2 is not None:
-                        img_score = calculate_similarity(img1, img2)
-                        if img_score > 0.6: # Visual match threshold
-                            is_match = True
-            
-            if is_match:
+            if evaluator.match(item, other, text_ratios.get((i, j)), image_scores.get((i, j))):
                 group.append(other)
                 used.add(j)
                 
         groups.append(group)
     return groups
 
+
+def group_by_name_matrix(
+    results: list[dict[str, Any]],
+    threshold: float,
+    blocking: bool = True
+) -> list[list[dict[str, Any]]]:
+    """
+    Batch grouping: connected components of the pairs whose character n-gram
+    TF-IDF cosine similarity is at least threshold (see
+    aggregator.similarity_matrix). Text only; images are not compared.
+    With blocking, pairs whose blocking keys contradict each other are dropped.
+    """
+    rows, cols, _ = similar_pairs(tfidf_matrix([item.get("name", "") for item in results]), threshold)
+    if blocking and len(rows):
+        keep = compatible_mask(block_keys(results), rows, cols)
+        rows, cols = rows[keep], cols[keep]
+    return [[results[i] for i in group] for group in connected_groups(len(results), rows, cols)]
+
+def group_incrementally(
+    results: list[dict[str, Any]],
+    threshold: float = 0.7
+) -> list[list[dict[str, Any]]]:
+    """
+    Group results with the incremental grouper (see aggregator.incremental).
+    Listings of one SKU (assigned at ingest) share a group without comparison;
+    the first listing of each SKU is matched against the other groups'
+    representatives like any new result, so SKUs whose names differ but whose
+    images match are merged. Every membership decided this way is stored
+    (product_groups), so a repeat search is grouped by lookups alone; a SKU
+    with a stored group brings its new listings into that group. Results
+    without a 'product_id' are grouped but not stored. SKUs and groups are
+    read from and written to the configured storage backend, which assigned
+    the product ids (see storage.get_storage).
+    """
+    storage = get_storage()
+    product_ids = [item["product_id"] for item in results if item.get("product_id")]
+    skus = storage.get_product_skus(product_ids)
+    stored = storage.get_product_groups(product_ids)
+    sku_groups: dict[int, int] = {}
+    for product_id, group_id in stored.items():
+        if product_id in skus:
+            sku = skus[product_id]
+            sku_groups[sku] = min(group_id, sku_groups.get(sku, group_id))
+    evaluator = _match_evaluator(threshold, get_fingerprint_cache())
+    
+    grouper = IncrementalGrouper(evaluator.match)
+    first_of_sku: dict[int, int] = {}
+    for index, item in enumerate(results):
+        product_id = item.get("product_id")
+        sku = skus.get(product_id)
+        label = stored.get(product_id, sku_groups.get(sku))
+        if label is None and sku in first_of_sku:
+            grouper.add(product_id, item, same_as=first_of_sku[sku])
+            continue
+        if sku is not None:
+            first_of_sku.setdefault(sku, product_id)
+        grouper.add(product_id or ("result", index), item, label)
+    
+    storage.save_product_groups({
+        key: label
+        for key, label in grouper.labels().items()
+        if isinstance(key, int) and stored.get(key) != label
+    })
+    return grouper.groups()
@@ -0,0 +1,39 @@
+"""
+Base test case for tests that run against a throwaway SQLite database.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from cosver.database.db import get_db_path, get_image_dir, init_db, set_db_path, set_image_dir
+from cosver.database.writer import close_writer
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """
+    Runs every test against a fresh database and image directory inside
+    self.tmp_dir. Afterwards the writer of each database used is closed, the
+    previous database path and image directory are restored and the directory
+    is removed. Subclasses name the file with db_name; with create_db = False
+    the database file is left for the test to create.
+    """
+    db_name = "test.db"
+    create_db = True
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # Cleanups run last-in first-out: writers close before their files go
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.addCleanup(set_image_dir, get_image_dir())
+        self.addCleanup(set_db_path, get_db_path())
+        self.use_database(self.db_name, create=self.create_db)
+
+    def use_database(self, name: str, images: str = "images", create: bool = True):
+        """Switch to database file name and image directory images inside self.tmp_dir."""
+        path = os.path.join(self.tmp_dir, name)
+        self.addCleanup(close_writer, path)
+        set_db_path(path)
+        set_image_dir(os.path.join(self.tmp_dir, images))
+        if create:
+            init_db()
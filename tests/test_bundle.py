@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import unittest
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+
+from cosver.database.bundle import load_bundle, pack_bundle
+from cosver.database.db import (
+    download_and_save_image,
+    find_similar_products,
+    get_cached_results,
+    get_image_data_from_db,
+    get_product_skus,
+    save_product,
+)
+from tests.db_case import TempDatabaseTestCase
+
+
+def _jpeg(size=(800, 800)) -> bytes:
+    out = BytesIO()
+    Image.new('RGB', size, (200, 120, 80)).save(out, format='JPEG')
+    return out.getvalue()
+
+
+class TestWarmStartBundle(TempDatabaseTestCase):
+    db_name = "source.db"
+
+    def setUp(self):
+        """Pack a bundle from one throwaway database, then switch to an empty one."""
+        super().setUp()
+        self.bundle_path = os.path.join(self.tmp_dir, "warm_start.db")
+
+        product_id = save_product({'name': '헤라 블랙쿠션', 'brand': '헤라', 'platform': 'Ably',
+                                   'price': 30000, 'url': 'a', 'img': 'https://test.com/cushion.jpg'})
+        response = mock.Mock(status_code=200, content=_jpeg())
+        response.headers = {'Content-Type': 'image/jpeg'}
+        with mock.patch('requests.get', return_value=response):
+            download_and_save_image(product_id, 'Ably', 'https://test.com/cushion.jpg')
+        self.product_id = product_id
+
+        self.counts = pack_bundle(self.bundle_path)
+
+        self.use_database("fresh.db", images="fresh_images")
+
+    def test_pack_counts(self):
+        self.assertEqual(self.counts, {'products': 1, 'prices': 1, 'thumbnails': 1})
+
+    def test_load_serves_cached_results(self):
+        """A fresh database answers from the bundle without scraping."""
+        self.assertEqual(load_bundle(self.bundle_path), 1)
+
+        results = get_cached_results("블랙쿠션")
+        self.assertEqual([(r['name'], r['price']) for r in results], [('헤라 블랙쿠션', 30000)])
+
+        thumbnail = Image.open(BytesIO(bytes(get_image_data_from_db(self.product_id, 'Ably'))))
+        self.assertLessEqual(max(thumbnail.size), 256)
+
+    def test_loaded_products_are_indexed(self):
+        """Warm-started products get name signatures and SKUs, so new listings link to them."""
+        load_bundle(self.bundle_path)
+        self.assertIn(self.product_id, get_product_skus([self.product_id]))
+        self.assertEqual([row[0] for row in find_similar_products('헤라 블랙쿠션')], [self.product_id])
+
+        new_id = save_product({'name': '헤라 블랙쿠션', 'brand': '뷰티셀러', 'platform': 'Zigzag', 'price': 29000})
+        skus = get_product_skus([self.product_id, new_id])
+        self.assertEqual(skus[new_id], skus[self.product_id])
+
+    def test_load_skips_populated_database(self):
+        save_product({'name': '라네즈 네오 파우더', 'brand': '라네즈', 'platform': 'Zigzag', 'price': 25000})
+        self.assertEqual(load_bundle(self.bundle_path), 0)
+        self.assertEqual(get_cached_results("블랙쿠션"), [])
+
+    def test_stale_bundle_is_skipped(self):
+        """A bundle with no price inside the cache window would serve nothing, so it is not loaded."""
+        conn = sqlite3.connect(self.bundle_path)
+        conn.execute("UPDATE prices SET scraped_at = datetime('now', '-2 days')")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(load_bundle(self.bundle_path), 0)
+        self.assertEqual(load_bundle(self.bundle_path, max_age_hours=72), 1)
+
+    def test_missing_bundle_is_ignored(self):
+        self.assertEqual(load_bundle(os.path.join(self.tmp_dir, "missing.db")), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
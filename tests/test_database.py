@@ -1,16 +1,45 @@
 import unittest
+import concurrent.futures
 import os
+import re
 import sqlite3
+import subprocess
+import sys
+from io import BytesIO
 from datetime import datetime, timedelta
+from unittest import mock
+import numpy as np
+from PIL import Image
+from cosver.database.retention import compact_prices
+from cosver.database.writer import get_writer
+from cosver.database.thumbnails import thumbnail_store
+from cosver.database import db as db_module
 from cosver.database.db import (
     init_db, 
+    ensure_db,
+    SCHEMA_VERSION,
     save_product, 
     save_products_batch,
     get_cached_results,
+    iter_cached_results,
+    rebuild_latest_prices,
+    analyze_db,
+    find_similar_products,
+    index_product_names,
+    get_image_data_by_url,
+    find_products,
     normalize_name,
     set_db_path,
-    get_db_path
+    get_db_path,
+    get_image_store,
+    download_and_save_image,
+    get_image_data_from_db,
+    get_thumbnail_by_url,
+    prune_image_store,
+    find_similar_images,
+    backup_db
 )
+from tests.db_case import TempDatabaseTestCase
 
 class TestDatabase(unittest.TestCase):
     @classmethod
@@ -103,6 +132,76 @@ class TestDatabase(unittest.TestCase):
         self.assertGreater(len(results), 0)
         self.assertTrue(any('Red Blemish' in r['name'] for r in results))
     
+    def test_keyword_lookup_uses_fts(self):
+        """Test that Korean substring lookups hit the FTS5 index."""
+        save_product({
+            'name': '헤라 센슈얼 누드 글로스',
+            'brand': '헤라',
+            'platform': 'Ably',
+            'price': 35000,
+        })
+        
+        conn = sqlite3.connect(get_db_path())
+        cursor = conn.cursor()
+        try:
+            matched = find_products(cursor, normalize_name("누드 글로스"))
+            short = find_products(cursor, normalize_name("누드"))
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT rowid FROM products_fts WHERE products_fts MATCH ?",
+                ('"누드 글로스"',)
+            )
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        finally:
+            conn.close()
+        
+        self.assertTrue(any(name == '헤라 센슈얼 누드 글로스' for _, name, _ in matched))
+        self.assertTrue(any(name == '헤라 센슈얼 누드 글로스' for _, name, _ in short))
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+    
+    def test_cached_results_single_query(self):
+        """Test that cached lookup reads latest_prices in one query, never the history."""
+        for platform, price in [('Ably', 30000), ('Ably', 28000), ('Zigzag', 31000)]:
+            save_product({
+                'name': '라네즈 네오 쿠션 매트',
+                'brand': '라네즈',
+                'platform': platform,
+                'price': price,
+            })
+        
+        conn = sqlite3.connect(get_db_path())
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            results = list(iter_cached_results(conn.cursor(), "네오 쿠션"))
+        finally:
+            conn.close()
+        
+        prices = {r['platform']: r['price'] for r in results}
+        self.assertEqual(len(results), 2)
+        self.assertEqual(prices, {'Ably': 28000, 'Zigzag': 31000})
+        self.assertEqual(sum('latest_prices' in sql for sql in statements), 1)
+        self.assertFalse(any(re.search(r'\bprices\b', sql) for sql in statements))
+    
+    def test_rebuild_latest_prices(self):
+        """Test that latest_prices can be rebuilt from the price history."""
+        product_id = save_product({'name': '토리든 다이브인 세럼', 'brand': '토리든', 'platform': 'Ably', 'price': 22000})
+        save_product({'name': '토리든 다이브인 세럼', 'brand': '토리든', 'platform': 'Ably', 'price': 19000})
+        
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("DELETE FROM latest_prices WHERE product_id = ?", (product_id,))
+        conn.commit()
+        conn.close()
+        
+        self.assertGreater(rebuild_latest_prices(), 0)
+        
+        conn = sqlite3.connect(get_db_path())
+        row = conn.execute(
+            "SELECT price FROM latest_prices WHERE product_id = ? AND platform = 'Ably'",
+            (product_id,)
+        ).fetchone()
+        conn.close()
+        self.assertEqual(row[0], 19000)
+    
     def test_cache_expiration(self):
         """Test that old results are not returned."""
         # This test would require manipulating timestamps
@@ -110,5 +209,798 @@ class TestDatabase(unittest.TestCase):
         results = get_cached_results("NonexistentProduct", max_age_hours=1)
         self.assertIsInstance(results, list)
 
+class TestRetention(TempDatabaseTestCase):
+    db_name = "test_retention.db"
+    
+    def _count(self, sql: str, params=()) -> int:
+        conn = sqlite3.connect(get_db_path())
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_unchanged_price_not_inserted(self):
+        """Repeated observations of the same price only refresh latest_prices."""
+        product = {'name': '설화수 자음생크림', 'brand': '설화수', 'platform': 'Ably', 'price': 150000, 'url': 'u'}
+        product_id = save_product(product)
+        save_product(product)
+        save_product(dict(product, price=140000))
+        
+        self.assertEqual(self._count("SELECT COUNT(*) FROM prices WHERE product_id = ?", (product_id,)), 2)
+    
+    def test_compact_rolls_up_old_rows(self):
+        """Rows past the retention window become one daily min/max/last rollup."""
+        product_id = save_product({'name': '헤라 블랙쿠션', 'brand': '헤라', 'platform': 'Ably', 'price': 1})
+        conn = sqlite3.connect(get_db_path())
+        conn.executemany(
+            "INSERT INTO prices (product_id, platform, price, scraped_at) VALUES (?, 'Ably', ?, ?)",
+            [
+                (product_id, 30000, '2020-01-01 09:00:00'),
+                (product_id, 25000, '2020-01-01 12:00:00'),
+                (product_id, 28000, '2020-01-01 18:00:00'),
+            ]
+        )
+        conn.commit()
+        conn.close()
+        
+        stats = compact_prices(retain_days=30)
+        
+        self.assertEqual(stats['deleted_rows'], 3)
+        conn = sqlite3.connect(get_db_path())
+        row = conn.execute(
+            "SELECT min_price, max_price, last_price, samples FROM price_rollups_daily WHERE product_id = ?",
+            (product_id,)
+        ).fetchone()
+        conn.close()
+        self.assertEqual(row, (25000, 30000, 28000, 3))
+        self.assertEqual(self._count("SELECT COUNT(*) FROM prices WHERE product_id = ?", (product_id,)), 1)
+
+    def test_current_price_survives_compaction(self):
+        """An old but still current price is kept raw, so latest_prices can be rebuilt."""
+        product = {'name': '아누아 어성초 토너', 'brand': '아누아', 'platform': 'Ably', 'price': 18000, 'url': 'u'}
+        product_id = save_product(product)
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("UPDATE prices SET scraped_at = '2020-01-01 09:00:00' WHERE product_id = ?", (product_id,))
+        conn.execute("UPDATE latest_prices SET scraped_at = '2020-01-01 09:00:00' WHERE product_id = ?", (product_id,))
+        conn.commit()
+        conn.close()
+        save_product(product)
+
+        self.assertEqual(compact_prices(retain_days=30)['deleted_rows'], 0)
+        rebuild_latest_prices()
+
+        self.assertEqual(self._count(
+            "SELECT COUNT(*) FROM latest_prices WHERE product_id = ? AND scraped_at > '2020-01-02'", (product_id,)
+        ), 1)
+
+        save_product(dict(product, price=16000))
+        compact_prices(retain_days=30)
+        self.assertEqual(self._count("SELECT samples FROM price_rollups_daily WHERE product_id = ?", (product_id,)), 1)
+        self.assertEqual(self._count("SELECT COUNT(*) FROM prices WHERE product_id = ?", (product_id,)), 1)
+
+class TestErrorRecovery(TempDatabaseTestCase):
+    db_name = "test_recovery.db"
+    
+    def setUp(self):
+        """Use a throwaway database with one cached product."""
+        super().setUp()
+        save_product({'name': '에스트라 아토베리어 크림', 'brand': '에스트라', 'platform': 'Ably', 'price': 30000})
+    
+    def test_locked_database_is_not_deleted(self):
+        """A lock held by another process is retried, never treated as corruption."""
+        # WAL readers are only blocked by a connection in exclusive locking mode
+        blocker = sqlite3.connect(get_db_path())
+        blocker.execute("PRAGMA locking_mode = EXCLUSIVE")
+        blocker.execute("BEGIN EXCLUSIVE")
+        try:
+            with mock.patch.multiple('cosver.database.db', LOCK_TIMEOUT=0.01, LOCK_BACKOFF=0.001):
+                self.assertEqual(get_cached_results("아토베리어"), [])
+        finally:
+            blocker.rollback()
+            blocker.close()
+        
+        self.assertEqual(len(get_cached_results("아토베리어")), 1)
+        self.assertEqual([f for f in os.listdir(self.tmp_dir) if 'corrupt' in f], [])
+    
+    def test_corrupt_database_restored_from_backup(self):
+        """A file failing quick_check is quarantined and restored from backup."""
+        backup_db()
+        with open(get_db_path(), 'wb') as f:
+            f.write(b"this is not a database" * 100)
+        
+        self.assertEqual(get_cached_results("아토베리어"), [])
+        
+        self.assertEqual(len(get_cached_results("아토베리어")), 1)
+        self.assertEqual(len([f for f in os.listdir(self.tmp_dir) if 'corrupt' in f]), 1)
+
+class TestDBWriter(TempDatabaseTestCase):
+    db_name = "test_writer.db"
+    
+    def test_concurrent_writes_are_all_committed(self):
+        """Writes from many threads go through one writer without lock errors."""
+        def save(i):
+            return save_product({'name': f'동시 저장 상품 {i}', 'brand': 'B', 'platform': 'P', 'price': i})
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            product_ids = list(pool.map(save, range(40)))
+        
+        self.assertEqual(len(set(product_ids)), 40)
+        conn = sqlite3.connect(get_db_path())
+        count = conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+        conn.close()
+        self.assertEqual(count, 40)
+    
+    def test_failed_operation_does_not_abort_batch(self):
+        """One failing operation is rolled back alone; the rest of the batch commits."""
+        writer = get_writer(get_db_path())
+        
+        def insert(cursor):
+            cursor.execute("INSERT INTO products (name, brand, normalized_name) VALUES ('ok', '', 'ok')")
+            return cursor.lastrowid
+        
+        def fail(cursor):
+            cursor.execute("INSERT INTO products (name, brand, normalized_name) VALUES ('bad', '', 'bad')")
+            raise ValueError("boom")
+        
+        ok_future = writer.submit(insert)
+        bad_future = writer.submit(fail)
+        
+        self.assertGreater(ok_future.result(timeout=5), 0)
+        with self.assertRaises(ValueError):
+            bad_future.result(timeout=5)
+        conn = sqlite3.connect(get_db_path())
+        names = [row[0] for row in conn.execute("SELECT name FROM products")]
+        conn.close()
+        self.assertEqual(names, ['ok'])
+
+class TestImageStore(TempDatabaseTestCase):
+    db_name = "test_images.db"
+    
+    def _fake_response(self, content: bytes):
+        response = mock.Mock(status_code=200, content=content)
+        response.headers = {'Content-Type': 'image/jpeg'}
+        return response
+    
+    def _refcount(self, digest: str) -> int:
+        conn = sqlite3.connect(get_db_path())
+        try:
+            row = conn.execute("SELECT refcount FROM image_blobs WHERE hash = ?", (digest,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+    
+    def test_put_is_content_addressed(self):
+        """Same bytes map to one sharded file and read back zero-copy."""
+        store = get_image_store()
+        digest = store.put(b"image-bytes")
+        self.assertEqual(store.put(b"image-bytes"), digest)
+        
+        path = store.path_for(digest)
+        self.assertEqual(path.parent.name, digest[2:4])
+        self.assertEqual(path.parent.parent.name, digest[:2])
+        
+        data = store.read(digest)
+        self.assertIsInstance(data, memoryview)
+        self.assertEqual(bytes(data), b"image-bytes")
+    
+    def test_shared_url_downloaded_once(self):
+        """Two products sharing an image URL reuse one stored file."""
+        p1 = save_product({'name': 'Shared A', 'brand': 'B', 'platform': 'P', 'price': 1})
+        p2 = save_product({'name': 'Shared B', 'brand': 'B', 'platform': 'P', 'price': 1})
+        
+        with mock.patch('requests.get', return_value=self._fake_response(b"jpeg")) as get:
+            path1 = download_and_save_image(p1, 'P', 'https://test.com/shared.jpg')
+            path2 = download_and_save_image(p2, 'P', 'https://test.com/shared.jpg')
+        
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(path1, path2)
+        self.assertEqual(bytes(get_image_data_from_db(p2, 'P')), b"jpeg")
+        self.assertEqual(self._refcount(get_image_store().digest(b"jpeg")), 2)
+    
+    def test_replaced_image_is_pruned(self):
+        """An image no product references any more is dropped by prune_image_store."""
+        product_id = save_product({'name': 'Changing', 'brand': 'B', 'platform': 'P', 'price': 1})
+        store = get_image_store()
+        
+        with mock.patch('requests.get', return_value=self._fake_response(b"old")):
+            download_and_save_image(product_id, 'P', 'https://test.com/old.jpg')
+        
+        # Losing the stored file forces a fresh download, which relinks the row
+        store.delete(store.digest(b"old"))
+        with mock.patch('requests.get', return_value=self._fake_response(b"new")):
+            download_and_save_image(product_id, 'P', 'https://test.com/new.jpg')
+        
+        self.assertEqual(self._refcount(store.digest(b"old")), 0)
+        self.assertEqual(self._refcount(store.digest(b"new")), 1)
+        
+        store.put(b"old")
+        self.assertEqual(prune_image_store(), 1)
+        self.assertFalse(store.exists(store.digest(b"old")))
+        self.assertTrue(store.exists(store.digest(b"new")))
+    
+    def test_thumbnail_created_on_download(self):
+        """Downloading an image also stores a small thumbnail, pruned with its source."""
+        original = BytesIO()
+        Image.new('RGB', (1200, 900), (220, 90, 120)).save(original, format='JPEG')
+        product_id = save_product({'name': 'Thumb', 'brand': 'B', 'platform': 'P', 'price': 1})
+        store = get_image_store()
+        
+        with mock.patch('requests.get', return_value=self._fake_response(original.getvalue())):
+            download_and_save_image(product_id, 'P', 'https://test.com/big.jpg')
+        
+        digest = store.digest(original.getvalue())
+        self.assertTrue(thumbnail_store(store).exists(digest))
+        thumbnail = Image.open(BytesIO(bytes(get_thumbnail_by_url('https://test.com/big.jpg'))))
+        self.assertEqual(thumbnail.format, 'WEBP')
+        self.assertEqual(thumbnail.size, (256, 192))
+        self.assertIsNone(get_thumbnail_by_url('https://test.com/unknown.jpg'))
+        
+        with mock.patch('requests.get', return_value=self._fake_response(b"other")):
+            store.delete(digest)
+            download_and_save_image(product_id, 'P', 'https://test.com/other.jpg')
+        store.put(original.getvalue())
+        prune_image_store()
+        self.assertFalse(thumbnail_store(store).exists(digest))
+    
+    def test_fingerprint_computed_once(self):
+        """A stored image is fingerprinted when it is saved; lookups read the database."""
+        from cosver.aggregator import image_matcher
+        
+        original = BytesIO()
+        Image.new('RGB', (600, 400), (30, 160, 90)).save(original, format='JPEG')
+        product_id = save_product({'name': 'Print', 'brand': 'B', 'platform': 'P', 'price': 1})
+        with mock.patch('requests.get', return_value=self._fake_response(original.getvalue())):
+            download_and_save_image(product_id, 'P', 'https://test.com/print.jpg')
+        
+        with mock.patch.object(image_matcher, 'load_image', wraps=image_matcher.load_image) as load:
+            first = image_matcher.load_fingerprint('https://test.com/print.jpg')
+            second = image_matcher.load_fingerprint('https://test.com/print.jpg')
+        
+        self.assertEqual(load.call_count, 0)
+        self.assertEqual(first.dhash, second.dhash)
+        self.assertEqual(second.histogram.shape, image_matcher.HIST_BINS)
+        self.assertAlmostEqual(image_matcher.compare_fingerprints(first, second), 1.0, places=5)
+        
+        image = image_matcher.load_image('https://test.com/print.jpg')
+        self.assertAlmostEqual(
+            image_matcher.compare_fingerprints(image_matcher.fingerprint(image), second),
+            image_matcher.calculate_similarity(image, image_matcher.downscale(image)),
+            places=5
+        )
+        
+        store = get_image_store()
+        digest = store.digest(original.getvalue())
+        with mock.patch('requests.get', return_value=self._fake_response(b"other")):
+            store.delete(digest)
+            download_and_save_image(product_id, 'P', 'https://test.com/other.jpg')
+        prune_image_store()
+        conn = sqlite3.connect(get_db_path())
+        try:
+            self.assertFalse(conn.execute("SELECT COUNT(*) FROM image_fingerprints").fetchone()[0])
+        finally:
+            conn.close()
+
+    def _pattern_jpeg(self, side: int, flipped: bool = False, quality: int = 90) -> bytes:
+        """A gradient with a coloured block; flipped turns it upside down."""
+        gradient = Image.linear_gradient('L').resize((side, side)).convert('RGB')
+        mask = Image.new('L', (side, side), 0)
+        mask.paste(255, (side // 4, side // 3, side // 2, side * 2 // 3))
+        image = Image.composite(Image.new('RGB', (side, side), (200, 40, 80)), gradient, mask)
+        if flipped:
+            image = image.transpose(Image.Transpose.ROTATE_180)
+        out = BytesIO()
+        image.save(out, format='JPEG', quality=quality)
+        return out.getvalue()
+    
+    def test_similar_images_found_by_dhash(self):
+        """Stored images near a new image's dHash are found through the chunk index."""
+        from cosver.aggregator import image_matcher
+        
+        images = {
+            'https://test.com/a.jpg': self._pattern_jpeg(800),
+            'https://test.com/a-small.jpg': self._pattern_jpeg(400, quality=60),
+            'https://test.com/b.jpg': self._pattern_jpeg(800, flipped=True),
+        }
+        # Images are fingerprinted as they are saved, by either path
+        product_ids = []
+        for index, (url, data) in enumerate(images.items()):
+            product = {'name': f'Pattern {index}', 'brand': 'B', 'platform': 'P', 'price': 1}
+            with mock.patch('requests.get', return_value=self._fake_response(data)):
+                if index % 2:
+                    product_ids += save_products_batch([dict(product, img=url)])
+                else:
+                    product_id = save_product(product)
+                    download_and_save_image(product_id, 'P', url)
+                    product_ids.append(product_id)
+        
+        new_image = image_matcher.decode_image(self._pattern_jpeg(1000, quality=75))
+        matches = image_matcher.find_stored_matches(new_image)
+        self.assertEqual(sorted(row[0] for row in matches), product_ids[:2])
+        self.assertTrue(all(row[3] <= 8 for row in matches))
+        
+        dhash = image_matcher.load_fingerprint('https://test.com/b.jpg').dhash
+        self.assertEqual([row[0] for row in find_similar_images(dhash, 0)], [product_ids[2]])
+        
+        # Migration 7 rebuilds the chunk rows from stored fingerprints
+        conn = sqlite3.connect(get_db_path())
+        try:
+            indexed = conn.execute("SELECT chunk, content_hash FROM image_dhash_chunks ORDER BY 1, 2").fetchall()
+            conn.execute("DELETE FROM image_dhash_chunks")
+            conn.execute("PRAGMA user_version = 6")
+            db_module._migrate(conn)
+            self.assertEqual(
+                conn.execute("SELECT chunk, content_hash FROM image_dhash_chunks ORDER BY 1, 2").fetchall(),
+                indexed
+            )
+            self.assertEqual(len(indexed), 4 * len(images))
+        finally:
+            conn.close()
+        
+        # Images stored before ingest fingerprinted them are backfilled
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("DELETE FROM image_dhash_chunks")
+        conn.execute("DELETE FROM image_fingerprints")
+        conn.commit()
+        conn.close()
+        self.assertEqual(find_similar_images(dhash, 0), [])
+        self.assertEqual(db_module.fingerprint_images(batch_size=2), len(images))
+        self.assertEqual(db_module.fingerprint_images(), 0)
+        self.assertEqual([row[0] for row in find_similar_images(dhash, 0)], [product_ids[2]])
+
+class TestLazyInit(TempDatabaseTestCase):
+    db_name = "test_lazy.db"
+    create_db = False
+    
+    def _user_version(self) -> int:
+        conn = sqlite3.connect(get_db_path())
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_import_has_no_side_effects(self):
+        """Importing the module creates no database file in the working directory."""
+        subprocess.run([sys.executable, "-c", "import cosver.database.db"],
+                       cwd=self.tmp_dir, check=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+    
+    def test_first_connection_initializes(self):
+        self.assertFalse(os.path.exists(get_db_path()))
+        self.assertEqual(get_cached_results("아무거나"), [])
+        self.assertEqual(self._user_version(), SCHEMA_VERSION)
+    
+    def test_image_lookups_do_not_create_database(self):
+        """Image lookups on a missing database find nothing and leave no file behind."""
+        url = "https://img.test/a.jpg"
+        self.assertIsNone(get_image_data_by_url(url))
+        self.assertIsNone(get_thumbnail_by_url(url))
+        self.assertIsNone(db_module.get_image_fingerprint(url))
+        self.assertEqual(find_similar_images(0), [])
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+    
+    def test_outdated_schema_upgraded_once(self):
+        """A database from before schema versioning is upgraded in place, keeping its data."""
+        init_db()
+        save_product({'name': '토리든 다이브인 세럼', 'brand': '토리든', 'platform': 'Ably', 'price': 18000})
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("PRAGMA user_version = 0")
+        conn.close()
+        db_module._READY.discard(get_db_path())
+        
+        self.assertEqual(len(get_cached_results("다이브인")), 1)
+        self.assertEqual(self._user_version(), SCHEMA_VERSION)
+        
+        with mock.patch.object(db_module, '_apply_schema') as apply_schema:
+            ensure_db()
+        apply_schema.assert_not_called()
+    
+    def test_newer_schema_rejected(self):
+        init_db()
+        conn = sqlite3.connect(get_db_path())
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        conn.close()
+        db_module._READY.discard(get_db_path())
+        
+        with self.assertRaises(RuntimeError):
+            ensure_db()
+
+# schema.sql as first released, before the image store and schema versioning
+LEGACY_SCHEMA = """
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    brand TEXT,
+    normalized_name TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(normalized_name, brand)
+);
+CREATE TABLE prices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    price REAL NOT NULL,
+    url TEXT,
+    img_url TEXT,
+    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE TABLE images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    img_url TEXT NOT NULL,
+    local_path TEXT,
+    image_data BLOB,
+    downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    UNIQUE(product_id, platform)
+);
+CREATE INDEX idx_prices_product_id ON prices(product_id);
+CREATE INDEX idx_prices_scraped_at ON prices(scraped_at);
+CREATE INDEX idx_products_normalized_name ON products(normalized_name);
+"""
+
+class TestMigrations(TempDatabaseTestCase):
+    db_name = "test_migrations.db"
+    create_db = False
+    
+    def _indexes(self, conn):
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    
+    def test_migration_replaces_old_indexes(self):
+        """A version-1 database gets the new indexes, loses the superseded ones and is analyzed."""
+        init_db()
+        save_product({'name': '롬앤 쥬시 래스팅 틴트', 'brand': '롬앤', 'platform': 'Ably', 'price': 9900})
+        conn = sqlite3.connect(get_db_path())
+        conn.executescript("""
+            DROP INDEX idx_prices_product_platform_scraped;
+            DROP INDEX idx_images_img_url_hash;
+            DROP INDEX idx_image_blobs_orphaned;
+            CREATE INDEX idx_prices_product_id ON prices(product_id);
+            CREATE INDEX idx_images_img_url ON images(img_url);
+            PRAGMA user_version = 1;
+        """)
+        conn.close()
+        db_module._READY.discard(get_db_path())
+        
+        ensure_db()
+        
+        conn = sqlite3.connect(get_db_path())
+        try:
+            indexes = self._indexes(conn)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            self.assertTrue(conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0])
+        finally:
+            conn.close()
+        self.assertLessEqual({'idx_prices_product_platform_scraped', 'idx_images_img_url_hash',
+                              'idx_image_blobs_orphaned'}, indexes)
+        self.assertFalse({'idx_prices_product_id', 'idx_images_img_url'} & indexes)
+    
+    def test_legacy_database_opens(self):
+        """A database created from the original schema.sql is upgraded on first use, keeping its data."""
+        conn = sqlite3.connect(get_db_path())
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO products (name, brand, normalized_name) VALUES ('토리든 다이브인 세럼', '토리든', ?)",
+                     (normalize_name('토리든 다이브인 세럼'),))
+        conn.execute("INSERT INTO prices (product_id, platform, price, img_url) VALUES (1, 'Ably', 18000, 'https://test.com/t.jpg')")
+        conn.execute("INSERT INTO images (product_id, platform, img_url, image_data) VALUES (1, 'Ably', 'https://test.com/t.jpg', ?)",
+                     (b"legacy-jpeg",))
+        conn.commit()
+        conn.close()
+        
+        results = get_cached_results("다이브인")
+        self.assertEqual([row['price'] for row in results], [18000])
+        self.assertEqual(bytes(get_image_data_by_url('https://test.com/t.jpg')), b"legacy-jpeg")
+        conn = sqlite3.connect(get_db_path())
+        try:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            self.assertIn('idx_images_content_hash', self._indexes(conn))
+        finally:
+            conn.close()
+    
+    def test_migrations_idempotent(self):
+        """Re-running migrations on a current database changes nothing."""
+        init_db()
+        conn = sqlite3.connect(get_db_path())
+        try:
+            before = self._indexes(conn)
+            conn.execute("PRAGMA user_version = 0")
+            db_module._migrate(conn)
+            self.assertEqual(self._indexes(conn), before)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        finally:
+            conn.close()
+
+class TestProductNameIndex(TempDatabaseTestCase):
+    db_name = "test_name_index.db"
+    
+    def _links(self):
+        conn = sqlite3.connect(get_db_path())
+        try:
+            return conn.execute("SELECT product_id, linked_id FROM product_links ORDER BY product_id").fetchall()
+        finally:
+            conn.close()
+    
+    def test_new_product_linked_to_near_duplicate(self):
+        """A listing under another brand string is linked to the existing product."""
+        hera = save_product({'name': '헤라 블랙 쿠션 파운데이션 15g', 'brand': '헤라', 'platform': 'OliveYoung', 'price': 46800})
+        save_product({'name': '라네즈 워터뱅크 크림 50ml', 'brand': '라네즈', 'platform': 'Zigzag', 'price': 30000})
+        ably = save_product({'name': '[단독] 헤라 블랙쿠션 파운데이션 15g', 'brand': '아모레퍼시픽', 'platform': 'Ably', 'price': 44200})
+        
+        self.assertEqual(self._links(), [(ably, hera)])
+        self.assertEqual([row[0] for row in find_similar_products("블랙 쿠션 파운데이션 15g")], [hera, ably])
+    
+    def test_backfill_indexes_existing_products(self):
+        conn = sqlite3.connect(get_db_path())
+        conn.executemany(
+            "INSERT INTO products (name, brand, normalized_name) VALUES (?, ?, ?)",
+            [('설화수 자음생크림 50ml', '설화수', '설화수 자음생크림 50ml'),
+             ('설화수 자음생 크림 50ml', '', '설화수 자음생 크림 50ml')]
+        )
+        conn.commit()
+        conn.close()
+        
+        self.assertEqual(index_product_names(batch_size=1), 2)
+        self.assertEqual(self._links(), [(2, 1)])
+        self.assertEqual(index_product_names(), 0)
+
+class TestProductGroups(TempDatabaseTestCase):
+    db_name = "test_groups.db"
+    
+    def _drop_skus(self):
+        """Forget SKU assignments, as for products stored by a backend without SKUs."""
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("DELETE FROM product_skus")
+        conn.commit()
+        conn.close()
+    
+    def test_repeat_search_is_pregrouped(self):
+        """Memberships stored by the first grouping make the second one comparison-free."""
+        from cosver.aggregator.match_signals import MatchEvaluator
+        from cosver.frontend import utils
+        
+        product_ids = save_products_batch([
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 60000},
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Zigzag', 'price': 61000},
+            {'name': '[단독] 헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'OliveYoung', 'price': 59000},
+            {'name': '헤라 센슈얼 누드 글로스', 'brand': '헤라', 'platform': 'Ably', 'price': 35000},
+        ])
+        self.assertEqual(product_ids[0], product_ids[1])
+        self._drop_skus()
+        
+        with mock.patch.object(MatchEvaluator, 'match', autospec=True, side_effect=MatchEvaluator.match) as is_match:
+            first = utils.group_incrementally(get_cached_results("헤라"))
+            self.assertGreater(is_match.call_count, 0)
+            is_match.reset_mock()
+            second = utils.group_incrementally(get_cached_results("헤라"))
+            self.assertEqual(is_match.call_count, 0)
+        
+        self.assertEqual(sorted(len(group) for group in first), [1, 3])
+        self.assertEqual([[r['platform'] for r in g] for g in first], [[r['platform'] for r in g] for g in second])
+        
+        groups = db_module.get_product_groups(product_ids)
+        self.assertEqual(set(groups), set(product_ids))
+        self.assertEqual(groups[product_ids[0]], groups[product_ids[2]])
+        self.assertNotEqual(groups[product_ids[0]], groups[product_ids[3]])
+        
+        # A new listing is matched against the stored groups' representatives
+        new_id = save_product({'name': '헤라 블랙 쿠션 15g 본품', 'brand': '헤라', 'platform': 'Musinsa', 'price': 60500})
+        self._drop_skus()
+        utils.group_incrementally(get_cached_results("헤라"))
+        self.assertEqual(db_module.get_product_groups([new_id])[new_id], groups[product_ids[0]])
+    
+    def test_fresh_results_grouped_by_sku(self):
+        """Listings of one SKU join without comparison and every membership is stored."""
+        from cosver.aggregator.match_signals import MatchEvaluator
+        from cosver.frontend import utils
+        
+        results = [
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 60000},
+            {'name': '[HERA] 블랙쿠션 파운데이션', 'brand': '헤라', 'platform': 'Zigzag', 'price': 61000},
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '뷰티셀러', 'platform': 'OliveYoung', 'price': 59000},
+        ]
+        for result, product_id in zip(results, save_products_batch(results)):
+            result['product_id'] = product_id
+        # A cached product matching the keyword but not in this result list
+        save_product({'name': '헤라 쿠션 리필', 'brand': '헤라', 'platform': 'Ably', 'price': 30000})
+        
+        with mock.patch.object(MatchEvaluator, 'match', autospec=True, side_effect=MatchEvaluator.match) as is_match:
+            groups = utils.group_incrementally(results)
+            # Only the Zigzag SKU meets the other SKU's representative
+            self.assertLessEqual(is_match.call_count, 1)
+            is_match.reset_mock()
+            utils.group_incrementally(results)
+            self.assertEqual(is_match.call_count, 0)
+        
+        self.assertEqual(sorted(id(item) for group in groups for item in group), sorted(map(id, results)))
+        self.assertEqual([[r['platform'] for r in g] for g in groups], [['Ably', 'OliveYoung'], ['Zigzag']])
+        stored = db_module.get_product_groups([r['product_id'] for r in results])
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(stored[results[0]['product_id']], stored[results[2]['product_id']])
+    
+    def test_skus_with_matching_images_are_merged(self):
+        """Different SKUs whose names are ambiguous but whose images match share a group."""
+        from cosver.aggregator.image_cache import ImageCache
+        from cosver.aggregator.image_matcher import fingerprint
+        from cosver.frontend import utils
+        
+        def load(url):
+            rng = np.random.default_rng(len(url))
+            return fingerprint(rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8))
+        
+        results = [
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 60000,
+             'img': 'https://img.test/cushion'},
+            {'name': 'HERA 블랙쿠션 파운데이션 본품 15g SPF34', 'brand': '헤라', 'platform': 'Zigzag',
+             'price': 61000, 'img': 'https://img.test/cushion'},
+        ]
+        for result, product_id in zip(results, save_products_batch(results)):
+            result['product_id'] = product_id
+        self.assertEqual(len(set(db_module.get_product_skus([r['product_id'] for r in results]).values())), 2)
+        
+        with mock.patch.object(utils, 'get_fingerprint_cache', return_value=ImageCache(load)), \
+                mock.patch.object(utils, 'load_stored_fingerprint', return_value=None):
+            groups = utils.group_incrementally(results)
+        
+        self.assertEqual(len(groups), 1)
+        stored = db_module.get_product_groups([r['product_id'] for r in results])
+        self.assertEqual(len(set(stored.values())), 1)
+    
+    def test_grouped_results_served_from_sql(self):
+        """Cached results come back in the stored groups, each cheapest first."""
+        from cosver.frontend import utils
+        
+        results = [
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 60000},
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '뷰티셀러', 'platform': 'OliveYoung', 'price': 59000},
+            {'name': '헤라 센슈얼 누드 글로스', 'brand': '헤라', 'platform': 'Ably', 'price': 35000},
+        ]
+        for result, product_id in zip(results, save_products_batch(results)):
+            result['product_id'] = product_id
+        utils.group_incrementally(results)
+        # A new listing of a stored SKU joins its group
+        save_product({'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Musinsa', 'price': 58000})
+        
+        grouped = db_module.get_grouped_results("헤라")
+        
+        self.assertEqual(
+            sorted([r['platform'] for r in group] for group in grouped),
+            [['Ably'], ['Musinsa', 'OliveYoung', 'Ably']]
+        )
+        for group in grouped:
+            self.assertEqual([r['price'] for r in group], sorted(r['price'] for r in group))
+
+class TestSkus(TempDatabaseTestCase):
+    db_name = "test_skus.db"
+    
+    def setUp(self):
+        """Store listings of three SKUs."""
+        super().setUp()
+        self.product_ids = save_products_batch([
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 60000},
+            {'name': '헤라 블랙 쿠션 15g', 'brand': '뷰티셀러', 'platform': 'Zigzag', 'price': 58000},
+            {'name': '[단독] 헤라 블랙 쿠션 15g', 'brand': 'HERA', 'platform': 'OliveYoung', 'price': 59000},
+            {'name': '헤라 블랙 쿠션 리필 15g', 'brand': '헤라', 'platform': 'Ably', 'price': 40000},
+            {'name': '헤라 센슈얼 누드 글로스', 'brand': '헤라', 'platform': 'Ably', 'price': 35000},
+        ])
+    
+    def _skus(self) -> dict:
+        conn = sqlite3.connect(get_db_path())
+        try:
+            return dict(conn.execute("SELECT product_id, sku_id FROM product_skus").fetchall())
+        finally:
+            conn.close()
+    
+    def test_sku_assigned_at_ingest(self):
+        """Listings of one item share a SKU across platforms and brand spellings; refills do not."""
+        skus = self._skus()
+        cushion, seller, tagged, refill, gloss = self.product_ids
+        self.assertEqual(skus[cushion], skus[seller])
+        self.assertEqual(skus[cushion], skus[tagged])
+        self.assertEqual(len({skus[cushion], skus[refill], skus[gloss]}), 3)
+    
+    def test_backfill_assigns_missing(self):
+        conn = sqlite3.connect(get_db_path())
+        conn.execute("DELETE FROM product_skus")
+        conn.execute("DELETE FROM skus")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self._skus(), {})
+        
+        self.assertEqual(db_module.assign_skus(batch_size=2), 5)
+        skus = self._skus()
+        cushion, seller, tagged, refill, gloss = self.product_ids
+        self.assertEqual(skus[cushion], skus[tagged])
+        self.assertEqual(len(set(skus.values())), 3)
+
+class TestQueryPlans(TempDatabaseTestCase):
+    """EXPLAIN QUERY PLAN checks on the statements db.py actually runs."""
+    
+    db_name = "test_plans.db"
+    
+    def setUp(self):
+        super().setUp()
+        for i in range(20):
+            save_product({'name': f'클리오 킬커버 쿠션 {i}', 'brand': '클리오', 'platform': 'Ably',
+                          'price': 20000 + i, 'url': f'https://test.com/{i}'})
+        conn = sqlite3.connect(get_db_path())
+        conn.executemany(
+            "INSERT INTO images (product_id, platform, img_url, content_hash) VALUES (?, 'Ably', ?, ?)",
+            [(i + 1, f'https://test.com/{i}.jpg', f'hash{i}') for i in range(20)]
+        )
+        conn.commit()
+        conn.close()
+        analyze_db()
+    
+    def _plans(self, operation) -> dict:
+        """Run operation, returning {statement: query plan} for every statement it executed."""
+        statements = []
+        connect = sqlite3.connect
+        
+        def tracing_connect(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+        
+        with mock.patch.object(sqlite3, 'connect', tracing_connect):
+            operation()
+        
+        conn = connect(get_db_path())
+        try:
+            return {
+                sql: " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+                for sql in statements
+                if sql.split()[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+            }
+        finally:
+            conn.close()
+    
+    def _plan_for(self, plans: dict, fragment: str) -> str:
+        matching = [plan for sql, plan in plans.items() if fragment in sql]
+        self.assertTrue(matching, f"no statement containing {fragment!r}")
+        return matching[0]
+    
+    def test_cached_results_use_indexes(self):
+        plan = self._plan_for(self._plans(lambda: get_cached_results("킬커버")), "latest_prices")
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+        self.assertIn("SEARCH lp USING INDEX sqlite_autoindex_latest_prices_1", plan)
+        self.assertNotIn("SCAN p ", plan + " ")
+    
+    def test_image_url_lookup_is_covering(self):
+        plan = self._plan_for(self._plans(lambda: get_image_data_by_url('https://test.com/3.jpg')), "img_url =")
+        self.assertIn("COVERING INDEX idx_images_img_url_hash", plan)
+    
+    def test_rebuild_latest_prices_walks_index(self):
+        plan = self._plan_for(self._plans(rebuild_latest_prices), "ROW_NUMBER")
+        self.assertIn("SCAN prices USING INDEX idx_prices_product_platform_scraped", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_orphan_scan_uses_partial_index(self):
+        plan = self._plan_for(self._plans(prune_image_store), "refcount <= 0")
+        self.assertIn("USING INDEX idx_image_blobs_orphaned", plan)
+    
+    def test_name_index_lookup_is_keyed(self):
+        plan = self._plan_for(self._plans(lambda: find_similar_products("클리오 킬커버 쿠션")), "product_lsh_buckets")
+        self.assertIn("SEARCH b USING PRIMARY KEY (bucket=?)", plan)
+        self.assertIn("SEARCH s USING INTEGER PRIMARY KEY (rowid=?)", plan)
+    
+    def test_sku_lookup_is_keyed(self):
+        product = {'name': '클리오 킬커버 쿠션 리필', 'brand': '클리오', 'platform': 'Ably', 'price': 15000}
+        plan = self._plan_for(self._plans(lambda: save_product(product)), "FROM product_skus WHERE sku_key")
+        self.assertIn("COVERING INDEX idx_product_skus_sku_key (sku_key=?)", plan)
+        self.assertIn("COVERING INDEX sqlite_autoindex_skus_1 (sku_key=?)", plan)
+    
+    def test_dhash_lookup_is_keyed(self):
+        plan = self._plan_for(self._plans(lambda: find_similar_images(0x0123456789abcdef)), "image_dhash_chunks")
+        self.assertIn("SEARCH c USING PRIMARY KEY (chunk=?)", plan)
+        self.assertIn("USING INDEX idx_images_content_hash (content_hash=?)", plan)
+        self.assertNotIn("SCAN", plan)
+    
+    def test_unchanged_price_touch_is_keyed(self):
+        product = {'name': '클리오 킬커버 쿠션 1', 'brand': '클리오', 'platform': 'Ably',
+                   'price': 20001, 'url': 'https://test.com/1'}
+        plan = self._plan_for(self._plans(lambda: save_product(product)), "UPDATE latest_prices")
+        self.assertIn("SEARCH latest_prices USING INDEX sqlite_autoindex_latest_prices_1 (product_id=? AND platform=?)", plan)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+import os
+import unittest
+from io import BytesIO
+from unittest import mock
+
+import pyarrow.dataset as ds
+from PIL import Image
+
+from cosver.database.db import download_and_save_image, save_product
+from cosver.database.export import export_parquet
+from tests.db_case import TempDatabaseTestCase
+
+
+class TestParquetExport(TempDatabaseTestCase):
+    db_name = "test_export.db"
+
+    def setUp(self):
+        """Export under the throwaway directory."""
+        super().setUp()
+        self.out_dir = os.path.join(self.tmp_dir, "parquet")
+
+    def test_chunked_export(self):
+        """All rows are exported even when they span several chunks."""
+        for i in range(5):
+            save_product({'name': f'헤라 블랙쿠션 {i}', 'brand': '헤라', 'platform': 'Ably', 'price': 30000 + i})
+
+        counts = export_parquet(self.out_dir, chunk_size=2)
+
+        self.assertEqual(counts['products'], 5)
+        self.assertEqual(counts['prices'], 5)
+        prices = ds.dataset(os.path.join(self.out_dir, "prices"), partitioning="hive").to_table()
+        self.assertEqual(prices.num_rows, 5)
+        self.assertIn('scraped_date', prices.column_names)
+
+    def test_incremental_export_only_new_rows(self):
+        """A second run only writes rows added since the previous snapshot."""
+        save_product({'name': '라네즈 네오 파우더', 'brand': '라네즈', 'platform': 'Zigzag', 'price': 25000})
+        export_parquet(self.out_dir)
+
+        save_product({'name': '라네즈 네오 파우더', 'brand': '라네즈', 'platform': 'Zigzag', 'price': 23000})
+        counts = export_parquet(self.out_dir)
+
+        self.assertEqual(counts, {'products': 0, 'prices': 1, 'images': 0})
+        products = ds.dataset(os.path.join(self.out_dir, "products")).to_table()
+        self.assertEqual(products.num_rows, 1)
+
+    def test_full_export_replaces_previous(self):
+        """A full run rewrites the export instead of adding to the previous one."""
+        save_product({'name': '이니스프리 그린티 세럼', 'brand': '이니스프리', 'platform': 'Ably', 'price': 27000})
+        export_parquet(self.out_dir)
+
+        counts = export_parquet(self.out_dir, incremental=False)
+
+        self.assertEqual(counts['products'], 1)
+        products = ds.dataset(os.path.join(self.out_dir, "products")).to_table()
+        self.assertEqual(products.num_rows, 1)
+        self.assertEqual(export_parquet(self.out_dir)['products'], 0)
+
+    def test_replaced_image_exported(self):
+        """An image replaced in place shows up in the next incremental export."""
+        product_id = save_product({'name': '헤라 블랙쿠션', 'brand': '헤라', 'platform': 'Ably', 'price': 30000})
+        paths = []
+        for color in ((200, 120, 80), (80, 120, 200)):
+            out = BytesIO()
+            Image.new('RGB', (64, 64), color).save(out, format='JPEG')
+            response = mock.Mock(status_code=200, content=out.getvalue())
+            response.headers = {'Content-Type': 'image/jpeg'}
+            with mock.patch('requests.get', return_value=response):
+                paths.append(download_and_save_image(product_id, 'Ably', f'https://test.com/{len(paths)}.jpg'))
+            counts = export_parquet(self.out_dir)
+
+        self.assertEqual(counts['images'], 1)
+        images = ds.dataset(os.path.join(self.out_dir, "images")).to_table()
+        self.assertEqual(images.column('content_hash').to_pylist(), [os.path.basename(paths[1])])
+
+
+if __name__ == '__main__':
+    unittest.main()
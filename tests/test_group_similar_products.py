@@ -1,7 +1,21 @@
 """
 Tests for group_similar_products function.
 """
-from cosver.frontend.utils import group_similar_products
+import threading
+from unittest import mock
+
+import numpy as np
+
+from cosver.aggregator.blocking import block_keys, candidate_pairs, compatible, compatible_mask
+from cosver.aggregator.evaluation import load_labelled_results, pairwise_scores
+from cosver.aggregator.image_cache import ImageCache
+from cosver.aggregator.image_matcher import compare_fingerprints, fingerprint
+from cosver.aggregator.incremental import IncrementalGrouper
+from cosver.aggregator.match_signals import CACHED_IMAGE, EXACT_KEY, TEXT, VETO, MatchEvaluator
+from cosver.aggregator.minhash import LSHIndex
+from cosver.aggregator.similarity_matrix import BATCH_THRESHOLD, similar_pairs, tfidf_matrix
+from cosver.database.storage import Storage
+from cosver.frontend.utils import group_incrementally, group_similar_products, image_similarity_matrix
 
 
 def test_group_similar_products_basic():
@@ -116,6 +130,287 @@ def test_group_similar_products_multiple_groups():
     assert "헤라" in group_names[0] or "헤라" in group_names[1] or "헤라" in group_names[2]
 
 
+def test_blocking_separates_volumes_and_types():
+    """Different volumes, refills and far-apart prices are never compared."""
+    products = [
+        {"name": "라네즈 워터뱅크 크림 50ml", "price": 30000},
+        {"name": "라네즈 워터뱅크 크림 20ml", "price": 29000},
+        {"name": "라네즈 워터뱅크 크림 리필 50ml", "price": 28000},
+        {"name": "라네즈 워터뱅크 크림", "price": 31000},
+        {"name": "라네즈 워터뱅크 크림 50ml", "price": 90000},
+    ]
+
+    candidates = candidate_pairs(products)
+
+    # Only the listing without a volume may match the 50ml one
+    assert candidates[0] == [3]
+    assert candidates[1] == [3]
+    assert candidates[2] == []
+
+
+def test_compatible_mask_matches_compatible():
+    """The array form agrees with compatible on every pair, missing features included."""
+    results = load_labelled_results() + [{"name": "워터뱅크 크림"}, {"name": "라네즈 크림", "price": "품절"}]
+    keys = block_keys(results)
+    rows, cols = np.triu_indices(len(results), 1)
+
+    mask = compatible_mask(keys, rows, cols)
+
+    assert mask.tolist() == [compatible(keys[i], keys[j]) for i, j in zip(rows.tolist(), cols.tolist())]
+    assert 0 < mask.sum() < len(mask)
+
+
+def test_blocking_improves_labelled_grouping():
+    """On the labelled listings, blocking raises precision without losing F1."""
+    results = [dict(row, img="") for row in load_labelled_results()]
+
+    blocked = pairwise_scores(results, group_similar_products(results, blocking=True, lsh=False))
+    unblocked = pairwise_scores(results, group_similar_products(results, blocking=False, lsh=False))
+
+    assert blocked["precision"] > unblocked["precision"]
+    assert blocked["f1"] >= unblocked["f1"]
+
+
+def test_lsh_keeps_labelled_grouping():
+    """MinHash LSH prunes candidate pairs without changing the labelled grouping."""
+    results = [dict(row, img="") for row in load_labelled_results()]
+
+    with_lsh = group_similar_products(results, lsh=True)
+    without_lsh = group_similar_products(results, lsh=False)
+
+    assert [[item["name"] for item in group] for group in with_lsh] == \
+        [[item["name"] for item in group] for group in without_lsh]
+
+
+def test_lsh_index_query():
+    """Near-duplicate names are found regardless of spacing and [tags]."""
+    index = LSHIndex()
+    index.add(1, "헤라 블랙 쿠션 파운데이션 15g")
+    index.add(2, "라네즈 워터뱅크 블루 히알루로닉 크림 50ml")
+    index.add(3, "설화수 자음생크림 리치 50ml")
+
+    matches = index.query("[직잭픽] 헤라 블랙쿠션 파운데이션 15g", min_jaccard=0.5)
+
+    assert [key for key, _ in matches] == [1]
+
+
+def test_similar_pairs_thresholds_cosine():
+    """Pairs come back once (i < j) with their cosine similarity."""
+    names = ["헤라 블랙 쿠션 15g", "[단독] 헤라 블랙쿠션 15g", "설화수 자음생크림 50ml"]
+
+    rows, cols, scores = similar_pairs(tfidf_matrix(names), 0.5, chunk_rows=1)
+
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 1)]
+    assert abs(scores[0] - 1.0) < 1e-5
+
+
+def test_batch_mode_groups_transitively():
+    """Batch mode returns connected components in input order."""
+    products = [
+        {"name": "헤라 블랙 쿠션 파운데이션 15g", "price": 60000},
+        {"name": "설화수 자음생크림 리치 50ml", "price": 200000},
+        {"name": "헤라 블랙쿠션 파운데이션 15g", "price": 59000},
+        {"name": "[단독] 헤라 블랙 쿠션 파운데이션 15g", "price": 58000},
+    ]
+
+    groups = group_similar_products(products, threshold=BATCH_THRESHOLD, batch=True)
+
+    assert [[products.index(item) for item in group] for group in groups] == [[0, 2, 3], [1]]
+    assert group_similar_products([], batch=True) == []
+
+
+def test_batch_mode_matches_greedy_on_labelled_grouping():
+    """On the labelled listings, batch mode with blocking is at least as accurate as greedy."""
+    results = [dict(row, img="") for row in load_labelled_results()]
+
+    batch = pairwise_scores(results, group_similar_products(results, threshold=BATCH_THRESHOLD, batch=True))
+    greedy = pairwise_scores(results, group_similar_products(results))
+
+    assert batch["f1"] >= greedy["f1"]
+
+
+def test_incremental_grouping_matches_greedy():
+    """Folding the labelled listings in one by one gives the greedy groups."""
+    results = [dict(row, img="") for row in load_labelled_results()]
+
+    incremental = group_incrementally(results)
+    greedy = group_similar_products(results)
+
+    assert [[id(item) for item in group] for group in incremental] == \
+        [[id(item) for item in group] for group in greedy]
+
+
+def test_incremental_grouper_uses_labels_and_representatives():
+    """Labelled results join without comparisons; new ones only meet representatives."""
+    compared = []
+
+    def match(representative, item):
+        compared.append((representative["name"], item["name"]))
+        return representative["name"].split()[0] == item["name"].split()[0]
+
+    grouper = IncrementalGrouper(match)
+    grouper.add(1, {"name": "헤라 블랙 쿠션 15g"}, label=10)
+    grouper.add(2, {"name": "설화수 자음생크림 50ml"}, label=20)
+    grouper.add(3, {"name": "헤라 블랙쿠션 파운데이션 15g"}, label=10)
+    grouper.add(1, {"name": "헤라 블랙 쿠션 15g", "platform": "Ably"})
+    assert compared == []
+
+    grouper.add(4, {"name": "헤라 블랙쿠션 파운데이션 15g 본품"})
+    grouper.add(5, {"name": "라네즈 워터뱅크 크림 50ml"})
+    comparisons = grouper.comparisons
+    grouper.add(6, {"name": "LANEIGE 수분 크림"}, same_as=5)
+
+    assert grouper.comparisons == comparisons
+    assert {rep for rep, _ in compared} <= {"헤라 블랙 쿠션 15g", "설화수 자음생크림 50ml"}
+    assert grouper.comparisons == len(compared)
+    assert [len(group) for group in grouper.groups()] == [4, 1, 2]
+    assert grouper.labels() == {1: 10, 2: 20, 3: 10, 4: 10, 5: 5, 6: 5}
+
+
+def test_incremental_grouping_reads_the_configured_storage():
+    """SKUs and groups come from the backend that assigned the product ids, never the SQLite file."""
+    storage = mock.Mock(spec=Storage)
+    storage.get_product_skus.return_value = {}
+    storage.get_product_groups.return_value = {}
+    results = [
+        {"product_id": 1, "name": "헤라 블랙 쿠션 15g", "platform": "Ably"},
+        {"product_id": 2, "name": "헤라 블랙 쿠션 15g", "platform": "Zigzag"},
+    ]
+
+    with mock.patch("cosver.frontend.utils.get_storage", return_value=storage), \
+            mock.patch("cosver.database.db.get_connection", side_effect=AssertionError("SQLite was read")):
+        groups = group_incrementally(results)
+
+    assert len(groups) == 1
+    storage.get_product_skus.assert_called_once_with([1, 2])
+    storage.save_product_groups.assert_called_once_with({1: 1, 2: 1})
+
+
+def _synthetic_fingerprint(url):
+    """Fingerprint of a random image seeded by the URL's label, so same-label images match."""
+    label = url.rsplit("/", 1)[-1]
+    rng = np.random.default_rng(sum(map(ord, label)))
+    return fingerprint(rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8))
+
+
+def test_serial_mode_prefetches_undecided_images():
+    """Images of pairs the cheap tiers leave open are loaded by the prefetch threads, not one by one."""
+    results = [
+        dict(row, img=f"https://img.test/{index % 3}/{row['Group']}")
+        for index, row in enumerate(load_labelled_results())
+    ]
+    threads = []
+
+    def load(url):
+        threads.append(threading.current_thread())
+        return _synthetic_fingerprint(url)
+
+    with mock.patch("cosver.frontend.utils.get_fingerprint_cache", return_value=ImageCache(load)), \
+            mock.patch("cosver.frontend.utils.load_stored_fingerprint", return_value=None):
+        group_similar_products(results, blocking=False, lsh=False)
+
+    assert threads
+    assert threading.main_thread() not in threads
+
+
+def test_parallel_mode_skips_images_of_vetoed_pairs():
+    """Pairs an exact key or veto settles load no images, whichever mode scores the names."""
+    results = [
+        {"name": "설화수 자음생크림 50ml", "brand": "설화수", "img": "https://img.test/u1"},
+        {"name": "설화수 윤조에센스 30ml", "brand": "설화수", "img": "https://img.test/u2"},
+    ]
+    for workers in (1, 2, None):
+        loaded = []
+
+        def load(url):
+            loaded.append(url)
+            return _synthetic_fingerprint(url)
+
+        with mock.patch("cosver.frontend.utils.get_fingerprint_cache", return_value=ImageCache(load)), \
+                mock.patch("cosver.frontend.utils.load_stored_fingerprint", return_value=None):
+            groups = group_similar_products(results, blocking=False, lsh=False, workers=workers)
+
+        assert len(groups) == 2
+        assert loaded == []
+
+
+def test_parallel_mode_matches_serial():
+    """Scoring pairs in worker processes yields exactly the serial groups."""
+    results = [
+        dict(row, img=f"https://img.test/{index % 3}/{row['Group']}")
+        for index, row in enumerate(load_labelled_results())
+    ]
+    cache = ImageCache(loader=_synthetic_fingerprint)
+
+    with mock.patch("cosver.frontend.utils.get_fingerprint_cache", return_value=cache), \
+            mock.patch("cosver.frontend.utils.load_stored_fingerprint", return_value=None):
+        serial = group_similar_products(results, blocking=False, lsh=False)
+        parallel = group_similar_products(results, blocking=False, lsh=False, workers=2)
+
+    assert [[id(item) for item in group] for group in parallel] == \
+        [[id(item) for item in group] for group in serial]
+    # Images decide some ambiguous pairs, so the image path is exercised
+    text_only = group_similar_products([dict(row, img="") for row in results], blocking=False, lsh=False)
+    assert len(serial) < len(text_only)
+
+
+def test_match_evaluator_tries_cheap_signals_first():
+    """Exact keys and vetoes decide before names; stored fingerprints before downloads."""
+    fetched = []
+    fingerprints = {url: _synthetic_fingerprint(url) for url in ("https://img.test/a", "https://img.test/b")}
+
+    def fetch(url):
+        fetched.append(url)
+        return _synthetic_fingerprint(url)
+
+    evaluator = MatchEvaluator(0.7, fingerprints.get, fetch)
+    cream = {"name": "설화수 자음생크림 50ml", "brand": "설화수", "img": "https://img.test/a"}
+
+    assert evaluator.match(dict(cream, product_id=1), dict(cream, name="자음생 크림 50ml 본품", product_id=1))
+    assert not evaluator.match(cream, dict(cream, name="설화수 자음생크림 30ml"))
+    assert evaluator.match(cream, dict(cream, name="설화수 자음생 크림 50ml"))
+    # Ambiguous names: the stored fingerprints decide, nothing is downloaded
+    assert not evaluator.match(cream, dict(cream, name="설화수 윤조에센스 50ml", img="https://img.test/b"))
+    assert evaluator.match(cream, dict(cream, name="설화수 윤조에센스 50ml"))
+    assert fetched == []
+
+    # Without a stored fingerprint the image is downloaded as the last resort
+    assert evaluator.match(cream, dict(cream, name="설화수 윤조에센스 50ml", img="https://img.test/c")) is False
+    assert fetched == ["https://img.test/c"]
+
+    summary = evaluator.summary()
+    assert summary[EXACT_KEY]["match"] >= 1
+    assert summary[VETO]["reject"] == 1
+    assert summary[TEXT]["match"] == 1
+    assert summary[CACHED_IMAGE] == {"match": 1, "reject": 1}
+
+
+def test_image_similarity_matrix_matches_pairwise_scores():
+    """The batched matrix holds compare_fingerprints of every pair."""
+    results = [{"img": f"https://img.test/{label}"} for label in ("a", "b", "a", "c")] + [{"img": ""}]
+    cache = ImageCache(loader=_synthetic_fingerprint)
+
+    with mock.patch("cosver.frontend.utils.get_fingerprint_cache", return_value=cache):
+        matrix = image_similarity_matrix(results)
+
+    fingerprints = [_synthetic_fingerprint(item["img"]) if item["img"] else None for item in results]
+    expected = [[compare_fingerprints(a, b) for b in fingerprints] for a in fingerprints]
+    assert matrix.shape == (5, 5)
+    assert np.allclose(matrix, expected)
+    assert matrix[0, 2] > 0.99
+    assert not matrix[4].any()
+
+
+def test_match_evaluator_ignores_empty_sku_keys():
+    """Names without letters or digits share a bare type key, which is no evidence of a match."""
+    evaluator = MatchEvaluator(0.7, lambda url: None, lambda url: None)
+
+    assert not evaluator.match({"name": ""}, {"name": "!!!"})
+    assert evaluator.decisions[(EXACT_KEY, True)] == 0
+    assert evaluator.match({"name": "헤라 블랙 쿠션 15g"}, {"name": "헤라  블랙 쿠션 15g"})
+    assert evaluator.decisions[(EXACT_KEY, True)] == 1
+
+
 if __name__ == "__main__":
     # Run tests if executed directly
     import pytest
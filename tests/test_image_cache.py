@@ -0,0 +1,52 @@
+"""
+Tests for the byte-bounded fingerprint cache used by grouping.
+"""
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+
+from cosver.aggregator.image_cache import ImageCache
+
+
+def _image(side: int) -> np.ndarray:
+    return np.zeros((side, side, 3), dtype=np.uint8)
+
+
+def test_cache_evicts_by_bytes():
+    """Once the byte budget is exceeded the least recently used entry goes."""
+    cache = ImageCache(lambda url: _image(64), max_bytes=2 * 64 * 64 * 3)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.currsize == 2 * 64 * 64 * 3
+
+
+def test_prefetch_is_concurrent_and_reports_failures():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_load(url):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return None if url == "broken" else _image(32)
+
+    load = mock.Mock(side_effect=slow_load)
+    cache = ImageCache(load)
+    failed = cache.prefetch(["a", "b", "c", "a", "broken", ""])
+    cache.get("a")
+
+    assert failed == {"broken"}
+    assert load.call_count == 4
+    assert peak > 1
@@ -0,0 +1,58 @@
+"""
+Tests for image decoding, fingerprints and the dHash multi-index keys.
+"""
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from cosver.aggregator.dhash_index import chunk_keys, hamming, probe_keys
+from cosver.aggregator.image_matcher import compare_fingerprints, decode_image, downscale, fingerprint
+
+
+def test_downscale_caps_longer_side():
+    assert downscale(np.zeros((1000, 500, 3), dtype=np.uint8), 256).shape == (256, 128, 3)
+    assert downscale(np.zeros((100, 100, 3), dtype=np.uint8), 256).shape == (100, 100, 3)
+    assert downscale(None) is None
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) % 256], axis=-1).astype(np.uint8)
+    out = BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def test_decode_at_reduced_size():
+    """Draft decoding lands at max_side and fingerprints like a full decode."""
+    data = _jpeg(1000, 800)
+    full = decode_image(data)
+    reduced = decode_image(data, max_side=256)
+
+    assert full.shape == (800, 1000, 3)
+    assert reduced.shape == (205, 256, 3)
+    assert decode_image(data, max_side=2000).shape == full.shape
+    assert compare_fingerprints(fingerprint(reduced), fingerprint(downscale(full, 256))) > 0.9
+    assert decode_image(b"not an image", max_side=256) is None
+
+
+def test_probe_keys_reach_everything_within_radius():
+    """Every hash a linear scan finds within the radius shares a chunk key with the probes."""
+    rng = np.random.default_rng(0)
+    base = [int(value) for value in rng.integers(0, 1 << 63, size=50, dtype=np.int64)]
+    hashes = []
+    for value in base:
+        # Near variants with up to 12 flipped bits
+        for flips in (0, 3, 7, 12):
+            for bit in rng.choice(64, size=flips, replace=False):
+                value ^= 1 << int(bit)
+            hashes.append(value | (1 << 63))
+
+    query = hashes[5]
+    for radius in (0, 3, 8, 12):
+        probes = set(probe_keys(query, radius))
+        within = [value for value in hashes if hamming(query, value) <= radius]
+        assert within
+        assert all(probes.intersection(chunk_keys(value)) for value in within)
+    assert len(probe_keys(0, 7)) == 4 * 17
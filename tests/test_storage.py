@@ -0,0 +1,98 @@
+"""
+Contract tests shared by every storage backend.
+
+The PostgreSQL suite runs against a local server when COSVER_TEST_PG_DSN is set,
+e.g. COSVER_TEST_PG_DSN=postgresql://postgres@localhost/cosver_test
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from cosver.database.db import SQLiteStorage
+from cosver.database.postgres import PSYCOPG_AVAILABLE
+
+PG_DSN = os.getenv("COSVER_TEST_PG_DSN")
+
+
+class StorageContract:
+    """Behaviour every Storage implementation must share."""
+
+    def make_storage(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.storage = self.make_storage()
+
+    def tearDown(self):
+        self.storage.close()
+
+    def test_save_product_returns_same_id(self):
+        product = {'name': 'Dr.G Red Blemish Cream', 'brand': 'Dr.G', 'platform': 'OliveYoung', 'price': 20000}
+        first = self.storage.save_product(product)
+        second = self.storage.save_product(dict(product, platform='Ably'))
+        self.assertGreater(first, 0)
+        self.assertEqual(first, second)
+
+    def test_batch_returns_product_ids_in_order(self):
+        products = [
+            {'name': '헤라 블랙쿠션', 'brand': '헤라', 'platform': 'Ably', 'price': 30000},
+            {'name': '클리오 킬커버 쿠션', 'brand': '클리오', 'platform': 'Ably', 'price': 24000},
+            {'name': '헤라 블랙쿠션', 'brand': '헤라', 'platform': 'Zigzag', 'price': 31000},
+        ]
+        product_ids = self.storage.save_products_batch(products)
+        self.assertEqual(product_ids, [self.storage.save_product(product) for product in products])
+        self.assertEqual(product_ids[0], product_ids[2])
+        self.assertNotEqual(product_ids[0], product_ids[1])
+
+    def test_find_products_by_substring(self):
+        self.storage.save_products_batch([
+            {'name': '헤라 센슈얼 누드 글로스', 'brand': '헤라', 'platform': 'Ably', 'price': 35000},
+            {'name': '라네즈 네오 파우더', 'brand': '라네즈', 'platform': 'Zigzag', 'price': 25000},
+        ])
+        names = [name for _, name, _ in self.storage.find_products("누드 글로스")]
+        self.assertEqual(names, ['헤라 센슈얼 누드 글로스'])
+
+    def test_cached_results_latest_price_per_platform(self):
+        self.storage.save_products_batch([
+            {'name': '설화수 자음생크림', 'brand': '설화수', 'platform': 'Ably', 'price': 150000, 'url': 'a'},
+            {'name': '설화수 자음생크림', 'brand': '설화수', 'platform': 'Ably', 'price': 140000, 'url': 'a'},
+            {'name': '설화수 자음생크림', 'brand': '설화수', 'platform': 'Musinsa', 'price': 145000, 'url': 'm'},
+        ])
+        results = self.storage.get_cached_results("자음생크림")
+        prices = {r['platform']: r['price'] for r in results}
+        self.assertEqual(prices, {'Ably': 140000, 'Musinsa': 145000})
+        self.assertTrue(all(r['cached'] and r['source'] == r['platform'] for r in results))
+        product_ids = {product_id for product_id, _, _ in self.storage.find_products("자음생크림")}
+        self.assertEqual({r['product_id'] for r in results}, product_ids)
+
+    def test_cached_results_empty_for_unknown_keyword(self):
+        self.assertEqual(self.storage.get_cached_results("존재하지않는상품"), [])
+
+
+class TestSQLiteStorage(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        storage = SQLiteStorage(os.path.join(self.tmp_dir, "contract.db"))
+        storage.init_schema()
+        return storage
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+@unittest.skipUnless(PG_DSN and PSYCOPG_AVAILABLE, "set COSVER_TEST_PG_DSN to test PostgreSQL")
+class TestPostgresStorage(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        from cosver.database.postgres import PostgresStorage
+
+        storage = PostgresStorage(PG_DSN)
+        storage.init_schema()
+        with storage.pool.connection() as conn:
+            conn.execute("TRUNCATE products, prices, latest_prices RESTART IDENTITY CASCADE")
+        return storage
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,22 +34,20 @@ def validate():
     product_id = save_product(item)
     print(f"✅ Product ID: {product_id}")
 
-    # 2. Download and save image (File + BLOB)
-    print("⏬ Downloading and saving image (File + BLOB)...")
+    # 2. Download and save image into the image store
+    print("⏬ Downloading and saving image to the image store...")
     local_path = download_and_save_image(product_id, "OliveYoung", item['img'])
     
-    blob_data = get_image_data_from_db(product_id, "OliveYoung")
+    image_data = get_image_data_from_db(product_id, "OliveYoung")
 
-    if blob_data:
-        print(f"✅ Image successfully saved as BLOB. Size: {len(blob_data)} bytes")
+    if image_data:
+        print(f"✅ Image successfully readable from the store. Size: {len(image_data)} bytes")
     else:
-        print("❌ Failed to save image as BLOB.")
+        print("❌ Failed to read image from the store.")
 
     if local_path and os.path.exists(local_path):
-        print(f"✅ Image also saved to: {local_path}")
+        print(f"✅ Image saved to: {local_path}")
         print(f"📁 File size: {os.path.getsize(local_path)} bytes")
-    elif local_path == "DB_BLOB":
-        print(f"✅ Image saved to database BLOB correctly.")
     else:
         print(f"❌ Failed to download/save image.")
 